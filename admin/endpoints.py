@@ -1,11 +1,20 @@
 from typing import Annotated
-from fastapi import APIRouter, Form, Request, status
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from db.db_connection import db_dependency
-from db.schema import Career, Faculty, Skill, User, UserCareer, UserSkill
+from fastapi import APIRouter, Form, HTTPException, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from monitoring.templates import TimedJinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import Select, exists, select
+from db import career_skill_counts, data_version, reference_data
+from db.db_connection import SessionLocal, async_db_dependency
+from db.user_relations import update_user_relations
+from db.schema import CAREER_STATUSES, Career, CareerStats, Faculty, Skill, User, UserCareer, UserSkill
+from admin.helpers import affinity_report, user_export
+from admin.helpers.pagination import get_filters, keyset_page, parse_optional_bool, parse_optional_int
+from admin.helpers.user_import import ImportProgress, get_format, import_users, read_rows
+from admin.helpers.validation import is_valid_email
+from users.helpers import career_affinity, similar_students
 from users.helpers.jwt_token import user_dependency
-from users.helpers.password_encryption import hash_password
+from users.helpers.password_encryption import hash_password_async
 
 
 router = APIRouter(
@@ -13,34 +22,88 @@ router = APIRouter(
     tags=["admin"],
 )
 
-templates = Jinja2Templates(directory="templates")
+templates = TimedJinja2Templates(directory="templates")
 
 
 # region show all users
+def filter_users(
+    statement: Select,
+    role: str | None,
+    is_active: bool | None,
+    career_status: str | None,
+) -> Select:
+    """
+    Adds the user filters of the admin listings to a statement.
+
+    Parameters:
+        statement (Select): The statement that selects users.
+        role (str | None): Keep only the users with this role.
+        is_active (bool | None): Keep only the active or inactive users.
+        career_status (str | None): Keep only the users with a career in this status.
+
+    Returns:
+        Select: The filtered statement.
+    """
+    if role:
+        statement = statement.where(User.role == role)
+
+    if is_active is not None:
+        statement = statement.where(User.is_active == is_active)
+
+    if career_status:
+        statement = statement.where(exists().where(
+            UserCareer.user_id == User.id,
+            UserCareer.status == career_status,
+        ))
+
+    return statement
+
+
 @router.get(
     "/show-users",
     response_class=HTMLResponse,
     status_code=status.HTTP_200_OK,
-    description="Retrieve all the users.",
+    description="Retrieve a page of users.",
 )
-def show_users(request: Request, user: user_dependency, db: db_dependency):
+async def show_users(
+    request: Request,
+    user: user_dependency,
+    db: async_db_dependency,
+    after: int | None = None,
+    before: int | None = None,
+    role: str | None = None,
+    is_active: str | None = None,
+    career_status: str | None = None,
+):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    all_users: list[User] = db.query(User).all()
+    filters = get_filters(role=role, is_active=is_active, career_status=career_status)
+
+    page = await keyset_page(
+        db,
+        filter_users(select(User), role, parse_optional_bool(is_active), career_status),
+        User.id,
+        lambda db_user: db_user.id,
+        after=after,
+        before=before,
+    )
 
     return templates.TemplateResponse(
         "admin/users/show.html",
         {
             "request": request,
             "role": user["role"],
-            "users": all_users,
+            "users": page.items,
+            "page": page,
+            "filters": filters,
+            "career_statuses": CAREER_STATUSES,
         }
     )
 
 
 @router.get("/", response_class=HTMLResponse)
-def welcome_admin(
+async def welcome_admin(
     request: Request,
     user: user_dependency
 ):
@@ -63,11 +126,11 @@ def welcome_admin(
     status_code=status.HTTP_200_OK,
     description="Retrieve the page to create a new user.",
 )
-def create_user(request: Request, user: user_dependency, db: db_dependency):
+async def create_user(request: Request, user: user_dependency, db: async_db_dependency):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    all_skills: list[Skill] = db.query(Skill).all()
+    all_skills = (await reference_data.get_reference_data(db)).skills
 
     return templates.TemplateResponse(
         "admin/users/create.html",
@@ -85,10 +148,10 @@ def create_user(request: Request, user: user_dependency, db: db_dependency):
     status_code=status.HTTP_200_OK,
     description="Create a new user.",
 )
-def create_user_post(
+async def create_user_post(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     first_name: Annotated[str, Form(...)],
     last_name: Annotated[str, Form(...)],
     email: Annotated[str, Form(...)],
@@ -101,7 +164,7 @@ def create_user_post(
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
     # Valida que el email tenga un formato válido
-    if "@" not in email or " " in email or email.count("@") > 1 or email.split("@")[1].count(".") == 0:
+    if not is_valid_email(email):
         return templates.TemplateResponse(
             "admin/users/create.html",
             {
@@ -111,7 +174,7 @@ def create_user_post(
             }
         )
 
-    db_user = db.query(User).filter(User.email == email).first()
+    db_user = await db.scalar(select(User).where(User.email == email))
 
     if db_user:
         return templates.TemplateResponse(
@@ -160,17 +223,19 @@ def create_user_post(
         first_name=first_name,
         last_name=last_name,
         email=email,
-        hashed_password=hash_password(password),
+        hashed_password=await hash_password_async(password),
         role=role,
     )
 
     db.add(new_user)
-    db.commit()
+    await db.flush()
 
-    for skill_id in skill:
-        db.add(UserSkill(user_id=new_user.id, skill_id=skill_id))
+    db.add_all(UserSkill(user_id=new_user.id, skill_id=skill_id) for skill_id in set(skill))
 
-    db.commit()
+    # A new user is not enrolled in any career yet, so their skills do not
+    # change `career_skill_counts` until they are added to a career.
+    await db.commit()
+    similar_students.update_user(new_user.id, skill)
 
     return templates.TemplateResponse(
         "admin/index.html",
@@ -181,6 +246,124 @@ def create_user_post(
     )
 
 
+# region import users
+@router.get(
+    "/import-users",
+    response_class=HTMLResponse,
+    status_code=status.HTTP_200_OK,
+    description="Retrieve the page to import users from a file.",
+)
+async def import_users_page(request: Request, user: user_dependency):
+    if user["role"] != "admin":
+        return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
+
+    return templates.TemplateResponse(
+        "admin/users/import.html",
+        {
+            "request": request,
+            "role": user["role"],
+        }
+    )
+
+
+def run_user_import(file, format: str) -> ImportProgress:
+    """
+    Imports the users of a file with its own session.
+
+    Parameters:
+        file (BinaryIO): The uploaded file.
+        format (str): "csv" or "jsonl".
+
+    Returns:
+        ImportProgress: The result of the import.
+    """
+    progress = ImportProgress()
+
+    with SessionLocal() as db:
+        for progress in import_users(db, read_rows(file, format)):
+            pass
+
+    return progress
+
+
+@router.post(
+    "/import-users",
+    response_class=HTMLResponse,
+    status_code=status.HTTP_200_OK,
+    description="Import users from a CSV or JSONL file.",
+)
+async def import_users_post(
+    request: Request,
+    user: user_dependency,
+    file: UploadFile,
+):
+    if user["role"] != "admin":
+        return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
+
+    # La importación es síncrona y por lotes, se ejecuta fuera del event loop
+    progress = await run_in_threadpool(
+        run_user_import, file.file, get_format(file.filename or ""))
+
+    if progress.imported:
+        career_affinity.invalidate()
+        similar_students.invalidate()
+        data_version.bump(data_version.ENROLLMENTS)
+
+    return templates.TemplateResponse(
+        "admin/users/import.html",
+        {
+            "request": request,
+            "role": user["role"],
+            "progress": progress,
+        }
+    )
+
+
+# region affinity report
+@router.get(
+    "/affinity-report",
+    status_code=status.HTTP_200_OK,
+    description="Download the careers with the highest affinity of every student as CSV.",
+)
+async def get_affinity_report(user: user_dependency, top: int = 3):
+    if user["role"] != "admin":
+        return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
+
+    # El reporte se envía mientras se calcula, sin guardarlo entero en memoria
+    return StreamingResponse(
+        affinity_report.stream_report(top),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="affinity-report.csv"'},
+    )
+
+
+# region export users
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    description="Download every user with their skills and careers as CSV, NDJSON, Parquet or Arrow.",
+)
+async def export_users(user: user_dependency, format: str = "csv"):
+    if user["role"] != "admin":
+        return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
+
+    try:
+        user_export.check_format(format)
+    except user_export.MissingDependencyError as exc:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    media_type, extension = user_export.FORMATS[format]
+
+    # Los usuarios se leen por lotes con un cursor del servidor y se envían al escribirlos
+    return StreamingResponse(
+        user_export.stream_export(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{extension}"'},
+    )
+
+
 # region delete users
 @router.get(
     "/delete-user/{user_id}",
@@ -188,17 +371,22 @@ def create_user_post(
     status_code=status.HTTP_200_OK,
     description="Delete a user.",
 )
-def delete_user(request: Request, user: user_dependency, db: db_dependency, user_id: int):
+async def delete_user(request: Request, user: user_dependency, db: async_db_dependency, user_id: int):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
 
     if not db_user:
         return RedirectResponse("/admin/show-users", status_code=status.HTTP_303_SEE_OTHER)
 
-    db.delete(db_user)
-    db.commit()
+    # Las habilidades y carreras se borran con el usuario, en la misma transacción
+    await db.run_sync(update_user_relations, user_id, [], [])
+    await db.delete(db_user)
+    await db.commit()
+    career_affinity.invalidate()
+    similar_students.update_user(user_id, [])
+    data_version.bump(data_version.ENROLLMENTS)
 
     return RedirectResponse("/admin/show-users", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -210,20 +398,54 @@ def delete_user(request: Request, user: user_dependency, db: db_dependency, user
     status_code=status.HTTP_200_OK,
     description="Retrieve the page to add a user to a career.",
 )
-def add_user_to_career(request: Request, user: user_dependency, db: db_dependency):
+async def add_user_to_career(
+    request: Request,
+    user: user_dependency,
+    db: async_db_dependency,
+    after: int | None = None,
+    before: int | None = None,
+    role: str | None = None,
+    is_active: str | None = None,
+    career_status: str | None = None,
+    faculty_id: str | None = None,
+):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    all_users: list[User] = db.query(User).all()
-    all_careers: list[Career] = db.query(Career).all()
+    filters = get_filters(
+        role=role,
+        is_active=is_active,
+        career_status=career_status,
+        faculty_id=faculty_id,
+    )
+
+    page = await keyset_page(
+        db,
+        filter_users(select(User), role, parse_optional_bool(is_active), career_status),
+        User.id,
+        lambda db_user: db_user.id,
+        after=after,
+        before=before,
+    )
+
+    reference = await reference_data.get_reference_data(db)
+    all_careers = [
+        career for career in reference.careers
+        if parse_optional_int(faculty_id) in (None, career.faculty_id)
+    ]
+    all_faculties = reference.faculties
 
     return templates.TemplateResponse(
         "admin/users/add_to_career.html",
         {
             "request": request,
             "role": user["role"],
-            "users": all_users,
+            "users": page.items,
+            "page": page,
+            "filters": filters,
+            "career_statuses": CAREER_STATUSES,
             "careers": all_careers,
+            "faculties": all_faculties,
         }
     )
 
@@ -234,10 +456,10 @@ def add_user_to_career(request: Request, user: user_dependency, db: db_dependenc
     status_code=status.HTTP_200_OK,
     description="Add a user to a career.",
 )
-def add_user_to_career_post(
+async def add_user_to_career_post(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     user_id: Annotated[int, Form(...)],
     career_id: Annotated[int, Form(...)],
 ):
@@ -245,7 +467,10 @@ def add_user_to_career_post(
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
     db.add(UserCareer(user_id=user_id, career_id=career_id, status="pursuing"))
-    db.commit()
+    await db.run_sync(career_skill_counts.add_enrollment, user_id, career_id, "pursuing")
+    await db.commit()
+    career_affinity.invalidate()
+    data_version.bump(data_version.ENROLLMENTS)
 
     return templates.TemplateResponse(
         "admin/index.html",
@@ -263,19 +488,19 @@ def add_user_to_career_post(
     status_code=status.HTTP_200_OK,
     description="Retrieve the details of a user.",
 )
-def user_details(request: Request, user: user_dependency, db: db_dependency, user_id: int):
+async def user_details(request: Request, user: user_dependency, db: async_db_dependency, user_id: int):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
 
     if not db_user:
         return RedirectResponse("/admin/show-users", status_code=status.HTTP_303_SEE_OTHER)
 
-    user_skills = db.query(UserSkill, Skill).join(
-        Skill).filter(UserSkill.user_id == user_id).all()
-    user_careers = db.query(UserCareer, Career).join(
-        Career).filter(UserCareer.user_id == user_id).all()
+    user_skills = (await db.execute(select(UserSkill, Skill).join(
+        Skill).where(UserSkill.user_id == user_id))).all()
+    user_careers = (await db.execute(select(UserCareer, Career).join(
+        Career).where(UserCareer.user_id == user_id))).all()
 
     return templates.TemplateResponse(
         "admin/users/details.html",
@@ -296,21 +521,21 @@ def user_details(request: Request, user: user_dependency, db: db_dependency, use
     status_code=status.HTTP_200_OK,
     description="Retrieve the page to edit a user.",
 )
-def edit_user(request: Request, user: user_dependency, db: db_dependency, user_id: int):
+async def edit_user(request: Request, user: user_dependency, db: async_db_dependency, user_id: int):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
 
     if not db_user:
         return RedirectResponse("/admin/show-users", status_code=status.HTTP_303_SEE_OTHER)
 
-    all_skills: list[Skill] = db.query(Skill).all()
-    user_skills: list[UserSkill] = db.query(UserSkill).filter(
-        UserSkill.user_id == user_id).all()
+    all_skills = (await reference_data.get_reference_data(db)).skills
+    user_skills: list[UserSkill] = (await db.scalars(select(UserSkill).where(
+        UserSkill.user_id == user_id))).all()
     user_skills = [skill.skill_id for skill in user_skills]
-    user_careers = db.query(UserCareer, Career).join(
-        Career).filter(UserCareer.user_id == user_id).all()
+    user_careers = (await db.execute(select(UserCareer, Career).join(
+        Career).where(UserCareer.user_id == user_id))).all()
 
     return templates.TemplateResponse(
         "admin/users/edit.html",
@@ -331,10 +556,10 @@ def edit_user(request: Request, user: user_dependency, db: db_dependency, user_i
     status_code=status.HTTP_200_OK,
     description="Edit a user.",
 )
-def edit_user_post(
+async def edit_user_post(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     user_id: int,
     first_name: Annotated[str, Form(...)],
     last_name: Annotated[str, Form(...)],
@@ -348,13 +573,13 @@ def edit_user_post(
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
 
     if not db_user:
         return RedirectResponse("/admin/show-users", status_code=status.HTTP_303_SEE_OTHER)
 
     # Valida que el email tenga un formato válido
-    if "@" not in email or " " in email or email.count("@") > 1 or email.split("@")[1].count(".") == 0:
+    if not is_valid_email(email):
         return templates.TemplateResponse(
             "admin/users/edit.html",
             {
@@ -371,25 +596,18 @@ def edit_user_post(
     db_user.role = role
     db_user.is_active = is_active
 
-    db.commit()
-
-    db.query(UserSkill).filter(UserSkill.user_id == user_id).delete()
-
-    for skill_id in skill:
-        db.add(UserSkill(user_id=user_id, skill_id=skill_id))
+    # Solo se escriben las habilidades y carreras que cambiaron, y el usuario,
+    # sus relaciones y los conteos se guardan en una sola transacción
+    changes = await db.run_sync(
+        update_user_relations, user_id, skill, zip(career_id, career_status))
+    await db.commit()
 
-    db.commit()
-
-    db.query(UserCareer).filter(UserCareer.user_id == user_id).delete()
-    users_careers: list[UserCareer] = [
-        UserCareer(
-            user_id=user_id,
-            career_id=career_id,
-            status=status
-        ) for career_id, status in zip(career_id, career_status)
-    ]
-    db.add_all(users_careers)
-    db.commit()
+    if changes.counts_changed:
+        career_affinity.invalidate()
+    if changes.skills_changed:
+        similar_students.update_user(user_id, skill)
+    if changes.careers_changed:
+        data_version.bump(data_version.ENROLLMENTS)
 
     return templates.TemplateResponse(
         "admin/index.html",
@@ -407,7 +625,7 @@ def edit_user_post(
     status_code=status.HTTP_200_OK,
     description="Retrieve the page to create a new skill.",
 )
-def create_skill(request: Request, user: user_dependency):
+async def create_skill(request: Request, user: user_dependency):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -426,10 +644,10 @@ def create_skill(request: Request, user: user_dependency):
     status_code=status.HTTP_200_OK,
     description="Create a new skill.",
 )
-def create_skill_post(
+async def create_skill_post(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     name: Annotated[str, Form(...)],
 ):
     if user["role"] != "admin":
@@ -450,7 +668,8 @@ def create_skill_post(
     new_skill = Skill(name=name)
 
     db.add(new_skill)
-    db.commit()
+    await db.commit()
+    reference_data.invalidate()
 
     return templates.TemplateResponse(
         "admin/index.html",
@@ -468,7 +687,7 @@ def create_skill_post(
     status_code=status.HTTP_200_OK,
     description="Retrieve the page to create a new faculty.",
 )
-def create_faculty(request: Request, user: user_dependency):
+async def create_faculty(request: Request, user: user_dependency):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -487,10 +706,10 @@ def create_faculty(request: Request, user: user_dependency):
     status_code=status.HTTP_200_OK,
     description="Create a new faculty.",
 )
-def create_faculty_post(
+async def create_faculty_post(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     name: Annotated[str, Form(...)],
 ):
     if user["role"] != "admin":
@@ -511,7 +730,8 @@ def create_faculty_post(
     new_faculty = Faculty(name=name)
 
     db.add(new_faculty)
-    db.commit()
+    await db.commit()
+    reference_data.invalidate()
 
     return templates.TemplateResponse(
         "admin/index.html",
@@ -529,11 +749,11 @@ def create_faculty_post(
     status_code=status.HTTP_200_OK,
     description="Retrieve the page to create a new career.",
 )
-def create_career(request: Request, user: user_dependency, db: db_dependency):
+async def create_career(request: Request, user: user_dependency, db: async_db_dependency):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    all_faculties: list[Faculty] = db.query(Faculty).all()
+    all_faculties = (await reference_data.get_reference_data(db)).faculties
 
     return templates.TemplateResponse(
         "admin/careers/create.html",
@@ -551,10 +771,10 @@ def create_career(request: Request, user: user_dependency, db: db_dependency):
     status_code=status.HTTP_200_OK,
     description="Create a new career.",
 )
-def create_career_post(
+async def create_career_post(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     name: Annotated[str, Form(...)],
     description: Annotated[str, Form(...)],
     semesters: Annotated[int, Form(...)],
@@ -616,7 +836,9 @@ def create_career_post(
     )
 
     db.add(new_career)
-    db.commit()
+    await db.commit()
+    career_affinity.invalidate()
+    reference_data.invalidate()
 
     return templates.TemplateResponse(
         "admin/index.html",
@@ -632,20 +854,45 @@ def create_career_post(
     "/show-careers",
     response_class=HTMLResponse,
     status_code=status.HTTP_200_OK,
-    description="Retrieve all the careers.",
+    description="Retrieve a page of careers.",
 )
-def show_careers(request: Request, user: user_dependency, db: db_dependency):
+async def show_careers(
+    request: Request,
+    user: user_dependency,
+    db: async_db_dependency,
+    after: int | None = None,
+    before: int | None = None,
+    faculty_id: str | None = None,
+):
     if user["role"] != "admin":
         return RedirectResponse("/users", status_code=status.HTTP_303_SEE_OTHER)
 
-    all_careers: list[Career, Faculty] = db.query(
-        Career, Faculty).join(Faculty).all()
+    filters = get_filters(faculty_id=faculty_id)
+
+    careers_statement = select(Career, Faculty, CareerStats).join(Faculty).outerjoin(CareerStats)
+    if parse_optional_int(faculty_id) is not None:
+        careers_statement = careers_statement.where(
+            Career.faculty_id == parse_optional_int(faculty_id))
+
+    page = await keyset_page(
+        db,
+        careers_statement,
+        Career.id,
+        lambda row: row[0].id,
+        after=after,
+        before=before,
+    )
+
+    all_faculties = (await reference_data.get_reference_data(db)).faculties
 
     return templates.TemplateResponse(
         "admin/careers/show.html",
         {
             "request": request,
             "role": user["role"],
-            "careers": all_careers,
+            "careers": page.items,
+            "page": page,
+            "filters": filters,
+            "faculties": all_faculties,
         }
     )
@@ -0,0 +1,239 @@
+"""
+Report of the careers with the highest affinity for every student.
+
+The users are read in chunks of `REPORT_CHUNK_SIZE`, in id order. Each chunk
+becomes a user × skill matrix of 0 and 1 that is multiplied by the skill ×
+career weights of the `CareerAffinityIndex`, which gives the affinity of
+every user of the chunk with every career in one product. The chunks are
+ranked and written as CSV in a process pool, while the next chunks are
+read from the database, and the CSV is sent as soon as each chunk is ready,
+so the report never holds more than a few chunks in memory.
+
+Each worker of the app keeps one pool, started by the first report and
+started again only when the index changes, and computes one report at a
+time; the others wait for it.
+"""
+import asyncio
+import csv
+import io
+from collections import deque
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sqlalchemy import select
+from db.db_connection import AsyncSessionLocal
+from db.schema import User, UserSkill
+from users.helpers import career_affinity
+from settings import settings
+
+# Número de procesos que calculan el reporte
+REPORT_WORKERS = settings.report_workers
+# Número de usuarios que se calculan juntos
+REPORT_CHUNK_SIZE = settings.report_chunk_size
+# Número máximo de carreras por usuario
+MAX_TOP = 20
+
+# Datos de la matriz de afinidad en cada proceso del pool
+_worker_state: dict = {}
+
+# region process pool
+_executor: ProcessPoolExecutor = None
+_executor_version: tuple[int, int] = None
+_semaphore: asyncio.Semaphore = None
+_semaphore_loop: asyncio.AbstractEventLoop = None
+
+
+def _init_worker(
+    skill_ids: np.ndarray,
+    weights: np.ndarray,
+    totals: np.ndarray,
+    career_ids: np.ndarray,
+    career_names: list[str],
+) -> None:
+    _worker_state.update(
+        skill_ids=skill_ids,
+        weights=weights,
+        totals=totals,
+        career_ids=career_ids,
+        career_names=career_names,
+    )
+
+
+def rank_chunk(
+    users: list[tuple[int, str, str, str]],
+    pair_users: np.ndarray,
+    pair_skills: np.ndarray,
+    top: int,
+) -> str:
+    """
+    Ranks the careers of a chunk of users and writes their CSV rows.
+
+    It runs in a process of the pool, with the weights set by `_init_worker`.
+
+    Args:
+        users (list[tuple[int, str, str, str]]): The id, email, first name and last name of
+            each user, ordered by id.
+        pair_users (np.ndarray): The user id of each (user, skill) pair.
+        pair_skills (np.ndarray): The skill id of each pair.
+        top (int): The number of careers of each user.
+
+    Returns:
+        str: The CSV rows of the users.
+    """
+    skill_ids = _worker_state["skill_ids"]
+    weights = _worker_state["weights"]
+    totals = _worker_state["totals"]
+    career_ids = _worker_state["career_ids"]
+    career_names = _worker_state["career_names"]
+
+    user_ids = np.fromiter((user[0] for user in users), dtype=np.int64, count=len(users))
+
+    # Solo cuentan las habilidades que tienen peso en alguna carrera, de los
+    # usuarios del bloque (el rango de ids también incluye a los admins)
+    known = np.isin(pair_skills, skill_ids) & np.isin(pair_users, user_ids)
+    rows = np.searchsorted(user_ids, pair_users[known])
+    columns = np.searchsorted(skill_ids, pair_skills[known])
+
+    matrix = np.zeros((len(users), len(skill_ids)), dtype=np.float64)
+    matrix[rows, columns] = 1
+
+    # Las mismas operaciones que CareerAffinityIndex.percentages, para cada usuario
+    scores = matrix @ weights
+    ratios = np.divide(scores, totals, out=np.zeros_like(scores), where=totals > 0)
+    percentages = np.round(ratios * 100, 2)
+    order = np.argsort(-percentages, axis=1, kind="stable")[:, :top]
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for row, user in enumerate(users):
+        matches = []
+        for position in order[row].tolist():
+            matches += [
+                int(career_ids[position]),
+                career_names[position],
+                float(percentages[row, position]),
+            ]
+        writer.writerow([*user, *matches])
+
+    return output.getvalue()
+
+
+def _get_executor(index: career_affinity.CareerAffinityIndex) -> ProcessPoolExecutor:
+    global _executor, _executor_version
+
+    # Los procesos reciben la matriz al arrancar, hay que reemplazarlos si el índice cambió
+    if _executor is None or _executor_version != index.version:
+        shutdown_executor()
+        skill_ids, weights = index.dense_weights()
+        _executor = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS,
+            initializer=_init_worker,
+            initargs=(skill_ids, weights, index.totals, index.career_ids, index.career_names),
+        )
+        _executor_version = index.version
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore, _semaphore_loop
+
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(1)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def shutdown_executor() -> None:
+    """
+    Stops the report process pool, if it was started.
+    """
+    global _executor, _executor_version
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _executor_version = None
+
+
+def get_header(top: int) -> str:
+    """
+    Builds the header of the report.
+
+    Args:
+        top (int): The number of careers of each user.
+
+    Returns:
+        str: The CSV header row.
+    """
+    output = io.StringIO()
+    csv.writer(output).writerow([
+        "user_id", "email", "first_name", "last_name",
+        *(
+            column
+            for rank in range(1, top + 1)
+            for column in (f"career_id_{rank}", f"career_{rank}", f"affinity_{rank}")
+        ),
+    ])
+    return output.getvalue()
+
+
+async def stream_report(top: int = 3) -> AsyncIterator[str]:
+    """
+    Computes the careers with the highest affinity of every user with the "user" role.
+
+    Args:
+        top (int): The number of careers of each user, at most MAX_TOP.
+
+    Returns:
+        AsyncIterator[str]: The CSV of the report, one chunk of users at a time.
+    """
+    # Un reporte a la vez por worker, los demás esperan su turno
+    async with _get_semaphore(), AsyncSessionLocal() as db:
+        # La sesión de la petición se cierra antes de enviar la respuesta
+        index = await db.run_sync(career_affinity.get_index)
+        top = max(1, min(top, MAX_TOP, len(index.career_ids)))
+
+        yield get_header(top)
+
+        if not len(index.career_ids):
+            return
+
+        executor = _get_executor(index)
+        loop = asyncio.get_running_loop()
+        pending = deque()
+
+        try:
+            last_id = 0
+            while True:
+                users = (await db.execute(
+                    select(User.id, User.email, User.first_name, User.last_name).where(
+                        User.role == "user", User.id > last_id,
+                    ).order_by(User.id).limit(REPORT_CHUNK_SIZE)
+                )).all()
+
+                if not users:
+                    break
+
+                last_id = users[-1].id
+                pairs = (await db.execute(
+                    select(UserSkill.user_id, UserSkill.skill_id).where(
+                        UserSkill.user_id.between(users[0].id, last_id))
+                )).all()
+                pairs = np.fromiter(
+                    (value for pair in pairs for value in pair), dtype=np.int64, count=2 * len(pairs),
+                ).reshape(-1, 2)
+
+                pending.append(loop.run_in_executor(
+                    executor, rank_chunk, [tuple(user) for user in users], pairs[:, 0], pairs[:, 1], top))
+
+                # Se leen los siguientes usuarios mientras el pool calcula los anteriores
+                if len(pending) > REPORT_WORKERS:
+                    yield await pending.popleft()
+
+            while pending:
+                yield await pending.popleft()
+        finally:
+            # Si la descarga se corta, los bloques que no empezaron no ocupan el pool
+            for future in pending:
+                future.cancel()
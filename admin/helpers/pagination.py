@@ -0,0 +1,118 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+PAGE_SIZE = 50
+
+
+@dataclass
+class Page:
+    """
+    A page of a keyset paginated listing.
+
+    Attributes:
+        items (list): The rows of the page.
+        next_cursor (int | None): The `after` value of the next page, None on the last page.
+        previous_cursor (int | None): The `before` value of the previous page, None on the first page.
+    """
+
+    items: list
+    next_cursor: int | None
+    previous_cursor: int | None
+
+
+async def keyset_page(
+    db: AsyncSession,
+    statement: Select,
+    id_column: InstrumentedAttribute,
+    id_of: Callable[[Any], int],
+    after: int | None = None,
+    before: int | None = None,
+    limit: int = PAGE_SIZE,
+) -> Page:
+    """
+    Retrieves one page of a statement ordered by an id column.
+
+    The page starts right after `after` or ends right before `before`, so the
+    database only reads the rows of the page no matter how deep it is.
+
+    Args:
+        db (AsyncSession): The database session.
+        statement (Select): The statement with the filters of the listing.
+        id_column (InstrumentedAttribute): The unique column used as cursor.
+        id_of (Callable[[Any], int]): Returns the id of a row of the result.
+        after (int | None): Return the rows with an id greater than this one.
+        before (int | None): Return the rows with an id lower than this one.
+        limit (int): The number of rows per page.
+
+    Returns:
+        Page: The rows of the page and the cursors of the next and previous pages.
+    """
+    if before is not None:
+        statement = statement.where(id_column < before).order_by(id_column.desc())
+    else:
+        if after is not None:
+            statement = statement.where(id_column > after)
+        statement = statement.order_by(id_column.asc())
+
+    result = await db.execute(statement.limit(limit + 1))
+    rows = result.scalars().all() if len(statement.column_descriptions) == 1 else result.all()
+
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+
+    if before is not None:
+        rows.reverse()
+        return Page(
+            items=rows,
+            next_cursor=id_of(rows[-1]) if rows else None,
+            previous_cursor=id_of(rows[0]) if rows and has_more else None,
+        )
+
+    return Page(
+        items=rows,
+        next_cursor=id_of(rows[-1]) if rows and has_more else None,
+        previous_cursor=id_of(rows[0]) if rows and after is not None else None,
+    )
+
+
+def parse_optional_int(value: str | None) -> int | None:
+    """
+    Converts a filter of a form to an int, empty values mean no filter.
+
+    Args:
+        value (str | None): The value of the filter.
+
+    Returns:
+        int | None: The value as an int, or None.
+    """
+    return int(value) if value and value.strip().isdigit() else None
+
+
+def parse_optional_bool(value: str | None) -> bool | None:
+    """
+    Converts a "true"/"false" filter of a form to a bool, other values mean no filter.
+
+    Args:
+        value (str | None): The value of the filter.
+
+    Returns:
+        bool | None: The value as a bool, or None.
+    """
+    return {"true": True, "false": False}.get((value or "").lower())
+
+
+def get_filters(**values: str | None) -> dict[str, str]:
+    """
+    Keeps the filters of a listing that have a value, to repeat them in the links of its pages.
+
+    Args:
+        **values (str | None): The filters, by name.
+
+    Returns:
+        dict[str, str]: The filters with a non empty value.
+    """
+    return {name: value for name, value in values.items() if value}
@@ -0,0 +1,223 @@
+"""
+Export of every user with their skills and careers.
+
+The users are read with a server-side cursor, `EXPORT_BATCH_SIZE` at a
+time, and the skills and careers of each batch are read by user id range,
+so the export never holds more than one batch in memory, whatever the size
+of the tables. Each batch is written and sent before the next one is read.
+
+The rows have the same columns as the files of `admin.helpers.user_import`
+(without the password): in CSV, skills are skill ids separated by ";" and
+careers "career_id:status" pairs separated by ";"; in NDJSON, skills is a
+list of ids and careers a list of {"career_id": ..., "status": ...}
+objects. Parquet and Arrow (IPC stream) files need pyarrow, which is
+imported by the first export in one of those formats.
+"""
+import csv
+import importlib.util
+import io
+from collections import defaultdict
+from collections.abc import AsyncIterator
+import orjson
+from sqlalchemy import select
+from db.db_connection import AsyncSessionLocal
+from db.schema import User, UserCareer, UserSkill
+
+# pyarrow es opcional, para Parquet y Arrow (ver _import_pyarrow)
+pa = pq = None
+
+# Número de usuarios que se leen y se escriben a la vez
+EXPORT_BATCH_SIZE = 5000
+
+# Tipo de contenido y extensión de cada formato
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+COLUMNS = ("id", "email", "first_name", "last_name", "role", "is_active", "created_at", "skills", "careers")
+
+
+class MissingDependencyError(RuntimeError):
+    """
+    Raised when a format needs a library that is not installed.
+    """
+
+
+class _ChunkSink:
+    """
+    Write-only file whose content is taken after every batch.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _import_pyarrow() -> None:
+    global pa, pq
+
+    # Importarlo tarda, así que no se hace al arrancar la aplicación
+    if pa is None:
+        import pyarrow
+        import pyarrow.parquet
+
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def check_format(format: str) -> None:
+    """
+    Checks that a format can be exported.
+
+    Args:
+        format (str): One of FORMATS.
+
+    Raises:
+        ValueError: If the format is unknown.
+        MissingDependencyError: If the format needs pyarrow and it is not installed.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}.")
+    if format in ("parquet", "arrow") and importlib.util.find_spec("pyarrow") is None:
+        raise MissingDependencyError(f"The {format} export needs pyarrow (pip install pyarrow).")
+
+
+def get_schema():
+    """
+    Builds the Arrow schema of the export.
+
+    Returns:
+        pyarrow.Schema: The schema of the Parquet and Arrow files.
+    """
+    _import_pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("email", pa.string()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("role", pa.string()),
+        ("is_active", pa.bool_()),
+        ("created_at", pa.timestamp("us")),
+        ("skills", pa.list_(pa.int64())),
+        ("careers", pa.list_(pa.struct([("career_id", pa.int64()), ("status", pa.string())]))),
+    ])
+
+
+def write_csv(rows: list[dict]) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for row in rows:
+        writer.writerow([
+            *(row[column] for column in COLUMNS[:5]),
+            int(row["is_active"]) if row["is_active"] is not None else "",
+            row["created_at"].isoformat() if row["created_at"] else "",
+            ";".join(map(str, row["skills"])),
+            ";".join(f"{career['career_id']}:{career['status']}" for career in row["careers"]),
+        ])
+    return output.getvalue().encode()
+
+
+def write_ndjson(rows: list[dict]) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+async def _read_batches(batch_size: int) -> AsyncIterator[list[dict]]:
+    # La sesión de la petición se cierra antes de enviar la respuesta
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(
+                User.id, User.email, User.first_name, User.last_name,
+                User.role, User.is_active, User.created_at,
+            ).order_by(User.id).execution_options(yield_per=batch_size)
+        )
+
+        async for users in result.partitions():
+            first_id, last_id = users[0].id, users[-1].id
+
+            skills = defaultdict(list)
+            for user_id, skill_id in await db.execute(
+                select(UserSkill.user_id, UserSkill.skill_id).where(
+                    UserSkill.user_id.between(first_id, last_id)
+                ).order_by(UserSkill.user_id, UserSkill.skill_id)
+            ):
+                skills[user_id].append(skill_id)
+
+            careers = defaultdict(list)
+            for user_id, career_id, status in await db.execute(
+                select(UserCareer.user_id, UserCareer.career_id, UserCareer.status).where(
+                    UserCareer.user_id.between(first_id, last_id)
+                ).order_by(UserCareer.user_id, UserCareer.career_id)
+            ):
+                careers[user_id].append({"career_id": career_id, "status": status})
+
+            yield [
+                {
+                    **user._asdict(),
+                    "skills": skills.get(user.id, []),
+                    "careers": careers.get(user.id, []),
+                }
+                for user in users
+            ]
+
+
+def _arrow_writer(format: str, sink: _ChunkSink):
+    file = pa.PythonFile(sink, mode="w")
+    if format == "parquet":
+        return pq.ParquetWriter(file, get_schema())
+    return pa.ipc.new_stream(file, get_schema())
+
+
+async def stream_export(format: str = "csv", batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Exports every user with their skills and careers.
+
+    Args:
+        format (str): One of FORMATS, checked with `check_format`.
+        batch_size (int): The number of users read and written at a time.
+
+    Returns:
+        AsyncIterator[bytes]: The file, one batch of users at a time.
+    """
+    if format == "csv":
+        yield (",".join(COLUMNS) + "\r\n").encode()
+        async for rows in _read_batches(batch_size):
+            yield write_csv(rows)
+        return
+
+    if format == "ndjson":
+        async for rows in _read_batches(batch_size):
+            yield write_ndjson(rows)
+        return
+
+    # Parquet y Arrow: cada lote es un row group o un record batch
+    _import_pyarrow()
+    sink = _ChunkSink()
+    writer = _arrow_writer(format, sink)
+    schema = get_schema()
+
+    try:
+        async for rows in _read_batches(batch_size):
+            batch = pa.RecordBatch.from_pylist(rows, schema=schema)
+            writer.write_batch(batch)
+            yield sink.take()
+    finally:
+        writer.close()
+
+    yield sink.take()
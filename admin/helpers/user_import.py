@@ -0,0 +1,358 @@
+"""
+Bulk import of users from CSV or JSONL files.
+
+The file is read as a stream and processed in batches: the rows of a batch
+are validated with the same rules as the create user form, their passwords
+are hashed in parallel in the import process pool and the users, their
+skills and their careers are inserted with one executemany per table in a
+single transaction.
+
+CSV files need a header with the columns first_name, last_name, email,
+password, role (optional, "user" by default), skills (skill ids separated
+by ";") and careers ("career_id:status" pairs separated by ";"). JSONL
+files have one object per line with the same keys, where skills is a list
+of ids and careers a list of {"career_id": ..., "status": ...} objects.
+
+Usage:
+    python -m admin.helpers.user_import students.csv
+    python -m admin.helpers.user_import students.jsonl --batch-size 500
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import BinaryIO
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from admin.helpers.validation import is_valid_email
+from db import career_skill_counts, data_version
+from db.db_connection import SessionLocal
+from db.schema import CAREER_STATUSES, Career, Skill, User, UserCareer, UserSkill
+from users.helpers.password_encryption import hash_passwords
+
+BATCH_SIZE = 1000
+
+
+class RowError(ValueError):
+    """
+    Raised when a row of the file is not valid.
+    """
+
+
+@dataclass
+class UserRow:
+    line: int
+    first_name: str
+    last_name: str
+    email: str
+    password: str
+    role: str
+    skills: list[int]
+    careers: list[tuple[int, str]]
+
+
+@dataclass
+class ImportProgress:
+    """
+    Progress of an import, reported after every batch.
+
+    Attributes:
+        processed (int): The number of rows read.
+        imported (int): The number of users inserted.
+        errors (list[tuple[int, str]]): The (line, message) of each rejected row.
+    """
+
+    processed: int = 0
+    imported: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+def read_rows(file: BinaryIO, format: str) -> Iterator[tuple[int, dict | RowError]]:
+    """
+    Reads the rows of a CSV or JSONL file one at a time.
+
+    Args:
+        file (BinaryIO): The file, opened in binary mode.
+        format (str): "csv" or "jsonl".
+
+    Returns:
+        Iterator[tuple[int, dict | RowError]]: The line and content of each row,
+            or the error if it could not be parsed.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, content in enumerate(text, start=1):
+        if not content.strip():
+            continue
+        try:
+            row = json.loads(content)
+        except json.JSONDecodeError as exc:
+            yield line, RowError(f"Invalid JSON: {exc.msg}.")
+            continue
+        if not isinstance(row, dict):
+            yield line, RowError("Each line must be a JSON object.")
+            continue
+        yield line, row
+
+
+def _parse_skills(value) -> list[int]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = [skill for skill in value.split(";") if skill.strip()]
+    try:
+        return [int(skill) for skill in value]
+    except (TypeError, ValueError):
+        raise RowError("The skills must be skill ids.")
+
+
+def _parse_careers(value) -> list[tuple[int, str]]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = [career.split(":", 1)
+                 for career in value.split(";") if career.strip()]
+
+    careers = []
+    for career in value:
+        if isinstance(career, dict):
+            career = (career.get("career_id"), career.get("status"))
+        try:
+            career_id, status = career
+            careers.append((int(career_id), str(status).strip()))
+        except (TypeError, ValueError):
+            raise RowError(
+                "The careers must be career_id:status pairs.")
+    return careers
+
+
+def validate_row(
+    line: int,
+    row: dict,
+    skill_ids: set[int],
+    career_ids: set[int],
+) -> UserRow:
+    """
+    Validates a row with the same rules as the create user form.
+
+    Args:
+        line (int): The line of the row in the file.
+        row (dict): The content of the row.
+        skill_ids (set[int]): The ids of the existing skills.
+        career_ids (set[int]): The ids of the existing careers.
+
+    Returns:
+        UserRow: The validated row.
+
+    Raises:
+        RowError: If the row is not valid.
+    """
+    email = str(row.get("email") or "").strip()
+    first_name = str(row.get("first_name") or "").strip()
+    last_name = str(row.get("last_name") or "").strip()
+    password = str(row.get("password") or "")
+    role = str(row.get("role") or "user").strip()
+
+    if not is_valid_email(email):
+        raise RowError("The email is not valid.")
+
+    if not first_name:
+        raise RowError("The first name is required.")
+
+    if not password:
+        raise RowError("The password is required.")
+
+    skills = _parse_skills(row.get("skills"))
+    careers = _parse_careers(row.get("careers"))
+
+    unknown_skills = set(skills) - skill_ids
+    if unknown_skills:
+        raise RowError(
+            f"Unknown skills: {', '.join(map(str, sorted(unknown_skills)))}.")
+
+    for career_id, status in careers:
+        if career_id not in career_ids:
+            raise RowError(f"Unknown career: {career_id}.")
+        if status not in CAREER_STATUSES:
+            raise RowError(f"Unknown career status: {status}.")
+
+    if len({career_id for career_id, _ in careers}) != len(careers):
+        raise RowError("A career is repeated.")
+
+    return UserRow(
+        line=line,
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        password=password,
+        role=role,
+        skills=sorted(set(skills)),
+        careers=careers,
+    )
+
+
+def _insert_batch(db: Session, batch: list[UserRow]) -> None:
+    hashed_passwords = hash_passwords([row.password for row in batch])
+
+    db.execute(insert(User), [
+        {
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "email": row.email,
+            "hashed_password": hashed_password,
+            "role": row.role,
+        }
+        for row, hashed_password in zip(batch, hashed_passwords)
+    ])
+
+    user_ids = dict(db.execute(
+        select(User.email, User.id).where(
+            User.email.in_([row.email for row in batch]))
+    ).all())
+
+    users_skills = [
+        {"user_id": user_ids[row.email], "skill_id": skill_id}
+        for row in batch
+        for skill_id in row.skills
+    ]
+    users_careers = [
+        {"user_id": user_ids[row.email], "career_id": career_id, "status": status}
+        for row in batch
+        for career_id, status in row.careers
+    ]
+
+    if users_skills:
+        db.execute(insert(UserSkill), users_skills)
+    if users_careers:
+        db.execute(insert(UserCareer), users_careers)
+
+    career_skill_counts.apply_counts(db, Counter(
+        (career_id, status, skill_id)
+        for row in batch
+        for career_id, status in row.careers
+        for skill_id in row.skills
+    ))
+
+    db.commit()
+
+
+def import_users(
+    db: Session,
+    rows: Iterable[tuple[int, dict | RowError]],
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[ImportProgress]:
+    """
+    Validates and inserts users in batches.
+
+    Rows with errors are skipped and reported; the valid rows are still imported.
+
+    Args:
+        db (Session): The database session.
+        rows (Iterable[tuple[int, dict | RowError]]): The rows, as returned by `read_rows`.
+        batch_size (int): The number of users inserted per transaction.
+
+    Returns:
+        Iterator[ImportProgress]: The progress after each batch. The last one is the final result.
+    """
+    skill_ids = set(db.scalars(select(Skill.id)))
+    career_ids = set(db.scalars(select(Career.id)))
+    seen_emails: set[str] = set()
+
+    progress = ImportProgress()
+    batch: list[UserRow] = []
+
+    def flush_batch() -> None:
+        existing = set(db.scalars(select(User.email).where(
+            User.email.in_([row.email for row in batch]))))
+
+        for row in batch:
+            if row.email in existing:
+                progress.errors.append(
+                    (row.line, "The email is already registered."))
+
+        valid = [row for row in batch if row.email not in existing]
+        if valid:
+            _insert_batch(db, valid)
+            progress.imported += len(valid)
+
+        batch.clear()
+
+    for line, row in rows:
+        progress.processed += 1
+
+        try:
+            if isinstance(row, RowError):
+                raise row
+            user_row = validate_row(line, row, skill_ids, career_ids)
+            if user_row.email in seen_emails:
+                raise RowError("The email is repeated in the file.")
+        except RowError as exc:
+            progress.errors.append((line, str(exc)))
+            continue
+
+        seen_emails.add(user_row.email)
+        batch.append(user_row)
+
+        if len(batch) >= batch_size:
+            flush_batch()
+            yield progress
+
+    if batch:
+        flush_batch()
+    yield progress
+
+
+def get_format(filename: str) -> str:
+    """
+    Infers the format of an import file from its name.
+
+    Args:
+        filename (str): The name of the file.
+
+    Returns:
+        str: "jsonl" for .jsonl and .ndjson files, "csv" otherwise.
+    """
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import users from a CSV or JSONL file.")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    format = args.format or get_format(args.file)
+    progress = ImportProgress()
+
+    with open(args.file, "rb") as file, SessionLocal() as db:
+        for progress in import_users(db, read_rows(file, format), args.batch_size):
+            print(
+                f"{progress.processed} rows read, {progress.imported} users imported, "
+                f"{len(progress.errors)} errors",
+                file=sys.stderr,
+            )
+
+    if progress.imported:
+        data_version.bump(data_version.ENROLLMENTS)
+        data_version.bump(data_version.USER_SKILLS)
+        data_version.bump(data_version.CAREER_SKILLS)
+
+    for line, message in progress.errors:
+        print(f"line {line}: {message}")
+
+    return 1 if progress.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
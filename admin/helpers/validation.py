@@ -0,0 +1,16 @@
+def is_valid_email(email: str) -> bool:
+    """
+    Checks that an email has a valid format: one "@", no spaces and a domain with a dot.
+
+    Args:
+        email (str): The email to check.
+
+    Returns:
+        bool: True if the email is valid, False otherwise.
+    """
+    return not (
+        "@" not in email
+        or " " in email
+        or email.count("@") > 1
+        or email.split("@")[1].count(".") == 0
+    )
@@ -0,0 +1,107 @@
+# region imports
+import orjson
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
+from db import reference_data
+from db.db_connection import async_db_dependency
+from compare_careers.helpers.career_comparison import get_career_summaries
+from compare_careers.helpers.page_cache import cached_page, get_data_version
+from users.helpers import suggestion_cache
+from users.helpers.jwt_token import api_user_dependency
+
+# region setup
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["api"],
+    default_response_class=ORJSONResponse,
+)
+
+
+# region careers
+@router.get(
+    "/careers",
+    status_code=status.HTTP_200_OK,
+    description="Get every career.",
+)
+async def get_careers(request: Request, db: async_db_dependency):
+    async def render() -> bytes:
+        careers = (await reference_data.get_reference_data(db)).careers
+        return orjson.dumps([career._asdict() for career in careers])
+
+    # Las mismas respuestas que las páginas públicas, con su ETag
+    key = ("api-careers", get_data_version())
+    return await cached_page(request, key, render, ORJSONResponse.media_type)
+
+
+@router.get(
+    "/careers/{career_id_1}/compare/{career_id_2}",
+    status_code=status.HTTP_200_OK,
+    description="Compare the faculty, duration and students of two careers.",
+)
+async def get_career_comparison(
+    request: Request,
+    db: async_db_dependency,
+    career_id_1: int,
+    career_id_2: int,
+):
+    async def render() -> bytes:
+        careers = await get_career_summaries(db, [career_id_1, career_id_2])
+
+        if career_id_1 not in careers or career_id_2 not in careers:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Career not found.",
+            )
+
+        return orjson.dumps({"careers": [careers[career_id_1], careers[career_id_2]]})
+
+    key = ("api-comparison", career_id_1, career_id_2, get_data_version())
+    return await cached_page(request, key, render, ORJSONResponse.media_type)
+
+
+# region users
+@router.get(
+    "/careers/{career_id}/skill-comparison",
+    status_code=status.HTTP_200_OK,
+    description="Compare the skills of the user with the skills of the students of a career.",
+)
+async def get_skill_comparison(
+    user: api_user_dependency,
+    db: async_db_dependency,
+    career_id: int,
+):
+    careers = (await reference_data.get_reference_data(db)).careers
+    if not any(career.id == career_id for career in careers):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Career not found.",
+        )
+
+    user_skills, comparison = await suggestion_cache.get_skill_comparison(db, user["id"], career_id)
+    user_skill_ids = [skill.id for skill in user_skills]
+
+    return ORJSONResponse({
+        "career_id": career_id,
+        "user_skills": user_skill_ids,
+        "statuses": {
+            skill_status: {
+                "percentage": comparison["percentages"][skill_status],
+                "skills": [
+                    {"id": skill_id, "name": name, "students": students, "weight": weight}
+                    for skill_id, name, students, weight in skills
+                ],
+            }
+            for skill_status, skills in comparison["skills_by_status"].items()
+        },
+    })
+
+
+@router.get(
+    "/suggestions",
+    status_code=status.HTTP_200_OK,
+    description="Rank the careers by the affinity of the user with the skills of their graduated students.",
+)
+async def get_suggestions(user: api_user_dependency, db: async_db_dependency):
+    suggestions = await suggestion_cache.get_suggestions(db, user["id"])
+
+    return ORJSONResponse([suggestion._asdict() for suggestion in suggestions])
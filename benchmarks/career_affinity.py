@@ -0,0 +1,118 @@
+"""
+Benchmark of the career affinity ranking of one user.
+
+Compares the previous per-career Python computation of
+`suggest_career_by_skills_of_graduated_students` with `CareerAffinityIndex`
+on synthetic data. The previous version also issued one SQL query per
+career; that cost is not included, so the real speedup is larger.
+
+Usage:
+    python -m benchmarks.career_affinity --careers 500 --skills 10000
+"""
+import argparse
+import random
+import timeit
+import numpy as np
+from users.helpers.skill_comparison import balance_skills
+from users.helpers.career_affinity import CareerAffinityIndex
+
+
+def legacy_percentages(skills_of_graduated_students_of_all_careers, user_id_skills):
+    balanced_skills_of_graduated_students_of_all_careers = [
+        balance_skills(skills_of_graduated_students)
+        for skills_of_graduated_students in skills_of_graduated_students_of_all_careers
+    ]
+
+    sum_of_graduated_students_of_all_careers = [
+        sum([skill[2] for skill in balanced_skills_of_graduated_students])
+        for balanced_skills_of_graduated_students in balanced_skills_of_graduated_students_of_all_careers
+    ]
+
+    pursuing_user_skills_of_all_careers = [
+        [
+            skill for skill in balanced_skills_of_graduated_students if skill[0] in user_id_skills
+        ]
+        for balanced_skills_of_graduated_students in balanced_skills_of_graduated_students_of_all_careers
+    ]
+
+    sum_of_pursuing_user_skills_of_all_careers = [
+        sum([skill[2] for skill in pursuing_user_skills])
+        for pursuing_user_skills in pursuing_user_skills_of_all_careers
+    ]
+
+    return [
+        round((sum_of_pursuing_user_skills / sum_of_graduated_students) * 100, 2)
+        for sum_of_pursuing_user_skills, sum_of_graduated_students in zip(sum_of_pursuing_user_skills_of_all_careers, sum_of_graduated_students_of_all_careers)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--careers", type=int, default=500)
+    parser.add_argument("--skills", type=int, default=10_000)
+    parser.add_argument("--skills-per-career", type=int, default=300)
+    parser.add_argument("--user-skills", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    skill_ids = range(1, args.skills + 1)
+
+    counts = []
+    skills_of_graduated_students_of_all_careers = []
+    for career_id in range(1, args.careers + 1):
+        rows = [
+            (skill_id, f"skill {skill_id}", rng.randint(1, 500))
+            for skill_id in rng.sample(skill_ids, args.skills_per_career)
+        ]
+        # El mismo orden que el ROW_NUMBER() de balanced_skills_query
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        skills_of_graduated_students_of_all_careers.append(rows)
+        counts.extend((career_id, skill_id, count)
+                      for skill_id, _, count in rows)
+
+    user_id_skills = rng.sample(skill_ids, args.user_skills)
+
+    index = CareerAffinityIndex(
+        range(1, args.careers + 1),
+        (f"career {career_id}" for career_id in range(1, args.careers + 1)),
+        counts,
+    )
+
+    assert np.allclose(
+        index.percentages(user_id_skills),
+        legacy_percentages(
+            skills_of_graduated_students_of_all_careers, user_id_skills),
+        atol=0.01,
+    )
+
+    legacy = min(timeit.repeat(
+        lambda: legacy_percentages(
+            skills_of_graduated_students_of_all_careers, user_id_skills),
+        number=1,
+        repeat=args.repeat,
+    ))
+    vectorized = min(timeit.repeat(
+        lambda: index.percentages(user_id_skills),
+        number=1,
+        repeat=args.repeat,
+    ))
+    build = min(timeit.repeat(
+        lambda: CareerAffinityIndex(
+            range(1, args.careers + 1),
+            (f"career {career_id}" for career_id in range(1, args.careers + 1)),
+            counts,
+        ),
+        number=1,
+        repeat=3,
+    ))
+
+    print(f"careers={args.careers} skills={args.skills} user_skills={args.user_skills}")
+    print(f"legacy:     {legacy * 1000:9.3f} ms per user")
+    print(f"vectorized: {vectorized * 1000:9.3f} ms per user")
+    print(f"speedup:    {legacy / vectorized:9.1f}x")
+    print(f"index build: {build * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Benchmark of every route of `users`, `admin`, `compare_careers` and `api`.
+
+The app runs in this process and the requests go through its ASGI
+interface, one at a time, so the numbers measure the app and the database
+and not the network. For each route it reports the p50/p95/p99 latency and
+the number of SQL statements per request, and saves everything as JSON so
+two runs can be compared.
+
+Most routes have a budget of SQL statements per request. A route that sends
+more fails the run (exit code 1) and the statements it repeated are listed,
+which is how an N+1 shows up; run the app with `CRAFTERS_SQL_DEBUG=true` to
+see them in the logs too.
+
+Fill the database first with `python -m benchmarks.generate_dataset`. The
+write routes create their own users, skills, faculties and careers (named
+"bench-...") and the delete route removes the users created by the run.
+
+Usage:
+    python -m benchmarks.endpoints --output before.json
+    python -m benchmarks.endpoints --output after.json --compare before.json
+    python -m benchmarks.endpoints --only compare_careers --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple
+import httpx
+import numpy as np
+from sqlalchemy import func, select
+from db.db_connection import SessionLocal, engine
+from db.query_stats import assert_query_budget, track_queries
+from db.schema import Career, Faculty, Skill, User, UserCareer, UserSkill
+
+ADMIN_EMAIL = "admin@admin.admin"
+ADMIN_PASSWORD = "admin"
+USER_PASSWORD = "password"
+
+# Las rutas que calculan un hash de bcrypt son lentas a propósito
+SLOW_ITERATIONS = 10
+
+
+class Case(NamedTuple):
+    """
+    A route to benchmark.
+
+    Attributes:
+        name (str): The name in the report.
+        method (str): The HTTP method.
+        path (Callable[[int, dict], str]): Builds the path of the i-th request.
+        as_user (str | None): "admin", "user" or None for anonymous requests.
+        data (Callable[[int, dict], dict] | None): Builds the form of the i-th request.
+        files (Callable[[int, dict], dict] | None): Builds the files of the i-th request.
+        slow (bool): Whether to send at most SLOW_ITERATIONS requests.
+        max_queries (int | None): The most SQL statements a request may send,
+            with the caches of the app empty.
+    """
+
+    name: str
+    method: str
+    path: Callable[[int, dict], str]
+    as_user: str | None = None
+    data: Callable[[int, dict], dict] | None = None
+    files: Callable[[int, dict], dict] | None = None
+    slow: bool = False
+    max_queries: int | None = None
+
+
+def _fixed(path: str) -> Callable[[int, dict], str]:
+    return lambda i, context: path
+
+
+CASES = [
+    # region users
+    Case("users.read_users", "GET", _fixed("/users/"), "user", max_queries=0),
+    Case("users.sign_up", "GET", _fixed("/users/sign-up")),
+    Case("users.create_user", "POST", _fixed("/users/sign-up"), data=lambda i, context: {
+        "first_name": "bench", "last_name": "sign up",
+        "email": f"bench-{context['run']}-signup-{i}@crafters.test",
+        "password": USER_PASSWORD, "password_confirmation": USER_PASSWORD,
+        "skill": context["skill_ids"][:3],
+    }, slow=True, max_queries=3),
+    Case("users.log_in", "GET", _fixed("/users/log-in")),
+    Case("users.log_in_user", "POST", _fixed("/users/log-in"), data=lambda i, context: {
+        "email": context["user_email"], "password": USER_PASSWORD,
+    }, slow=True, max_queries=1),
+    Case("users.compare_skills", "GET", _fixed("/users/compare-skills"), "user", max_queries=4),
+    Case("users.compare_skills_post", "POST", _fixed("/users/compare-skills"), "user",
+         data=lambda i, context: {"career_id": context["career_ids"][i % len(context["career_ids"])]},
+         max_queries=5),
+    Case("users.suggest_career", "GET",
+         _fixed("/users/suggest-career-by-skills-of-graduated-students"), "user", max_queries=4),
+    Case("users.similar_students", "GET", _fixed("/users/similar-students"), "user", max_queries=4),
+    Case("users.log_out", "GET", _fixed("/users/log-out"), "user"),
+    # region compare careers
+    Case("compare_careers.index", "GET", _fixed("/public/compare_careers/"), max_queries=3),
+    Case("compare_careers.compare", "POST", _fixed("/public/compare_careers/"), data=lambda i, context: {
+        "career_id_1": context["career_ids"][0],
+        "career_id_2": context["career_ids"][1 + i % (len(context["career_ids"]) - 1)],
+    }, max_queries=1),
+    Case("compare_careers.comparison", "GET", lambda i, context: (
+        f"/public/compare_careers/{context['career_ids'][0]}/"
+        f"{context['career_ids'][1 + i % (len(context['career_ids']) - 1)]}"
+    ), max_queries=1),
+    # region api
+    Case("api.careers", "GET", _fixed("/api/v1/careers"), max_queries=3),
+    Case("api.compare_careers", "GET", lambda i, context: (
+        f"/api/v1/careers/{context['career_ids'][0]}/compare/"
+        f"{context['career_ids'][1 + i % (len(context['career_ids']) - 1)]}"
+    ), max_queries=1),
+    Case("api.skill_comparison", "GET", lambda i, context: (
+        f"/api/v1/careers/{context['career_ids'][i % len(context['career_ids'])]}/skill-comparison"
+    ), "user", max_queries=5),
+    Case("api.suggestions", "GET", _fixed("/api/v1/suggestions"), "user", max_queries=4),
+    # region admin
+    Case("admin.welcome", "GET", _fixed("/admin/"), "admin"),
+    Case("admin.show_users", "GET", _fixed("/admin/show-users"), "admin", max_queries=1),
+    Case("admin.show_users_filtered", "GET",
+         _fixed("/admin/show-users?role=user&is_active=true&career_status=graduado"), "admin",
+         max_queries=1),
+    Case("admin.show_users_deep_page", "GET",
+         lambda i, context: f"/admin/show-users?after={context['deep_user_id']}", "admin", max_queries=1),
+    Case("admin.show_careers", "GET", _fixed("/admin/show-careers"), "admin", max_queries=4),
+    Case("admin.user_details", "GET",
+         lambda i, context: f"/admin/user-details/{context['user_id']}", "admin", max_queries=3),
+    Case("admin.edit_user", "GET",
+         lambda i, context: f"/admin/edit-user/{context['user_id']}", "admin", max_queries=6),
+    Case("admin.create_user", "GET", _fixed("/admin/create-user"), "admin"),
+    Case("admin.add_user_to_career", "GET", _fixed("/admin/add-user-to-career"), "admin", max_queries=4),
+    Case("admin.create_skill", "GET", _fixed("/admin/create-skill"), "admin"),
+    Case("admin.create_faculty", "GET", _fixed("/admin/create-faculty"), "admin"),
+    Case("admin.create_career", "GET", _fixed("/admin/create-career"), "admin"),
+    Case("admin.import_users", "GET", _fixed("/admin/import-users"), "admin"),
+    Case("admin.create_user_post", "POST", _fixed("/admin/create-user"), "admin", data=lambda i, context: {
+        "first_name": "bench", "last_name": "admin",
+        "email": f"bench-{context['run']}-admin-{i}@crafters.test",
+        "password": USER_PASSWORD, "password_confirmation": USER_PASSWORD,
+        "role": "user", "skill": context["skill_ids"][:3],
+    }, slow=True, max_queries=3),
+    Case("admin.import_users_post", "POST", _fixed("/admin/import-users"), "admin", files=lambda i, context: {
+        "file": (f"bench-{i}.csv", (
+            "first_name,last_name,email,password,skills,careers\n"
+            f"bench,import,bench-{context['run']}-import-{i}@crafters.test,{USER_PASSWORD},"
+            f"{context['skill_ids'][0]},{context['career_ids'][0]}:cursando\n"
+        ).encode(), "text/csv"),
+    }, slow=True, max_queries=8),
+    Case("admin.edit_user_post", "POST",
+         lambda i, context: f"/admin/edit-user/{context['bench_user_ids'][i % len(context['bench_user_ids'])]}",
+         "admin", data=lambda i, context: {
+             "first_name": "bench", "last_name": "edited",
+             "email": context["bench_user_emails"][i % len(context["bench_user_ids"])],
+             "role": "user", "skill": context["skill_ids"][i % 5:i % 5 + 3],
+             "career_id": context["career_ids"][:1],
+             "career_status": ["graduado" if i % 2 else "cursando"],
+             "is_active": True,
+         }, max_queries=12),
+    Case("admin.add_user_to_career_post", "POST", _fixed("/admin/add-user-to-career"), "admin",
+         data=lambda i, context: {
+             "user_id": context["bench_user_ids"][i % len(context["bench_user_ids"])],
+             "career_id": context["career_ids"][1 + i % (len(context["career_ids"]) - 1)],
+         }, max_queries=8),
+    Case("admin.create_skill_post", "POST", _fixed("/admin/create-skill"), "admin",
+         data=lambda i, context: {"name": f"bench-{context['run']}-skill-{i}"}, max_queries=1),
+    Case("admin.create_faculty_post", "POST", _fixed("/admin/create-faculty"), "admin",
+         data=lambda i, context: {"name": f"bench-{context['run']}-faculty-{i}"}, max_queries=1),
+    Case("admin.create_career_post", "POST", _fixed("/admin/create-career"), "admin", data=lambda i, context: {
+        "name": f"bench-{context['run']}-career-{i}", "description": "bench",
+        "semesters": 8, "credits": 200, "faculty_id": context["faculty_id"],
+    }, max_queries=1),
+    Case("admin.delete_user", "GET",
+         lambda i, context: f"/admin/delete-user/{context['bench_user_ids'][i % len(context['bench_user_ids'])]}",
+         "admin", max_queries=18),
+]
+
+# Las rutas que usan los usuarios creados por las rutas anteriores
+BENCH_USER_CASES = ("admin.edit_user_post", "admin.add_user_to_career_post", "admin.delete_user")
+
+
+def get_dataset_size() -> dict[str, int]:
+    with SessionLocal() as db:
+        return {
+            model.__tablename__: db.scalar(select(func.count()).select_from(model))
+            for model in (User, Skill, Career, Faculty, UserSkill, UserCareer)
+        }
+
+
+def get_context(run: str) -> dict:
+    """
+    Reads the ids used by the requests of the benchmark.
+
+    Args:
+        run (str): The identifier of the run, used in the names of the rows it creates.
+
+    Returns:
+        dict: The ids and emails used to build the requests.
+    """
+    with SessionLocal() as db:
+        user_id, user_email = db.execute(
+            select(User.id, User.email).join(UserCareer).join(
+                UserSkill, UserSkill.user_id == User.id
+            ).where(User.role == "user").order_by(User.id).limit(1)
+        ).one()
+        users = db.scalar(select(func.count()).select_from(User))
+        deep_user_id = db.scalar(
+            select(User.id).order_by(User.id).offset(users * 9 // 10).limit(1))
+
+        return {
+            "run": run,
+            "user_id": user_id,
+            "user_email": user_email,
+            "deep_user_id": deep_user_id or 0,
+            "career_ids": db.scalars(select(Career.id).order_by(Career.id).limit(20)).all(),
+            "skill_ids": db.scalars(select(Skill.id).order_by(Skill.id).limit(20)).all(),
+            "faculty_id": db.scalar(select(Faculty.id).order_by(Faculty.id).limit(1)),
+        }
+
+
+def get_bench_users(run: str) -> tuple[list[int], list[str]]:
+    with SessionLocal() as db:
+        rows = db.execute(select(User.id, User.email).where(
+            User.email.like(f"bench-{run}-%")).order_by(User.id)).all()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+async def log_in(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/users/log-in", data={"email": email, "password": password})
+    token = response.cookies.get("access_token")
+    if not token:
+        raise RuntimeError(f"Could not log in as {email}.")
+    return token
+
+
+def summarize(timings: list[float], queries: list[int], statuses: Counter) -> dict:
+    milliseconds = np.array(timings) * 1000
+    return {
+        "requests": len(timings),
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+        "mean_ms": round(float(milliseconds.mean()), 3),
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 3),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+    }
+
+
+async def run_case(
+    client: httpx.AsyncClient,
+    case: Case,
+    context: dict,
+    cookies: dict[str, str],
+    iterations: int,
+) -> dict:
+    if case.slow:
+        iterations = min(iterations, SLOW_ITERATIONS)
+
+    headers = {}
+    if case.as_user:
+        headers["Cookie"] = f"access_token={cookies[case.as_user]}"
+
+    timings, queries, statuses = [], [], Counter()
+    over_budget = None
+
+    for i in range(iterations):
+        path = case.path(i, context)
+        data = case.data(i, context) if case.data else None
+        files = case.files(i, context) if case.files else None
+
+        # Se guarda el primer error, con las sentencias repetidas
+        if case.max_queries is not None and over_budget is None:
+            tracker = assert_query_budget(case.max_queries, case.name)
+        else:
+            tracker = track_queries(case.name, shapes=False)
+
+        start = time.perf_counter()
+        try:
+            with tracker as stats:
+                response = await client.request(
+                    case.method, path, data=data, files=files, headers=headers)
+        except AssertionError as exc:
+            over_budget = str(exc)
+        timings.append(time.perf_counter() - start)
+        queries.append(stats.count)
+        statuses[response.status_code] += 1
+
+    result = summarize(timings, queries, statuses)
+    result["max_queries"] = max(queries)
+    result["query_budget"] = case.max_queries
+    result["over_budget"] = over_budget
+    return result
+
+
+async def run(iterations: int, only: str | None) -> dict:
+    # La aplicación se importa aquí para no cargarla al leer --help
+    import main
+
+    # ASGITransport no ejecuta el lifespan, que prepara la base de datos
+    async with main.app.router.lifespan_context(main.app):
+        return await run_cases(main.app, iterations, only)
+
+
+async def run_cases(app, iterations: int, only: str | None) -> dict:
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    context = get_context(run_id)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        cookies = {
+            "admin": await log_in(client, ADMIN_EMAIL, ADMIN_PASSWORD),
+            "user": await log_in(client, context["user_email"], USER_PASSWORD),
+        }
+
+        for case in CASES:
+            if only and only not in case.name:
+                continue
+
+            # Las rutas que editan o borran usan los usuarios creados por esta ejecución
+            if case.name in BENCH_USER_CASES:
+                if "bench_user_ids" not in context:
+                    context["bench_user_ids"], context["bench_user_emails"] = get_bench_users(run_id)
+                if not context["bench_user_ids"]:
+                    print(f"{case.name}: skipped, no users created by this run", file=sys.stderr)
+                    continue
+
+            results[case.name] = await run_case(
+                client, case, context, cookies, iterations)
+            result = results[case.name]
+            print(
+                f"{case.name:40} p50 {result['p50_ms']:9.2f}ms  p95 {result['p95_ms']:9.2f}ms  "
+                f"p99 {result['p99_ms']:9.2f}ms  {result['queries_per_request']:6.1f} queries "
+                f"(max {result['max_queries']})",
+                file=sys.stderr,
+            )
+
+    return results
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, previous: dict) -> None:
+    print(f"\n{'route':40} {'p50 before':>11} {'p50 after':>11} {'change':>8} {'queries':>15}")
+    for name, result in results.items():
+        before = previous["results"].get(name)
+        if not before:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("nan")
+        print(
+            f"{name:40} {before['p50_ms']:10.2f}ms {result['p50_ms']:10.2f}ms {change:7.2f}x "
+            f"{before['queries_per_request']:6.1f} -> {result['queries_per_request']:<6.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every route of the app in-process.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--only", help="Only run the routes whose name contains this text.")
+    parser.add_argument("--output", help="Save the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare with the results of a previous run.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.iterations, args.only))
+
+    report = {
+        "metadata": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "database": engine.url.get_backend_name(),
+            "dataset": get_dataset_size(),
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+    # Las rutas que envían más sentencias que su presupuesto, con las repetidas
+    over_budget = [result["over_budget"] for result in results.values() if result["over_budget"]]
+    for message in over_budget:
+        print(f"\n{message}", file=sys.stderr)
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Local OpenID Connect provider that stands in for Google in tests and load tests.
+
+It serves the discovery document, the signing keys, a consent page that
+redirects back at once, the token endpoint and the userinfo endpoint. Any
+code is accepted: the ID token is signed with an RSA key generated at
+start, for the user `<code>@fake-oauth.test`. `/stats` counts the requests
+of each endpoint, to check that the app reuses the cached documents and
+does not ask the userinfo endpoint.
+
+Usage:
+    python -m benchmarks.fake_oauth --port 9000
+    CRAFTERS_OAUTH_ISSUER=http://127.0.0.1:9000 CRAFTERS_OAUTH_CLIENT_ID=fake \
+        CRAFTERS_OAUTH_CLIENT_SECRET=fake python main.py
+    python -m benchmarks.load_test --url http://localhost:8000 --path "/login-code?code=bench"
+"""
+import argparse
+import hashlib
+import secrets
+import time
+from collections import Counter
+from typing import Annotated
+from urllib.parse import urlencode
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Form, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+from jose import jwk, jwt
+
+KEY_ID = "fake-oauth-1"
+# Segundos que el proveedor deja guardar el documento de discovery y las claves
+MAX_AGE = 3600
+TOKEN_LIFETIME = 3600
+
+_private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+PRIVATE_KEY = _private_key.private_bytes(
+    serialization.Encoding.PEM,
+    serialization.PrivateFormat.PKCS8,
+    serialization.NoEncryption(),
+).decode()
+PUBLIC_JWK = {
+    **jwk.construct(_private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode(), "RS256").to_dict(),
+    "kid": KEY_ID,
+    "use": "sig",
+}
+
+CACHE_HEADERS = {"Cache-Control": f"public, max-age={MAX_AGE}"}
+
+app = FastAPI()
+requests = Counter()
+# Access token -> email del usuario
+access_tokens: dict[str, str] = {}
+
+
+def get_issuer(request: Request) -> str:
+    return str(request.base_url).rstrip("/")
+
+
+def get_profile(email: str) -> dict:
+    name = email.split("@")[0]
+    return {
+        "sub": str(int(hashlib.sha256(email.encode()).hexdigest()[:16], 16)),
+        "email": email,
+        "email_verified": True,
+        "name": f"{name} Fake",
+        "given_name": name,
+        "family_name": "Fake",
+        "locale": "es",
+    }
+
+
+@app.get("/.well-known/openid-configuration")
+async def discovery(request: Request):
+    requests["discovery"] += 1
+    issuer = get_issuer(request)
+    return JSONResponse({
+        "issuer": issuer,
+        "authorization_endpoint": f"{issuer}/auth",
+        "token_endpoint": f"{issuer}/token",
+        "userinfo_endpoint": f"{issuer}/userinfo",
+        "jwks_uri": f"{issuer}/certs",
+        "response_types_supported": ["code"],
+        "subject_types_supported": ["public"],
+        "id_token_signing_alg_values_supported": ["RS256"],
+    }, headers=CACHE_HEADERS)
+
+
+@app.get("/certs")
+async def certs():
+    requests["certs"] += 1
+    return JSONResponse({"keys": [PUBLIC_JWK]}, headers=CACHE_HEADERS)
+
+
+@app.get("/auth")
+async def auth(redirect_uri: str, state: str | None = None):
+    requests["auth"] += 1
+    params = {"code": secrets.token_urlsafe(8)}
+    if state is not None:
+        params["state"] = state
+    return RedirectResponse(f"{redirect_uri}?{urlencode(params)}", status_code=302)
+
+
+@app.post("/token")
+async def token(
+    request: Request,
+    code: Annotated[str, Form()],
+    client_id: Annotated[str, Form()],
+    grant_type: Annotated[str, Form()],
+):
+    requests["token"] += 1
+    if grant_type != "authorization_code":
+        raise HTTPException(status_code=400, detail="unsupported_grant_type")
+
+    email = f"{code}@fake-oauth.test"
+    access_token = secrets.token_urlsafe(24)
+    access_tokens[access_token] = email
+
+    now = int(time.time())
+    id_token = jwt.encode(
+        {
+            **get_profile(email),
+            "iss": get_issuer(request),
+            "aud": client_id,
+            "iat": now,
+            "exp": now + TOKEN_LIFETIME,
+        },
+        PRIVATE_KEY,
+        algorithm="RS256",
+        headers={"kid": KEY_ID},
+        access_token=access_token,
+    )
+
+    return {
+        "access_token": access_token,
+        "expires_in": TOKEN_LIFETIME,
+        "token_type": "Bearer",
+        "scope": "openid email profile",
+        "id_token": id_token,
+    }
+
+
+@app.get("/userinfo")
+async def userinfo(authorization: Annotated[str | None, Header()] = None):
+    requests["userinfo"] += 1
+    email = access_tokens.get((authorization or "").removeprefix("Bearer "))
+    if email is None:
+        raise HTTPException(status_code=401, detail="invalid_token")
+
+    profile = get_profile(email)
+    return {"id": profile.pop("sub"), "verified_email": profile.pop("email_verified"), **profile}
+
+
+@app.get("/stats")
+async def stats():
+    return dict(requests)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local OpenID Connect provider.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
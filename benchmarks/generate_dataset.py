@@ -0,0 +1,250 @@
+"""
+Fills the database with a synthetic dataset for the benchmarks.
+
+The distributions are skewed like real data: a few skills and careers are
+far more popular than the rest (Zipf), every career has a set of typical
+skills that most of its students have, most students are enrolled in one
+career and some in two, and the statuses follow a fixed mix.
+
+The rows are added after the existing ones with explicit ids and inserted
+with one executemany per batch. Every generated user has the password
+"password" and an email like student123@crafters.test.
+
+Usage:
+    python -m benchmarks.generate_dataset
+    python -m benchmarks.generate_dataset --users 1000000 --skills 5000 --careers 300 --faculties 50
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from db import career_skill_counts, data_version
+from db.db_connection import SessionLocal
+from db.migrations import upgrade_database
+from db.schema import CAREER_STATUSES, Career, Faculty, Skill, User, UserCareer, UserSkill
+from users.helpers.password_encryption import hash_password
+
+MAX_USERS = 1_000_000
+MAX_SKILLS = 5_000
+MAX_CAREERS = 300
+MAX_FACULTIES = 50
+
+BATCH_SIZE = 10_000
+
+# Proporción de estudiantes en cada estado, en el orden de CAREER_STATUSES
+STATUS_WEIGHTS = (0.55, 0.30, 0.10, 0.05)
+
+# Proporción de estudiantes con una y con dos carreras
+CAREERS_PER_USER_WEIGHTS = (0.85, 0.15)
+
+SKILLS_PER_USER = 8
+TYPICAL_SKILLS_PER_CAREER = 40
+
+# Probabilidad de que una habilidad de un estudiante sea típica de su carrera
+TYPICAL_SKILL_PROBABILITY = 0.7
+
+
+def zipf_weights(size: int, exponent: float = 1.1) -> np.ndarray:
+    """
+    Builds normalized Zipf weights, the first item being the most popular.
+
+    Args:
+        size (int): The number of items.
+        exponent (float): How skewed the distribution is.
+
+    Returns:
+        np.ndarray: The probability of each item.
+    """
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _next_id(db: Session, column) -> int:
+    return (db.scalar(select(func.max(column))) or 0) + 1
+
+
+def _insert(db: Session, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def generate(
+    db: Session,
+    users: int,
+    skills: int,
+    careers: int,
+    faculties: int,
+    seed: int = 0,
+) -> dict[str, int]:
+    """
+    Inserts a synthetic dataset.
+
+    Args:
+        db (Session): The database session.
+        users (int): The number of users.
+        skills (int): The number of skills.
+        careers (int): The number of careers.
+        faculties (int): The number of faculties.
+        seed (int): The seed of the random generator, the same seed gives the same data.
+
+    Returns:
+        dict[str, int]: The number of rows inserted in each table.
+    """
+    rng = np.random.default_rng(seed)
+
+    first_faculty = _next_id(db, Faculty.id)
+    first_career = _next_id(db, Career.id)
+    first_skill = _next_id(db, Skill.id)
+    first_user = _next_id(db, User.id)
+
+    faculty_ids = np.arange(first_faculty, first_faculty + faculties)
+    career_ids = np.arange(first_career, first_career + careers)
+    skill_ids = np.arange(first_skill, first_skill + skills)
+
+    _insert(db, Faculty, [
+        {"id": int(faculty_id), "name": f"Faculty {faculty_id}"}
+        for faculty_id in faculty_ids
+    ])
+
+    # Las facultades grandes tienen más carreras
+    career_faculties = rng.choice(faculty_ids, size=careers, p=zipf_weights(faculties, 0.8))
+    _insert(db, Career, [
+        {
+            "id": int(career_id),
+            "name": f"Career {career_id}",
+            "description": f"Description of career {career_id}",
+            "semesters": int(rng.integers(6, 13)),
+            "credits": int(rng.integers(150, 400)),
+            "faculty_id": int(faculty_id),
+        }
+        for career_id, faculty_id in zip(career_ids, career_faculties)
+    ])
+
+    _insert(db, Skill, [
+        {"id": int(skill_id), "name": f"skill-{skill_id}"}
+        for skill_id in skill_ids
+    ])
+    db.commit()
+
+    skill_weights = zipf_weights(skills)
+    career_weights = zipf_weights(careers, 0.9)
+    typical_skills = [
+        rng.choice(skill_ids, size=min(TYPICAL_SKILLS_PER_CAREER, skills), replace=False, p=skill_weights)
+        for _ in range(careers)
+    ]
+
+    # Todos los usuarios comparten el hash, calcular uno por usuario tardaría horas
+    hashed_password = hash_password("password")
+    created_at = datetime.now()
+
+    inserted = {"users": 0, "users_skills": 0, "users_careers": 0}
+
+    for start in range(0, users, BATCH_SIZE):
+        size = min(BATCH_SIZE, users - start)
+        user_ids = np.arange(first_user + start, first_user + start + size)
+
+        _insert(db, User, [
+            {
+                "id": int(user_id),
+                "email": f"student{user_id}@crafters.test",
+                "hashed_password": hashed_password,
+                "first_name": f"Student {user_id}",
+                "last_name": "Crafters",
+                "role": "user",
+                "is_active": bool(active),
+                "created_at": created_at - timedelta(days=int(days)),
+            }
+            for user_id, active, days in zip(
+                user_ids,
+                rng.random(size) > 0.05,
+                rng.integers(0, 5 * 365, size),
+            )
+        ])
+
+        users_careers = []
+        first_careers = np.empty(size, dtype=np.int64)
+        careers_per_user = rng.choice((1, 2), size=size, p=CAREERS_PER_USER_WEIGHTS)
+        statuses = rng.choice(len(CAREER_STATUSES), size=(size, 2), p=STATUS_WEIGHTS)
+
+        for index, user_id in enumerate(user_ids):
+            user_careers = rng.choice(
+                careers, size=min(careers_per_user[index], careers), replace=False, p=career_weights)
+            first_careers[index] = user_careers[0]
+            for number, career in enumerate(user_careers):
+                users_careers.append({
+                    "user_id": int(user_id),
+                    "career_id": int(career_ids[career]),
+                    "status": CAREER_STATUSES[statuses[index, number]],
+                })
+
+        users_skills = []
+        skills_per_user = np.clip(rng.poisson(SKILLS_PER_USER, size), 1, skills)
+        for index, user_id in enumerate(user_ids):
+            count = skills_per_user[index]
+            typical = rng.random(count) < TYPICAL_SKILL_PROBABILITY
+            chosen = np.concatenate((
+                rng.choice(typical_skills[first_careers[index]], size=typical.sum()),
+                rng.choice(skill_ids, size=count - typical.sum(), p=skill_weights),
+            ))
+            users_skills.extend(
+                {"user_id": int(user_id), "skill_id": int(skill_id)}
+                for skill_id in np.unique(chosen)
+            )
+
+        _insert(db, UserSkill, users_skills)
+        _insert(db, UserCareer, users_careers)
+        db.commit()
+
+        inserted["users"] += size
+        inserted["users_skills"] += len(users_skills)
+        inserted["users_careers"] += len(users_careers)
+        print(f"{inserted['users']}/{users} users", file=sys.stderr)
+
+    inserted["career_skill_counts"] = career_skill_counts.rebuild(db)
+    inserted |= {"skills": skills, "careers": careers, "faculties": faculties}
+    return inserted
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fill the database with a synthetic dataset.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--skills", type=int, default=500)
+    parser.add_argument("--careers", type=int, default=50)
+    parser.add_argument("--faculties", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    limits = {
+        "users": (args.users, MAX_USERS),
+        "skills": (args.skills, MAX_SKILLS),
+        "careers": (args.careers, MAX_CAREERS),
+        "faculties": (args.faculties, MAX_FACULTIES),
+    }
+    for name, (value, maximum) in limits.items():
+        if not 1 <= value <= maximum:
+            parser.error(f"--{name} must be between 1 and {maximum}")
+
+    upgrade_database()
+
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        inserted = generate(
+            db, args.users, args.skills, args.careers, args.faculties, args.seed)
+
+    # Los cachés de cada worker deben leer los datos nuevos
+    data_version.bump(data_version.REFERENCE)
+    data_version.bump(data_version.ENROLLMENTS)
+    data_version.bump(data_version.USER_SKILLS)
+    data_version.bump(data_version.CAREER_SKILLS)
+
+    for table, rows in inserted.items():
+        print(f"{table}: {rows}")
+    print(f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
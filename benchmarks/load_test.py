@@ -0,0 +1,133 @@
+"""
+Concurrency load test against a running server.
+
+Keeps `--concurrency` requests open against one path and reports the
+throughput and the latency percentiles.
+
+With `--in-process` the app runs in this process, as a single worker, and the
+report also includes the highest number of requests the app had in flight at
+the same time and the highest number of threadpool slots in use. Sync
+endpoints hold one slot each, so the anyio thread limit (40 by default) caps
+them; async endpoints do not need one.
+
+Usage:
+    python -m benchmarks.load_test --in-process --path /public/compare_careers/ --concurrency 200
+    python -m benchmarks.load_test --url http://localhost:8000 --path /users/compare-skills --cookie access_token=...
+"""
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+import anyio.to_thread
+import httpx
+
+
+class InFlight:
+    """
+    ASGI wrapper that counts the requests in flight inside the app.
+
+    It also samples the threadpool slots in use every time a request finishes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.current = 0
+        self.peak = 0
+        self.peak_threads = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter = anyio.to_thread.current_default_thread_limiter()
+            self.peak_threads = max(self.peak_threads, limiter.borrowed_tokens)
+            self.current -= 1
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    path: str,
+    deadline: float,
+    latencies: list[float],
+    errors: list[str],
+) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 400:
+                errors.append(str(response.status_code))
+        except httpx.HTTPError as exc:
+            errors.append(type(exc).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+    cookies = dict(cookie.split("=", 1) for cookie in args.cookie)
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    latencies: list[float] = []
+    errors: list[str] = []
+    in_flight = None
+    transport = None
+    lifespan = contextlib.nullcontext()
+
+    if args.in_process:
+        from main import app
+
+        in_flight = InFlight(app)
+        transport = httpx.ASGITransport(app=in_flight)
+        # ASGITransport no ejecuta el lifespan, que prepara la base de datos
+        lifespan = app.router.lifespan_context(app)
+
+    async with lifespan, httpx.AsyncClient(
+        base_url=args.url,
+        transport=transport,
+        cookies=cookies,
+        limits=limits,
+        timeout=args.timeout,
+        follow_redirects=False,
+    ) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            worker(client, args.path, deadline, latencies, errors)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+
+    print(f"path={args.path} concurrency={args.concurrency} duration={elapsed:.1f}s")
+    print(f"requests:   {len(latencies)} ({len(errors)} errors)")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"p50/p95/p99: {quantiles[49] * 1000:.1f} / {quantiles[94] * 1000:.1f} / {quantiles[98] * 1000:.1f} ms")
+
+    if in_flight:
+        print(f"peak in flight: {in_flight.peak}")
+        print(f"peak threadpool slots: {in_flight.peak_threads}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run the app in this process instead of using --url")
+    parser.add_argument("--path", default="/public/compare_careers/")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--cookie", action="append", default=[],
+                        help="name=value, can be repeated")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
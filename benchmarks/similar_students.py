@@ -0,0 +1,88 @@
+"""
+Benchmark of the similar students search of one user.
+
+Compares a scan of the skills of every user, which is what a query over
+`users_skills` has to do, with `SimilarStudentsIndex` on synthetic data
+where the popularity of the skills follows a Zipf distribution, like in
+`benchmarks.generate_dataset`.
+
+Usage:
+    python -m benchmarks.similar_students --users 1000000 --skills 5000
+"""
+import argparse
+import time
+import timeit
+import numpy as np
+from users.helpers.similar_students import SimilarStudentsIndex
+
+
+def scan_similar(skills_of_users: list[frozenset[int]], query: frozenset[int], k: int, exclude: int):
+    scores = []
+    for user_id, skills in enumerate(skills_of_users):
+        shared = len(query & skills)
+        if shared and user_id != exclude:
+            scores.append((-shared / len(query | skills), user_id, shared))
+    scores.sort()
+    return [(user_id, -score, shared) for score, user_id, shared in scores[:k]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--skills", type=int, default=5000)
+    parser.add_argument("--user-skills", type=int, default=7)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scans", type=int, default=3)
+    parser.add_argument("--checks", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    # Popularidad Zipf: las primeras habilidades las tiene casi la mitad de los usuarios
+    popularity = 1 / np.arange(1, args.skills + 1)
+    popularity /= popularity.sum()
+    counts = rng.integers(1, 2 * args.user_skills, size=args.users)
+    user_ids = np.repeat(np.arange(args.users), counts)
+    skill_ids = rng.choice(np.arange(1, args.skills + 1), size=len(user_ids), p=popularity)
+    pairs = np.unique(np.stack([user_ids, skill_ids], axis=1), axis=0)
+
+    start = time.perf_counter()
+    index = SimilarStudentsIndex(pairs[:, 0], pairs[:, 1])
+    build = time.perf_counter() - start
+
+    queries = [
+        (int(user_id), frozenset(pairs[pairs[:, 0] == user_id, 1].tolist()))
+        for user_id in rng.choice(args.users, size=args.queries, replace=False)
+    ]
+
+    skills_of_users = [frozenset() for _ in range(args.users)]
+    splits = np.flatnonzero(np.diff(pairs[:, 0])) + 1
+    for user_skills in np.split(pairs, splits):
+        skills_of_users[int(user_skills[0, 0])] = frozenset(user_skills[:, 1].tolist())
+
+    for user_id, query in queries[:args.checks]:
+        assert index.similar(query, args.k, exclude=user_id) == scan_similar(
+            skills_of_users, query, args.k, user_id)
+
+    timings = sorted(
+        min(timeit.repeat(lambda: index.similar(query, args.k, exclude=user_id), number=1, repeat=3))
+        for user_id, query in queries
+    )
+    scan = min(timeit.repeat(
+        lambda: scan_similar(skills_of_users, queries[0][1], args.k, queries[0][0]),
+        number=1,
+        repeat=args.scans,
+    ))
+
+    memory = index.postings.nbytes + index.offsets.nbytes + index.sizes.nbytes + index.skill_ids.nbytes
+
+    print(f"users={args.users} skills={args.skills} pairs={len(pairs)} k={args.k}")
+    print(f"scan:        {scan * 1000:9.3f} ms per user")
+    print(f"index p50:   {timings[len(timings) // 2] * 1000:9.3f} ms per user")
+    print(f"index p99:   {timings[int(len(timings) * 0.99)] * 1000:9.3f} ms per user")
+    print(f"index build: {build * 1000:9.3f} ms, {memory / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
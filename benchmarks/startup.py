@@ -0,0 +1,157 @@
+"""
+Benchmark of the cold start of a worker.
+
+Each run starts a new Python process with `-X importtime` that imports
+`main` and runs the lifespan of the app, against an empty SQLite database
+in a temporary directory. The first run prepares the database (migrations
+and the admin user) like the first worker of a deployment; the others find
+it ready, like the rest of the workers and every `reload=True` cycle.
+
+The run fails (exit code 1) when the median import of `main` takes longer
+than the budget, when importing `main` loads one of the modules that must
+be imported lazily or touches the database, or when the lifespan imports
+alembic although the database is ready.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --budget-ms 1500 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milisegundos que puede tardar `import main` (mediana)
+IMPORT_BUDGET_MS = 2500
+# Módulos que solo se importan cuando se usan, nunca al importar main
+LAZY_MODULES = ("alembic", "httpx", "uvicorn", "pyarrow")
+
+CHILD = """
+import asyncio, json, os, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+database_touched = os.path.exists(os.environ["STARTUP_DATABASE"])
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(start())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": (time.perf_counter() - imported) * 1000,
+    "database_touched": database_touched,
+}))
+"""
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int]]:
+    """
+    Reads the report of `python -X importtime`.
+
+    Args:
+        output (str): The standard error of the process.
+
+    Returns:
+        list[tuple[str, int, int]]: The (module, self µs, cumulative µs) of each import,
+            in the order they finished.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|")
+        imports.append((module.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def run_once(directory: str) -> dict:
+    database = os.path.join(directory, "startup.db")
+    env = os.environ | {
+        "CRAFTERS_DATABASE_URL": f"sqlite:///{database}",
+        "CRAFTERS_DATA_VERSION_DIR": os.path.join(directory, "data_version"),
+        "CRAFTERS_BCRYPT_ROUNDS": "4",
+        "STARTUP_DATABASE": database,
+    }
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+
+    imports = parse_importtime(process.stderr)
+    # Lo que se importa después de main es del lifespan
+    main_position = next(i for i, (module, _, _) in enumerate(imports) if module == "main")
+
+    return {
+        **json.loads(process.stdout.splitlines()[-1]),
+        "imports": imports[:main_position + 1],
+        "lifespan_imports": [module for module, _, _ in imports[main_position + 1:]],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure the cold start of a worker.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="Show the slowest imports.")
+    parser.add_argument("--output", help="Save the results to this JSON file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [run_once(directory) for _ in range(max(2, args.runs))]
+
+    first, warm = runs[0], runs[1:]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    main_cumulative_ms = statistics.median(run["imports"][-1][2] / 1000 for run in runs)
+    warm_lifespan_ms = statistics.median(run["lifespan_ms"] for run in warm)
+
+    print(
+        f"import main:             {import_ms:7.1f}ms "
+        f"(importtime {main_cumulative_ms:.1f}ms, budget {args.budget_ms:.0f}ms)"
+    )
+    print(f"lifespan, first worker:  {first['lifespan_ms']:7.1f}ms (migrations and admin user)")
+    print(f"lifespan, other workers: {warm_lifespan_ms:7.1f}ms")
+    print("\nslowest imports of main (self time, last run):")
+    for module, self_us, cumulative_us in sorted(runs[-1]["imports"], key=lambda item: -item[1])[:args.top]:
+        print(f"  {module:50} {self_us / 1000:8.1f}ms  (cumulative {cumulative_us / 1000:.1f}ms)")
+
+    errors = []
+    if import_ms > args.budget_ms:
+        errors.append(f"import main took {import_ms:.1f}ms, the budget is {args.budget_ms:.0f}ms.")
+    eager = sorted({
+        module.split(".")[0] for module, _, _ in runs[-1]["imports"]
+        if module.split(".")[0] in LAZY_MODULES
+    })
+    if eager:
+        errors.append(f"import main imported {', '.join(eager)}, which must be imported lazily.")
+    if first["database_touched"]:
+        errors.append("import main touched the database, which only the lifespan may do.")
+    if any("alembic" in module for run in warm for module in run["lifespan_imports"]):
+        errors.append("the lifespan imported alembic although the database was up to date.")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "import_ms": import_ms,
+                "main_cumulative_ms": main_cumulative_ms,
+                "first_lifespan_ms": first["lifespan_ms"],
+                "warm_lifespan_ms": warm_lifespan_ms,
+                "budget_ms": args.budget_ms,
+                "errors": errors,
+            }, file, indent=2)
+
+    for error in errors:
+        print(f"\n{error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
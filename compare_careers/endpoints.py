@@ -1,9 +1,12 @@
 from typing import Annotated
-from fastapi import APIRouter, Form, Request, status
+from fastapi import APIRouter, Form, HTTPException, Request, status
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from db.db_connection import db_dependency
-from db.schema import Career, Faculty, UserCareer
+from monitoring.templates import TimedJinja2Templates
+from db import reference_data
+from db.db_connection import async_db_dependency
+from sqlalchemy.ext.asyncio import AsyncSession
+from compare_careers.helpers.career_comparison import build_comparison, get_career_summaries
+from compare_careers.helpers.page_cache import cached_page, get_page_key
 
 
 router = APIRouter(
@@ -11,7 +14,67 @@ router = APIRouter(
     tags=["compare_careers"],
 )
 
-templates = Jinja2Templates(directory="templates")
+templates = TimedJinja2Templates(directory="templates")
+
+
+def render_index(request: Request | dict, careers: list) -> str:
+    """
+    Renders the page to select the careers to compare.
+
+    Parameters:
+        request (Request | dict): The request, or a dict with its path and cookies.
+        careers (list): The careers.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    return templates.get_template("/compare_careers/index.html").render({
+        "request": request,
+        "careers": careers,
+    })
+
+
+def render_comparison(request: Request | dict, comparison: dict[str, tuple]) -> str:
+    """
+    Renders the comparison table of two careers.
+
+    Parameters:
+        request (Request | dict): The request, or a dict with its path and cookies.
+        comparison (dict[str, tuple]): The comparison, from `build_comparison`.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    return templates.get_template("/compare_careers/comparison.html").render({
+        "request": request,
+        "comparison": comparison,
+    })
+
+
+async def get_comparison(db: AsyncSession, career_id_1: int, career_id_2: int) -> dict[str, tuple]:
+    """
+    Builds the comparison of two careers.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        career_id_1 (int): The id of the first career.
+        career_id_2 (int): The id of the second career.
+
+    Returns:
+        dict[str, tuple]: The comparison table.
+
+    Raises:
+        HTTPException: If a career does not exist.
+    """
+    careers = await get_career_summaries(db, [career_id_1, career_id_2])
+
+    if career_id_1 not in careers or career_id_2 not in careers:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Career not found.",
+        )
+
+    return build_comparison(careers[career_id_1], careers[career_id_2])
 
 
 @router.get(
@@ -20,16 +83,12 @@ templates = Jinja2Templates(directory="templates")
     status_code=status.HTTP_200_OK,
     description="Get the compare careers page."
 )
-def get_compare_careers(request: Request, db: db_dependency):
-    careers = db.query(Career).all()
+async def get_compare_careers(request: Request, db: async_db_dependency):
+    async def render() -> str:
+        careers = (await reference_data.get_reference_data(db)).careers
+        return render_index(request, careers)
 
-    return templates.TemplateResponse(
-        "/compare_careers/index.html",
-        {
-            "request": request,
-            "careers": careers
-        }
-    )
+    return await cached_page(request, get_page_key(request, "index"), render)
 
 
 @router.post(
@@ -38,56 +97,36 @@ def get_compare_careers(request: Request, db: db_dependency):
     status_code=status.HTTP_200_OK,
     description="Compare two careers."
 )
-def compare_careers(
+async def compare_careers(
     request: Request,
-    db: db_dependency,
+    db: async_db_dependency,
     career_id_1: Annotated[int, Form(...)],
     career_id_2: Annotated[int, Form(...)]
 ):
-    career_1 = db.query(Career).filter(Career.id == career_id_1).first()
-    career_2 = db.query(Career).filter(Career.id == career_id_2).first()
-
-    faculty_1 = db.query(Faculty).filter(
-        Faculty.id == career_1.faculty_id).first()
-    faculty_2 = db.query(Faculty).filter(
-        Faculty.id == career_2.faculty_id).first()
-
-    pursuing_students_1 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_1, UserCareer.status == "cursando").count()
-    pursuing_students_2 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_2, UserCareer.status == "cursando").count()
-
-    graduated_students_1 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_1, UserCareer.status == "graduado").count()
-    graduated_students_2 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_2, UserCareer.status == "graduado").count()
-
-    expelled_students_1 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_1, UserCareer.status == "expulsado").count()
-    expelled_students_2 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_2, UserCareer.status == "expulsado").count()
-
-    resigned_students_1 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_1, UserCareer.status == "dimitido").count()
-    resigned_students_2 = db.query(UserCareer).filter(
-        UserCareer.career_id == career_id_2, UserCareer.status == "dimitido").count()
-
-    comparison = {
-        "name": (career_1.name, "", career_2.name),
-        "Facultad": (faculty_1.name, "", faculty_2.name),
-        "Descripción": (career_1.description, "", career_2.description),
-        "Semestre": (career_1.semesters, career_1.semesters - career_2.semesters, career_2.semesters),
-        "Créditos": (career_1.credits, career_1.credits - career_2.credits, career_2.credits),
-        "Estudiantes cursando": (pursuing_students_1, pursuing_students_1 - pursuing_students_2, pursuing_students_2),
-        "Estudiantes graduados": (graduated_students_1, graduated_students_1 - graduated_students_2, graduated_students_2),
-        "Estudiantes expulsados": (expelled_students_1, expelled_students_1 - expelled_students_2, expelled_students_2),
-        "Estudiantes dimitidos": (resigned_students_1, resigned_students_1 - resigned_students_2, resigned_students_2)
-    }
-
-    return templates.TemplateResponse(
-        "/compare_careers/comparison.html",
-        {
-            "request": request,
-            "comparison": comparison
-        }
-    )
+    async def render() -> str:
+        comparison = await get_comparison(db, career_id_1, career_id_2)
+        return render_comparison(request, comparison)
+
+    key = get_page_key(request, "comparison", career_id_1, career_id_2)
+    return await cached_page(request, key, render)
+
+
+@router.get(
+    "/{career_id_1}/{career_id_2}",
+    response_class=HTMLResponse,
+    status_code=status.HTTP_200_OK,
+    description="Compare two careers, with a URL that can be linked and cached."
+)
+async def get_career_comparison(
+    request: Request,
+    db: async_db_dependency,
+    career_id_1: int,
+    career_id_2: int,
+):
+    async def render() -> str:
+        comparison = await get_comparison(db, career_id_1, career_id_2)
+        return render_comparison(request, comparison)
+
+    # La misma página que el POST, pero en una url que el navegador puede guardar
+    key = get_page_key(request, "comparison", career_id_1, career_id_2)
+    return await cached_page(request, key, render)
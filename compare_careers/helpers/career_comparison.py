@@ -0,0 +1,87 @@
+from typing import TypedDict
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.career_stats import COLUMNS_BY_STATUS
+from db.schema import Career, CareerStats, Faculty
+
+
+class CareerSummary(TypedDict):
+    id: int
+    name: str
+    description: str
+    semesters: int
+    credits: int
+    faculty: str
+    pursuing_students: int
+    graduated_students: int
+    expelled_students: int
+    resigned_students: int
+
+
+# Estado de UserCareer que cuenta cada campo de CareerSummary (y columna de CareerStats)
+STUDENT_COUNTS_BY_STATUS = {column: status for status, column in COLUMNS_BY_STATUS.items()}
+
+
+async def get_career_summaries(db: AsyncSession, career_ids: list[int]) -> dict[int, CareerSummary]:
+    """
+    Retrieves the careers, their faculty and their number of students by status.
+
+    Everything is read in a single query that joins Career, Faculty and the
+    counters of CareerStats, without counting the UserCareer rows.
+
+    Args:
+        db (AsyncSession): The database session.
+        career_ids (list[int]): The ids of the careers.
+
+    Returns:
+        dict[int, CareerSummary]: The summary of each career found, by id.
+    """
+    rows = (await db.execute(
+        select(
+            Career.id,
+            Career.name,
+            Career.description,
+            Career.semesters,
+            Career.credits,
+            Faculty.name.label("faculty"),
+            *(
+                func.coalesce(getattr(CareerStats, key), 0).label(key)
+                for key in STUDENT_COUNTS_BY_STATUS
+            ),
+        ).join(
+            Faculty, Faculty.id == Career.faculty_id
+        ).outerjoin(
+            CareerStats, CareerStats.career_id == Career.id
+        ).where(
+            Career.id.in_(career_ids)
+        )
+    )).mappings()
+
+    return {row["id"]: CareerSummary(**row) for row in rows}
+
+
+def build_comparison(career_1: CareerSummary, career_2: CareerSummary) -> dict[str, tuple]:
+    """
+    Builds the comparison table of two careers.
+
+    Args:
+        career_1 (CareerSummary): The first career.
+        career_2 (CareerSummary): The second career.
+
+    Returns:
+        dict[str, tuple]: The (first career, difference, second career) values of each parameter.
+    """
+    def compare(key: str) -> tuple:
+        return (career_1[key], career_1[key] - career_2[key], career_2[key])
+
+    return {
+        "name": (career_1["name"], "", career_2["name"]),
+        "Facultad": (career_1["faculty"], "", career_2["faculty"]),
+        "Descripción": (career_1["description"], "", career_2["description"]),
+        "Semestre": compare("semesters"),
+        "Créditos": compare("credits"),
+        "Estudiantes cursando": compare("pursuing_students"),
+        "Estudiantes graduados": compare("graduated_students"),
+        "Estudiantes expulsados": compare("expelled_students"),
+        "Estudiantes dimitidos": compare("resigned_students"),
+    }
@@ -0,0 +1,172 @@
+"""
+Cache of the rendered public compare careers pages.
+
+A page only depends on the careers, the faculties and the number of
+students of each career, so it is stored by (page, careers, data version,
+logged in). The ETag is derived from the same key: a browser that already
+has the page gets a 304 without querying the database or rendering the
+template, and any admin write that bumps a data version changes every ETag.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import NamedTuple
+from fastapi import Request, Response, status
+from db import data_version
+from settings import settings
+
+# Las páginas cambian con el navbar, que depende de la cookie de sesión
+CACHE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Vary": "Cookie",
+}
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class PageCache:
+    """
+    LRU cache of rendered pages.
+
+    Args:
+        max_size (int): The maximum number of pages kept.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._pages: OrderedDict[Hashable, CachedPage] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> CachedPage | None:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def set(self, key: Hashable, page: CachedPage) -> None:
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+page_cache = PageCache(settings.page_cache_size)
+
+
+def get_data_version() -> str:
+    """
+    Retrieves the version of the data shown in the compare careers pages.
+
+    Returns:
+        str: The versions of the careers and of the enrollments.
+    """
+    return (
+        f"{data_version.get_version(data_version.REFERENCE)}."
+        f"{data_version.get_version(data_version.ENROLLMENTS)}"
+    )
+
+
+def get_page_key(request: Request, page: str, *args: Hashable) -> tuple:
+    """
+    Builds the cache key of a page for the current data and visitor.
+
+    Args:
+        request (Request): The request.
+        page (str): The name of the page.
+        *args (Hashable): The parameters of the page, like the career ids.
+
+    Returns:
+        tuple: The key.
+    """
+    logged_in = bool(request.cookies.get("access_token"))
+    return (page, *args, get_data_version(), logged_in)
+
+
+def make_etag(key: tuple) -> str:
+    """
+    Builds the ETag of a page from its cache key.
+
+    Args:
+        key (tuple): The cache key of the page.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"{hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Checks if the If-None-Match header of a request matches an ETag.
+
+    Args:
+        request (Request): The request.
+        etag (str): The current ETag of the page.
+
+    Returns:
+        bool: True if the client already has the current page.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def cached_page(
+    request: Request,
+    key: tuple,
+    render: Callable[[], Awaitable[str | bytes]],
+    media_type: str = "text/html",
+) -> Response:
+    """
+    Serves a page from the cache, rendering it only when it is not there.
+
+    Args:
+        request (Request): The request.
+        key (tuple): The cache key of the page, from `get_page_key`.
+        render (Callable[[], Awaitable[str | bytes]]): Renders the page. It may raise
+            an HTTPException, which is not cached.
+        media_type (str): The content type of the page.
+
+    Returns:
+        Response: A 304 if the client has the current page, the page otherwise.
+    """
+    etag = make_etag(key)
+    headers = CACHE_HEADERS | {"ETag": etag}
+
+    if request.method in ("GET", "HEAD") and is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    page = page_cache.get(key)
+    if page is None:
+        body = await render()
+        if isinstance(body, str):
+            body = body.encode()
+        page = CachedPage(body=body, etag=etag)
+        page_cache.set(key, page)
+
+    return Response(page.body, media_type=media_type, headers=headers)
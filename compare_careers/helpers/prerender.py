@@ -0,0 +1,89 @@
+"""
+Pre-renders the public compare careers pages to static files.
+
+Writes the selection page and the comparison of every ordered pair of
+careers as they look for anonymous visitors:
+
+    <output>/index.html
+    <output>/<career_id_1>/<career_id_2>.html
+    <output>/version
+
+The files are served by the application under /static, or can be served
+directly by the web server in front of it. `version` holds the data version
+the pages were rendered at; run the job again after it changes.
+
+Usage:
+    python -m compare_careers.helpers.prerender
+    python -m compare_careers.helpers.prerender --output /var/www/compare_careers
+"""
+import argparse
+import asyncio
+import os
+import sys
+from itertools import permutations
+from db import reference_data
+from db.db_connection import AsyncSessionLocal
+from compare_careers.endpoints import render_comparison, render_index, router
+from compare_careers.helpers.career_comparison import build_comparison, get_career_summaries
+from compare_careers.helpers.page_cache import get_data_version
+
+OUTPUT = "static/compare_careers"
+
+
+def _write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Escribir a un archivo temporal para no servir páginas a medias
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(f"{path}.tmp", path)
+
+
+async def prerender(output: str) -> int:
+    """
+    Renders the compare careers pages of every pair of careers.
+
+    Args:
+        output (str): The directory of the pages.
+
+    Returns:
+        int: The number of comparison pages written.
+    """
+    version = get_data_version()
+
+    async with AsyncSessionLocal() as db:
+        careers = (await reference_data.get_reference_data(db)).careers
+        summaries = await get_career_summaries(db, [career.id for career in careers])
+
+    # Sin cookie de sesión, como las ve un visitante anónimo
+    _write(
+        os.path.join(output, "index.html"),
+        render_index({"path": f"{router.prefix}/", "cookies": {}}, careers),
+    )
+
+    pages = 0
+    for career_id_1, career_id_2 in permutations(summaries, 2):
+        request = {"path": f"{router.prefix}/{career_id_1}/{career_id_2}", "cookies": {}}
+        comparison = build_comparison(summaries[career_id_1], summaries[career_id_2])
+        _write(
+            os.path.join(output, str(career_id_1), f"{career_id_2}.html"),
+            render_comparison(request, comparison),
+        )
+        pages += 1
+
+    _write(os.path.join(output, "version"), version)
+    return pages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pre-render the compare careers pages.")
+    parser.add_argument("--output", default=OUTPUT)
+    args = parser.parse_args()
+
+    pages = asyncio.run(prerender(args.output))
+    print(f"{pages} comparison pages written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
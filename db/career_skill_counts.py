@@ -0,0 +1,305 @@
+"""
+Maintenance of the `career_skill_counts` table.
+
+The table stores, for every career and status, how many students have each
+skill. The code that changes skills or enrollments applies the difference
+with `apply_counts`, `apply_delta`, `apply_user_change`, `add_user` or
+`remove_user` inside its own transaction.
+
+Usage:
+    python -m db.career_skill_counts rebuild
+    python -m db.career_skill_counts check
+"""
+import argparse
+import sys
+from collections import Counter
+from collections.abc import Iterable, Mapping
+from sqlalchemy import Select, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from db import data_version
+from db.db_connection import SessionLocal
+from db.schema import CareerSkillCount, Skill, User, UserCareer, UserSkill
+
+
+def live_counts_query() -> Select:
+    """
+    Builds the live aggregate that the `career_skill_counts` table materializes.
+
+    Returns:
+        Select: A statement that returns (career_id, status, skill_id, count) rows.
+    """
+    return select(
+        UserCareer.career_id,
+        UserCareer.status,
+        Skill.id.label("skill_id"),
+        func.count(Skill.id).label("count"),
+    ).join(UserSkill, UserSkill.skill_id == Skill.id).join(
+        User, User.id == UserSkill.user_id
+    ).join(
+        UserCareer, UserCareer.user_id == User.id
+    ).group_by(UserCareer.career_id, UserCareer.status, Skill.id)
+
+
+def apply_counts(db: Session, deltas: Mapping[tuple[int, str, int], int]) -> None:
+    """
+    Adds a delta to the count of each (career_id, status, skill_id) combination.
+
+    The changes are not committed, so they are part of the caller's transaction.
+
+    Args:
+        db (Session): The database session.
+        deltas (Mapping[tuple[int, str, int], int]): The amount to add to each
+            (career_id, status, skill_id) combination.
+    """
+    emptied: set[tuple[int, str]] = set()
+
+    for (career_id, status, skill_id), delta in deltas.items():
+        if not delta:
+            continue
+
+        updated = db.execute(
+            update(CareerSkillCount).where(
+                CareerSkillCount.career_id == career_id,
+                CareerSkillCount.status == status,
+                CareerSkillCount.skill_id == skill_id,
+            ).values(count=CareerSkillCount.count + delta)
+        ).rowcount
+
+        if not updated and delta > 0:
+            db.execute(insert(CareerSkillCount).values(
+                career_id=career_id,
+                status=status,
+                skill_id=skill_id,
+                count=delta,
+            ))
+
+        if delta < 0:
+            emptied.add((career_id, status))
+
+    for career_id, status in emptied:
+        db.execute(delete(CareerSkillCount).where(
+            CareerSkillCount.career_id == career_id,
+            CareerSkillCount.status == status,
+            CareerSkillCount.count <= 0,
+        ))
+
+
+def apply_delta(
+    db: Session,
+    careers: Iterable[tuple[int, str]],
+    skill_ids: Iterable[int],
+    delta: int,
+) -> None:
+    """
+    Adds `delta` to the count of every (career, status, skill) combination.
+
+    The changes are not committed, so they are part of the caller's transaction.
+
+    Args:
+        db (Session): The database session.
+        careers (Iterable[tuple[int, str]]): The (career_id, status) pairs of the user.
+        skill_ids (Iterable[int]): The skills of the user.
+        delta (int): The amount to add, usually 1 or -1.
+    """
+    skill_ids = {int(skill_id) for skill_id in skill_ids}
+
+    apply_counts(db, {
+        (career_id, status, skill_id): delta
+        for career_id, status in careers
+        for skill_id in skill_ids
+    })
+
+
+def apply_user_change(
+    db: Session,
+    old_careers: Iterable[tuple[int, str]],
+    old_skill_ids: Iterable[int],
+    new_careers: Iterable[tuple[int, str]],
+    new_skill_ids: Iterable[int],
+) -> bool:
+    """
+    Replaces the contribution of a user to the counts by their new careers and skills.
+
+    The combinations that the old and the new values share cancel out, so
+    only the counts that really change are written. The changes are not
+    committed, so they are part of the caller's transaction.
+
+    Args:
+        db (Session): The database session.
+        old_careers (Iterable[tuple[int, str]]): The (career_id, status) pairs before the change.
+        old_skill_ids (Iterable[int]): The skills before the change.
+        new_careers (Iterable[tuple[int, str]]): The (career_id, status) pairs after the change.
+        new_skill_ids (Iterable[int]): The skills after the change.
+
+    Returns:
+        bool: Whether any count changed.
+    """
+    deltas = Counter()
+    old_skill_ids = {int(skill_id) for skill_id in old_skill_ids}
+    new_skill_ids = {int(skill_id) for skill_id in new_skill_ids}
+
+    for career_id, status in old_careers:
+        for skill_id in old_skill_ids:
+            deltas[(career_id, status, skill_id)] -= 1
+
+    for career_id, status in new_careers:
+        for skill_id in new_skill_ids:
+            deltas[(career_id, status, skill_id)] += 1
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    apply_counts(db, deltas)
+
+    return bool(deltas)
+
+
+def get_user_skill_ids(db: Session, user_id: int) -> list[int]:
+    """
+    Returns the ids of the skills of a user.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The unique identifier for the user.
+
+    Returns:
+        list[int]: The ids of the skills of the user.
+    """
+    return list(db.scalars(
+        select(UserSkill.skill_id).where(UserSkill.user_id == user_id)
+    ))
+
+
+def get_user_careers(db: Session, user_id: int) -> list[tuple[int, str]]:
+    """
+    Returns the (career_id, status) pairs of a user.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The unique identifier for the user.
+
+    Returns:
+        list[tuple[int, str]]: The careers of the user and their status.
+    """
+    return [
+        (career_id, status) for career_id, status in db.execute(
+            select(UserCareer.career_id, UserCareer.status).where(
+                UserCareer.user_id == user_id)
+        )
+    ]
+
+
+def add_user(db: Session, user_id: int) -> None:
+    """
+    Adds the current skills and careers of a user to the counts.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The unique identifier for the user.
+    """
+    db.flush()
+    apply_delta(db, get_user_careers(db, user_id),
+                get_user_skill_ids(db, user_id), 1)
+
+
+def remove_user(db: Session, user_id: int) -> None:
+    """
+    Removes the current skills and careers of a user from the counts.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The unique identifier for the user.
+    """
+    db.flush()
+    apply_delta(db, get_user_careers(db, user_id),
+                get_user_skill_ids(db, user_id), -1)
+
+
+def add_enrollment(db: Session, user_id: int, career_id: int, status: str) -> None:
+    """
+    Adds the skills of a user to the counts of a career they were just added to.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The unique identifier for the user.
+        career_id (int): The unique identifier for the career.
+        status (str): The status of the user in the career.
+    """
+    apply_delta(db, [(career_id, status)],
+                get_user_skill_ids(db, user_id), 1)
+
+
+def rebuild(db: Session) -> int:
+    """
+    Recomputes the whole table from the live aggregate.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        int: The number of rows in the rebuilt table.
+    """
+    db.execute(delete(CareerSkillCount))
+    db.execute(insert(CareerSkillCount).from_select(
+        ["career_id", "status", "skill_id", "count"],
+        live_counts_query(),
+    ))
+    db.commit()
+
+    return db.scalar(select(func.count()).select_from(CareerSkillCount))
+
+
+def check_consistency(db: Session) -> list[tuple[int, str, int, int, int]]:
+    """
+    Compares the table against the live aggregate.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        list[tuple[int, str, int, int, int]]: The (career_id, status, skill_id,
+            expected, stored) rows that differ. An empty list means the table is consistent.
+    """
+    expected = {
+        (career_id, status, skill_id): count
+        for career_id, status, skill_id, count in db.execute(live_counts_query())
+    }
+    stored = {
+        (career_id, status, skill_id): count
+        for career_id, status, skill_id, count in db.execute(select(
+            CareerSkillCount.career_id,
+            CareerSkillCount.status,
+            CareerSkillCount.skill_id,
+            CareerSkillCount.count,
+        ))
+    }
+
+    return [
+        (*key, expected.get(key, 0), stored.get(key, 0))
+        for key in sorted(expected.keys() | stored.keys(), key=str)
+        if expected.get(key, 0) != stored.get(key, 0)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Maintain the career_skill_counts table.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            print(f"career_skill_counts rebuilt with {rebuild(db)} rows.")
+            data_version.bump(data_version.CAREER_SKILLS)
+            return 0
+
+        mismatches = check_consistency(db)
+
+    for career_id, status, skill_id, expected, stored in mismatches:
+        print(
+            f"career={career_id} status={status} skill={skill_id}: expected {expected}, stored {stored}")
+
+    print(f"{len(mismatches)} inconsistent rows.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
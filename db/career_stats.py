@@ -0,0 +1,130 @@
+"""
+Reconciliation of the `career_stats` table.
+
+The table stores the number of students of every career in each status.
+The triggers on `users_careers` (migration 0004) keep it up to date inside
+the transaction of every insert, update and delete, so the code that
+changes enrollments does nothing. This module rebuilds the table from
+`users_careers` and checks that both agree, for example after loading data
+with the triggers disabled or after restoring a backup.
+
+Usage:
+    python -m db.career_stats rebuild
+    python -m db.career_stats check
+"""
+import argparse
+import sys
+from sqlalchemy import Select, case, delete, func, insert, select
+from sqlalchemy.orm import Session
+from db import data_version
+from db.db_connection import SessionLocal
+from db.schema import Career, CareerStats, UserCareer
+
+# Columna de career_stats que cuenta cada estado de UserCareer
+COLUMNS_BY_STATUS = {
+    "cursando": "pursuing_students",
+    "graduado": "graduated_students",
+    "expulsado": "expelled_students",
+    "dimitido": "resigned_students",
+}
+
+
+def live_stats_query() -> Select:
+    """
+    Builds the live aggregate that the `career_stats` table materializes.
+
+    Returns:
+        Select: A statement that returns the career_id and the number of students
+            of each status, in the order of COLUMNS_BY_STATUS, of every career.
+    """
+    return select(
+        Career.id.label("career_id"),
+        *(
+            func.count(case((UserCareer.status == status, 1))).label(column)
+            for status, column in COLUMNS_BY_STATUS.items()
+        ),
+    ).outerjoin(UserCareer, UserCareer.career_id == Career.id).group_by(Career.id)
+
+
+def rebuild(db: Session) -> int:
+    """
+    Recomputes the whole table from the live aggregate.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        int: The number of rows in the rebuilt table.
+    """
+    db.execute(delete(CareerStats))
+    db.execute(insert(CareerStats).from_select(
+        ["career_id", *COLUMNS_BY_STATUS.values()],
+        live_stats_query(),
+    ))
+    db.commit()
+
+    return db.scalar(select(func.count()).select_from(CareerStats))
+
+
+def check_consistency(db: Session) -> list[tuple[int, str, int, int]]:
+    """
+    Compares the table against the live aggregate.
+
+    Careers without a row count as having no students.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        list[tuple[int, str, int, int]]: The (career_id, column, expected, stored)
+            values that differ. An empty list means the table is consistent.
+    """
+    columns = list(COLUMNS_BY_STATUS.values())
+    expected = {
+        career_id: counts
+        for career_id, *counts in db.execute(live_stats_query())
+    }
+    stored = {
+        career_id: counts
+        for career_id, *counts in db.execute(select(
+            CareerStats.career_id,
+            *(getattr(CareerStats, column) for column in columns),
+        ))
+    }
+
+    empty = [0] * len(columns)
+    return [
+        (career_id, column, expected_count, stored_count)
+        for career_id in sorted(expected.keys() | stored.keys())
+        for column, expected_count, stored_count in zip(
+            columns,
+            expected.get(career_id, empty),
+            stored.get(career_id, empty),
+        )
+        if expected_count != stored_count
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Maintain the career_stats table.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            print(f"career_stats rebuilt with {rebuild(db)} rows.")
+            data_version.bump(data_version.ENROLLMENTS)
+            return 0
+
+        mismatches = check_consistency(db)
+
+    for career_id, column, expected, stored in mismatches:
+        print(f"career={career_id} {column}: expected {expected}, stored {stored}")
+
+    print(f"{len(mismatches)} inconsistent rows.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Checks with EXPLAIN that the database uses the indexes of the hot queries.
+
+Each check runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) on one of the
+queries that filter `users_careers` by career and status or `users_skills`
+by skill, and fails if the plan does not name the expected index. Run it
+after `python -m db.migrations`; `tests/test_check_indexes.py` runs the
+same checks on a database created by the migrations.
+
+Usage:
+    python -m db.check_indexes
+"""
+import sys
+from typing import NamedTuple
+from sqlalchemy import Connection, Select, func, select
+from db.db_connection import engine
+from db.schema import UserCareer, UserSkill
+
+
+class IndexCheck(NamedTuple):
+    description: str
+    statement: Select
+    index: str
+
+
+INDEX_CHECKS = [
+    IndexCheck(
+        "students of a career in a status",
+        select(UserCareer.user_id).where(
+            UserCareer.career_id == 1, UserCareer.status == "graduado"),
+        "ix_users_careers_career_id_status_user_id",
+    ),
+    IndexCheck(
+        "students of a career by status",
+        select(UserCareer.status, func.count()).where(
+            UserCareer.career_id.in_([1, 2])).group_by(UserCareer.status),
+        "ix_users_careers_career_id_status_user_id",
+    ),
+    IndexCheck(
+        "skills of the students of a career in a status",
+        select(UserSkill.skill_id, func.count()).join(
+            UserCareer, UserCareer.user_id == UserSkill.user_id
+        ).where(
+            UserCareer.career_id == 1, UserCareer.status == "graduado"
+        ).group_by(UserSkill.skill_id),
+        "ix_users_careers_career_id_status_user_id",
+    ),
+    IndexCheck(
+        "students with a skill",
+        select(UserSkill.user_id).where(UserSkill.skill_id == 1),
+        "ix_users_skills_skill_id_user_id",
+    ),
+]
+
+
+def explain(connection: Connection, statement: Select) -> str:
+    """
+    Retrieves the query plan of a statement.
+
+    Args:
+        connection (Connection): The database connection.
+        statement (Select): The statement.
+
+    Returns:
+        str: The plan, one line per step.
+    """
+    sql = str(statement.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+        return "\n".join(row[-1] for row in rows)
+
+    rows = connection.exec_driver_sql(f"EXPLAIN {sql}").all()
+    return "\n".join(row[0] for row in rows)
+
+
+def check_indexes(connection: Connection) -> list[tuple[IndexCheck, str]]:
+    """
+    Runs every index check.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        list[tuple[IndexCheck, str]]: The failed checks and their plans.
+    """
+    if connection.dialect.name == "postgresql":
+        # Con tablas pequeñas PostgreSQL prefiere leerlas enteras, aquí
+        # solo importa que el índice se pueda usar
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    failures = []
+    for check in INDEX_CHECKS:
+        plan = explain(connection, check.statement)
+        if check.index not in plan:
+            failures.append((check, plan))
+    return failures
+
+
+def main() -> int:
+    with engine.begin() as connection:
+        failures = check_indexes(connection)
+
+    for check, plan in failures:
+        print(f"{check.description}: {check.index} is not used\n{plan}\n")
+
+    print(f"{len(INDEX_CHECKS) - len(failures)}/{len(INDEX_CHECKS)} queries use their index.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Version numbers of the data cached in memory, shared by every worker.
+
+Each kind of data (for example `REFERENCE` for skills, careers and
+faculties) has a file in `settings.data_version_dir`. A write bumps the
+modification time of the file and the readers compare it with the version
+of their cache, so every uvicorn worker on the host sees the change on its
+next request with a single `stat` call and without asking the database.
+"""
+import os
+import threading
+import time
+from settings import settings
+
+# Skills, careers and faculties
+REFERENCE = "reference"
+
+# The careers of the users and their status
+ENROLLMENTS = "enrollments"
+
+# The skills of the users
+USER_SKILLS = "user_skills"
+
+# The skills of the students of each career and status (career_skill_counts)
+CAREER_SKILLS = "career_skills"
+
+_lock = threading.Lock()
+
+
+def _get_path(name: str) -> str:
+    return os.path.join(settings.data_version_dir, name)
+
+
+def get_version(name: str) -> int:
+    """
+    Retrieves the current version of a kind of data.
+
+    Args:
+        name (str): The name of the data.
+
+    Returns:
+        int: The version, 0 if the data was never changed.
+    """
+    try:
+        return os.stat(_get_path(name)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump(name: str) -> int:
+    """
+    Marks a kind of data as changed, so the caches of every worker reload it.
+
+    Args:
+        name (str): The name of the data.
+
+    Returns:
+        int: The new version.
+    """
+    path = _get_path(name)
+
+    with _lock:
+        os.makedirs(settings.data_version_dir, exist_ok=True)
+        with open(path, "a"):
+            pass
+
+        # Siempre avanzar, aunque el reloj tenga poca resolución
+        version = max(time.time_ns(), get_version(name) + 1)
+        os.utime(path, ns=(version, version))
+
+    return get_version(name)
@@ -0,0 +1,145 @@
+"""
+Runs the Alembic migrations of the database.
+
+Databases created before the migrations (with `Base.metadata.create_all`)
+have no `alembic_version` table; they are stamped with the revision that
+matches their tables before upgrading, so the tables are not created again.
+
+Alembic is imported only when a migration has to run: `upgrade_database`
+saves the last revision in `settings.data_version_dir`, and
+`is_up_to_date` compares it with the revision of the database with a
+single query.
+
+Usage:
+    python -m db.migrations
+"""
+import os
+import sys
+from typing import TYPE_CHECKING
+from sqlalchemy import Engine, inspect, text
+from sqlalchemy.exc import DBAPIError
+from db.db_connection import engine
+from settings import settings
+
+if TYPE_CHECKING:
+    from alembic.config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VERSIONS_DIR = os.path.join(ROOT, "migrations", "versions")
+# Última revisión y archivos de migraciones con los que se calculó
+HEAD_FILE = os.path.join(settings.data_version_dir, "schema_head")
+
+
+def get_config() -> "Config":
+    """
+    Builds the Alembic configuration of the project.
+
+    Returns:
+        Config: The configuration of alembic.ini, with absolute paths.
+    """
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def get_baseline(tables: list[str]) -> str | None:
+    """
+    Finds the revision of a database that was created without migrations.
+
+    Args:
+        tables (list[str]): The tables of the database.
+
+    Returns:
+        str | None: The revision to stamp, None if the database is empty or
+            already uses migrations.
+    """
+    if not tables or "alembic_version" in tables:
+        return None
+    if "career_skill_counts" in tables:
+        return "0002"
+    return "0001"
+
+
+def get_migration_files() -> str:
+    """
+    Lists the migration files, to notice when one is added or changed.
+
+    Returns:
+        str: The name and size of every migration file.
+    """
+    return ";".join(sorted(
+        f"{entry.name}:{entry.stat().st_size}"
+        for entry in os.scandir(VERSIONS_DIR)
+        if entry.name.endswith(".py")
+    ))
+
+
+def is_up_to_date(bind: Engine = engine) -> bool:
+    """
+    Checks, without importing alembic, if the database is at the last migration.
+
+    The last revision is the one saved by `upgrade_database`, as long as the
+    migration files did not change since.
+
+    Args:
+        bind (Engine): The engine of the database.
+
+    Returns:
+        bool: True if the database does not need an upgrade, False if it does
+            or if it is not known.
+    """
+    try:
+        with open(HEAD_FILE) as file:
+            migration_files, head = file.read().split("\n")
+    except (FileNotFoundError, ValueError):
+        return False
+
+    if migration_files != get_migration_files():
+        return False
+
+    try:
+        with bind.connect() as connection:
+            return connection.scalar(text("SELECT version_num FROM alembic_version")) == head
+    except DBAPIError:
+        return False
+
+
+def upgrade_database(bind: Engine = engine) -> None:
+    """
+    Upgrades the database to the last migration.
+
+    Args:
+        bind (Engine): The engine of the database.
+    """
+    from alembic import command
+    from alembic.script import ScriptDirectory
+
+    config = get_config()
+
+    with bind.begin() as connection:
+        config.attributes["connection"] = connection
+
+        baseline = get_baseline(inspect(connection).get_table_names())
+        if baseline:
+            command.stamp(config, baseline)
+
+        command.upgrade(config, "head")
+
+    # Se escribe aparte y se reemplaza, un worker nunca lee el archivo a medias
+    os.makedirs(settings.data_version_dir, exist_ok=True)
+    with open(f"{HEAD_FILE}.{os.getpid()}", "w") as file:
+        file.write(f"{get_migration_files()}\n{ScriptDirectory.from_config(config).get_current_head()}")
+    os.replace(f"{HEAD_FILE}.{os.getpid()}", HEAD_FILE)
+
+
+def main() -> int:
+    upgrade_database()
+    print("Database upgraded.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Counts the SQL statements and the time spent in the database.
+
+`db.db_connection` registers the cursor events of both engines, which add
+every statement to the `QueryStats` of the current context. A request (or
+any block of code) gets its own stats with `track_queries`, and
+`assert_query_budget` fails when a block sends more statements than
+allowed, listing the repeated ones.
+
+With `settings.sql_debug` the statements are also grouped by shape (the SQL
+without the values of its parameters) and the shapes repeated at least
+`settings.sql_repeat_threshold` times are logged: a query inside a loop, the
+usual N+1.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Listas de parámetros como (?, ?, ?) o (%(id_1)s, %(id_2)s) de un IN
+PARAMETER_LIST = re.compile(
+    r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class QueryStats:
+    """
+    The statements sent while the stats were active.
+
+    Attributes:
+        count (int): The number of statements.
+        seconds (float): The time spent executing them.
+        shapes (Counter[str]): The number of statements of each shape, only with `sql_debug`
+            or inside `assert_query_budget`.
+        parent (QueryStats | None): The stats of the enclosing block, which also count the statements.
+    """
+
+    count: int = 0
+    seconds: float = 0.0
+    shapes: Counter[str] | None = None
+    parent: "QueryStats | None" = field(default=None, repr=False)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Finds the shapes sent at least `threshold` times.
+
+        Args:
+            threshold (int): The minimum number of repetitions.
+
+        Returns:
+            list[tuple[str, int]]: The shapes and their count, the most repeated first.
+        """
+        if not self.shapes:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+current_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None)
+
+
+def get_shape(statement: str) -> str:
+    """
+    Normalizes a statement so the same query with different values has the same shape.
+
+    Args:
+        statement (str): The SQL sent to the database.
+
+    Returns:
+        str: The statement in one line, with parameter lists collapsed to (?).
+    """
+    return PARAMETER_LIST.sub("(?)", WHITESPACE.sub(" ", statement).strip())
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    stats = current_query_stats.get()
+    shape = None
+    while stats is not None:
+        stats.count += 1
+        stats.seconds += seconds
+        if stats.shapes is not None:
+            shape = shape or get_shape(statement)
+            stats.shapes[shape] += 1
+        stats = stats.parent
+
+
+@contextmanager
+def track_queries(label: str = "", shapes: bool | None = None) -> Iterator[QueryStats]:
+    """
+    Counts the statements sent inside the block.
+
+    Args:
+        label (str): The name of the block in the logs, for example the route.
+        shapes (bool | None): Whether to group the statements by shape. By default
+            `settings.sql_debug`, and then the repeated shapes are logged.
+
+    Returns:
+        Iterator[QueryStats]: The stats, updated while the block runs.
+    """
+    # Solo el bloque que decide con la configuración escribe en el log
+    log_repeated = shapes is None and settings.sql_debug
+    if shapes is None:
+        shapes = log_repeated
+
+    stats = QueryStats(shapes=Counter() if shapes else None, parent=current_query_stats.get())
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+        if log_repeated:
+            for shape, count in stats.repeated(settings.sql_repeat_threshold):
+                logger.warning("%s: statement sent %d times: %s", label or "queries", count, shape)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, label: str = "") -> Iterator[QueryStats]:
+    """
+    Fails if the block sends more than `max_queries` statements.
+
+    Args:
+        max_queries (int): The budget.
+        label (str): The name of the block in the error, for example the route.
+
+    Returns:
+        Iterator[QueryStats]: The stats, updated while the block runs.
+
+    Raises:
+        AssertionError: If the budget was exceeded.
+    """
+    with track_queries(label, shapes=True) as stats:
+        yield stats
+
+    if stats.count > max_queries:
+        repeated = "".join(
+            f"\n  {count}x {shape}" for shape, count in stats.repeated(2))
+        raise AssertionError(
+            f"{label or 'block'} sent {stats.count} statements, the budget is {max_queries}.{repeated}")
@@ -0,0 +1,109 @@
+"""
+In-process cache of the skills, careers and faculties.
+
+These tables are read by almost every page but only change when an admin
+creates a skill, a faculty or a career, so they are kept in memory as
+tuples of immutable records. The admin endpoints call `invalidate` after
+their commit, which bumps the `REFERENCE` data version so every worker
+reloads the lists on its next request.
+"""
+from typing import NamedTuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import data_version
+from db.schema import Career, Faculty, Skill
+
+
+class SkillRecord(NamedTuple):
+    id: int
+    name: str
+
+
+class FacultyRecord(NamedTuple):
+    id: int
+    name: str
+
+
+class CareerRecord(NamedTuple):
+    id: int
+    name: str
+    description: str
+    semesters: int
+    credits: int
+    faculty_id: int
+
+
+class ReferenceData(NamedTuple):
+    """
+    The skills, careers and faculties at a given data version.
+
+    Attributes:
+        version (int): The data version the lists were read at.
+        skills (tuple[SkillRecord, ...]): The skills, ordered by id.
+        careers (tuple[CareerRecord, ...]): The careers, ordered by id.
+        faculties (tuple[FacultyRecord, ...]): The faculties, ordered by id.
+    """
+
+    version: int
+    skills: tuple[SkillRecord, ...]
+    careers: tuple[CareerRecord, ...]
+    faculties: tuple[FacultyRecord, ...]
+
+
+_cache: ReferenceData | None = None
+
+
+async def _load(db: AsyncSession, version: int) -> ReferenceData:
+    skills = await db.execute(select(Skill.id, Skill.name).order_by(Skill.id))
+    careers = await db.execute(select(
+        Career.id,
+        Career.name,
+        Career.description,
+        Career.semesters,
+        Career.credits,
+        Career.faculty_id,
+    ).order_by(Career.id))
+    faculties = await db.execute(select(Faculty.id, Faculty.name).order_by(Faculty.id))
+
+    return ReferenceData(
+        version=version,
+        skills=tuple(SkillRecord(*row) for row in skills),
+        careers=tuple(CareerRecord(*row) for row in careers),
+        faculties=tuple(FacultyRecord(*row) for row in faculties),
+    )
+
+
+async def get_reference_data(db: AsyncSession) -> ReferenceData:
+    """
+    Retrieves the skills, careers and faculties, from memory when they did not change.
+
+    Args:
+        db (AsyncSession): The database session, only used to reload the lists.
+
+    Returns:
+        ReferenceData: The current lists.
+    """
+    global _cache
+
+    # La versión se lee antes que las tablas: si una escritura ocurre
+    # mientras se cargan, la siguiente petición vuelve a cargarlas
+    version = data_version.get_version(data_version.REFERENCE)
+    cached = _cache
+    if cached is not None and cached.version == version:
+        return cached
+
+    # Dos peticiones simultáneas pueden cargar las listas a la vez, el
+    # resultado es el mismo y no hace falta bloquear el event loop
+    cached = _cache = await _load(db, version)
+    return cached
+
+
+def invalidate() -> None:
+    """
+    Discards the cached lists of every worker. Call it after committing a
+    new skill, faculty or career.
+    """
+    global _cache
+
+    _cache = None
+    data_version.bump(data_version.REFERENCE)
@@ -1,5 +1,5 @@
 from typing import TypedDict
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Index, Integer, String, DateTime, ForeignKey
 from .db_connection import Base
 from datetime import datetime
 
@@ -25,6 +25,7 @@ class User(Base):  # ✅
         role (str): The role of the user.
         is_active (bool): Indicates if the user is active or not.
         created_at (datetime): The date and time when the user was created.
+        skills_version (int): Incremented every time the skills of the user change.
     """
 
     __tablename__ = 'users'
@@ -37,6 +38,7 @@ class User(Base):  # ✅
     role = Column(String, default='user')
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.now)
+    skills_version = Column(Integer, nullable=False, default=0, server_default='0')
 
     def to_UserDict(self) -> UserDict:
         return {
@@ -73,6 +75,10 @@ class UserSkill(Base):
     """
 
     __tablename__ = 'users_skills'
+    __table_args__ = (
+        # Los usuarios que tienen una habilidad, sin leer la tabla
+        Index('ix_users_skills_skill_id_user_id', 'skill_id', 'user_id'),
+    )
 
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     skill_id = Column(Integer, ForeignKey(
@@ -102,6 +108,10 @@ class Work(Base):
     end_date = Column(DateTime, nullable=True)
 
 
+# Estados posibles de un usuario en una carrera
+CAREER_STATUSES = ("cursando", "graduado", "expulsado", "dimitido")
+
+
 class UserCareer(Base):
     """
     Represents the relationship between a user and a career.
@@ -113,6 +123,11 @@ class UserCareer(Base):
     """
 
     __tablename__ = 'users_careers'
+    __table_args__ = (
+        # Los estudiantes de una carrera en un estado, sin leer la tabla
+        Index('ix_users_careers_career_id_status_user_id',
+              'career_id', 'status', 'user_id'),
+    )
 
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     career_id = Column(Integer, ForeignKey('careers.id'), primary_key=True)
@@ -155,3 +170,52 @@ class Faculty(Base):  # ✅
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
+
+
+class CareerSkillCount(Base):
+    """
+    Represents how many students of a career, in a given status, have a skill.
+
+    It is the materialized Skill ⋈ UserSkill ⋈ User ⋈ UserCareer aggregate used
+    to compare skills. It is kept up to date by `db.career_skill_counts`.
+
+    Attributes:
+        career_id (int): The unique identifier for the career.
+        status (str): The status of the students in the career (cursando, graduado, expulsado, dimitido).
+        skill_id (int): The unique identifier for the skill.
+        count (int): The number of students of the career, in that status, with the skill.
+    """
+
+    __tablename__ = 'career_skill_counts'
+
+    career_id = Column(Integer, ForeignKey('careers.id'), primary_key=True)
+    status = Column(String, primary_key=True)
+    skill_id = Column(Integer, ForeignKey(
+        'skills.id', ondelete='CASCADE'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class CareerStats(Base):
+    """
+    Represents the number of students of a career in each status.
+
+    It is the materialized count of the UserCareer rows of each career, kept
+    up to date by the database triggers on `users_careers` of the migration
+    0004. `db.career_stats` rebuilds and checks it.
+
+    Attributes:
+        career_id (int): The unique identifier for the career.
+        pursuing_students (int): The number of students pursuing the career (cursando).
+        graduated_students (int): The number of graduated students (graduado).
+        expelled_students (int): The number of expelled students (expulsado).
+        resigned_students (int): The number of students that resigned (dimitido).
+    """
+
+    __tablename__ = 'career_stats'
+
+    career_id = Column(Integer, ForeignKey(
+        'careers.id', ondelete='CASCADE'), primary_key=True)
+    pursuing_students = Column(Integer, nullable=False, default=0, server_default='0')
+    graduated_students = Column(Integer, nullable=False, default=0, server_default='0')
+    expelled_students = Column(Integer, nullable=False, default=0, server_default='0')
+    resigned_students = Column(Integer, nullable=False, default=0, server_default='0')
@@ -0,0 +1,108 @@
+"""
+Preparation of the database when the application starts.
+
+`prepare_database` runs in the lifespan of the app, in every worker, but
+holds an exclusive lock on a file of `settings.data_version_dir` while it
+works. The first worker of a deployment upgrades the database and creates
+the admin user; the workers that start at the same time wait for it, and
+then they and the later ones find the database at the last migration and
+the admin already created, which costs two queries and no bcrypt hash.
+
+Usage:
+    python -m db.startup
+"""
+import os
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db import migrations
+from db.db_connection import SessionLocal
+from db.schema import User
+from settings import settings
+from users.helpers.password_encryption import hash_password
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_FILE = os.path.join(settings.data_version_dir, "startup.lock")
+
+ADMIN_EMAIL = "admin@admin.admin"
+ADMIN_PASSWORD = "admin"
+
+
+@contextmanager
+def startup_lock(path: str = LOCK_FILE) -> Iterator[None]:
+    """
+    Holds an exclusive lock on a file, shared by the workers of every process.
+
+    Args:
+        path (str): The lock file, created if it does not exist.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "a+") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def create_admin(db: Session) -> bool:
+    """
+    Creates the admin user if it does not exist.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        bool: True if the admin was created.
+    """
+    if db.scalar(select(User.id).where(User.first_name == "admin").limit(1)) is not None:
+        return False
+
+    db.add(User(
+        first_name="admin",
+        last_name="admin",
+        role="admin",
+        email=ADMIN_EMAIL,
+        hashed_password=hash_password(ADMIN_PASSWORD),
+    ))
+    db.commit()
+    return True
+
+
+def prepare_database() -> None:
+    """
+    Upgrades the database and creates the admin user, once per deployment.
+    """
+    with startup_lock():
+        if not migrations.is_up_to_date():
+            migrations.upgrade_database()
+
+        with SessionLocal() as db:
+            create_admin(db)
+
+
+def main() -> int:
+    prepare_database()
+    print("Database ready.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Changes of the skills and careers of a user.
+
+`update_user_relations` compares the current rows of `users_skills` and
+`users_careers` of a user with the new ones and writes only the
+difference: the inserts, deletes and status updates that are needed, and
+the same delta in `career_skill_counts`. When the skills change, the
+`skills_version` of the user is incremented, which invalidates the results
+cached for their skills. Nothing is committed, so the caller saves the
+user, their relations and the counts in one transaction.
+"""
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from db import career_skill_counts
+from db.schema import User, UserCareer, UserSkill
+
+
+@dataclass
+class RelationChanges:
+    """
+    Difference between the old and the new skills and careers of a user.
+
+    Attributes:
+        added_skills (set[int]): The ids of the new skills.
+        removed_skills (set[int]): The ids of the skills that the user no longer has.
+        added_careers (dict[int, str]): The status of each new career.
+        removed_careers (set[int]): The ids of the careers that the user left.
+        changed_careers (dict[int, str]): The new status of each career whose status changed.
+        counts_changed (bool): Whether `career_skill_counts` changed.
+    """
+
+    added_skills: set[int] = field(default_factory=set)
+    removed_skills: set[int] = field(default_factory=set)
+    added_careers: dict[int, str] = field(default_factory=dict)
+    removed_careers: set[int] = field(default_factory=set)
+    changed_careers: dict[int, str] = field(default_factory=dict)
+    counts_changed: bool = False
+
+    @property
+    def skills_changed(self) -> bool:
+        return bool(self.added_skills or self.removed_skills)
+
+    @property
+    def careers_changed(self) -> bool:
+        return bool(self.added_careers or self.removed_careers or self.changed_careers)
+
+
+def update_user_relations(
+    db: Session,
+    user_id: int,
+    skill_ids: Iterable[int],
+    careers: Iterable[tuple[int, str]],
+) -> RelationChanges:
+    """
+    Replaces the skills and careers of a user, writing only what changed.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The unique identifier for the user.
+        skill_ids (Iterable[int]): All the skills of the user after the change.
+        careers (Iterable[tuple[int, str]]): All the (career_id, status) pairs of the
+            user after the change. If a career appears twice, the last status is kept.
+
+    Returns:
+        RelationChanges: What changed.
+    """
+    db.flush()
+    old_skills = set(career_skill_counts.get_user_skill_ids(db, user_id))
+    old_careers = dict(career_skill_counts.get_user_careers(db, user_id))
+    new_skills = {int(skill_id) for skill_id in skill_ids}
+    new_careers = {int(career_id): status for career_id, status in careers}
+
+    changes = RelationChanges(
+        added_skills=new_skills - old_skills,
+        removed_skills=old_skills - new_skills,
+        added_careers={
+            career_id: status for career_id, status in new_careers.items()
+            if career_id not in old_careers
+        },
+        removed_careers=old_careers.keys() - new_careers.keys(),
+        changed_careers={
+            career_id: status for career_id, status in new_careers.items()
+            if career_id in old_careers and old_careers[career_id] != status
+        },
+    )
+
+    if changes.removed_skills:
+        db.execute(delete(UserSkill).where(
+            UserSkill.user_id == user_id,
+            UserSkill.skill_id.in_(changes.removed_skills),
+        ))
+    if changes.added_skills:
+        db.execute(insert(UserSkill), [
+            {"user_id": user_id, "skill_id": skill_id} for skill_id in sorted(changes.added_skills)
+        ])
+    if changes.skills_changed:
+        db.execute(update(User).where(User.id == user_id).values(
+            skills_version=User.skills_version + 1))
+
+    if changes.removed_careers:
+        db.execute(delete(UserCareer).where(
+            UserCareer.user_id == user_id,
+            UserCareer.career_id.in_(changes.removed_careers),
+        ))
+    if changes.added_careers:
+        db.execute(insert(UserCareer), [
+            {"user_id": user_id, "career_id": career_id, "status": status}
+            for career_id, status in sorted(changes.added_careers.items())
+        ])
+    if changes.changed_careers:
+        # UPDATE por clave primaria, un executemany para todas las carreras
+        db.execute(update(UserCareer), [
+            {"user_id": user_id, "career_id": career_id, "status": status}
+            for career_id, status in sorted(changes.changed_careers.items())
+        ])
+
+    if changes.skills_changed or changes.careers_changed:
+        changes.counts_changed = career_skill_counts.apply_user_change(
+            db, old_careers.items(), old_skills, new_careers.items(), new_skills)
+
+    return changes
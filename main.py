@@ -1,15 +1,15 @@
-from os import access
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
-import httpx
-import uvicorn  # Library for serving the API
-from fastapi import FastAPI  # Import the FastAPI class
-# Import the engine for the database
-from db.db_connection import SessionLocal, engine
-import db.schema as schema  # Import the schema for the database
-from db.schema import User  # Import the User class from the schema
+from fastapi import FastAPI, HTTPException  # Import the FastAPI class
+# Import the preparation of the database
+from db.startup import prepare_database
+# Import the process pool of the affinity report
+from admin.helpers import affinity_report
 from starlette.middleware.sessions import SessionMiddleware
-from users.helpers.password_encryption import hash_password
+from users.helpers import google_oauth
+from users.helpers.password_encryption import shutdown_executor
 
 # Import the endpoints for the users
 from users import endpoints as users_endpoints
@@ -17,73 +17,69 @@ from users import endpoints as users_endpoints
 from admin import endpoints as admin_endpoints
 # Import the endpoints to compare careers
 from compare_careers import endpoints as compare_careers_endpoints
+# Import the endpoints of the JSON API
+from api import endpoints as api_endpoints
+# Import the endpoint and the middleware of the metrics
+from monitoring import endpoints as monitoring_endpoints
+from monitoring.middleware import MetricsMiddleware
+from settings import settings
 
-app = FastAPI()  # Create an instance of the FastAPI class
 
-# Create the tables in the database
-schema.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create or upgrade the tables and the admin user when the worker starts,
+    # not when main is imported; only the first worker of a deployment does it
+    await asyncio.to_thread(prepare_database)
+    # One HTTP client for every log in with Google, its connections are reused
+    await google_oauth.open_client()
+    yield
+    await google_oauth.close_client()
+    affinity_report.shutdown_executor()
+    shutdown_executor()
+
+
+app = FastAPI(lifespan=lifespan)  # Create an instance of the FastAPI class
 
 app.add_middleware(
     SessionMiddleware,
     secret_key="Morbi fringilla convallis sapien, id pulvinar odio volutpat. Hi omnes lingua, institutis, legibus inter se differunt. Non equidem invideo, miror magis posuere velit aliquet. Quid securi etiam tamquam eu fugiat nulla pariatur. Inmensae subtilitatis, obscuris et malesuada fames. Fictum, deserunt mollit anim laborum astutumque!",
 )
 
+# Record the latency, database time and render time of every route
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Include the routers from the endpoints
 app.include_router(users_endpoints.router)
 app.include_router(admin_endpoints.router)
 app.include_router(compare_careers_endpoints.router)
+app.include_router(api_endpoints.router)
+if settings.metrics_enabled:
+    app.include_router(monitoring_endpoints.router)
 
 
 @app.get("/login-oauth")
-def login_oauth():
-    return RedirectResponse('https://accounts.google.com/o/oauth2/auth/oauthchooseaccount?client_id=919034670843-dv2u5jdp82u75bllboooi9aekreuv4ej.apps.googleusercontent.com&response_type=code&redirect_uri=http://localhost:8000/login-code&scope=email%20profile%20openid&openid.realm', status_code=302)
+async def login_oauth():
+    try:
+        return RedirectResponse(await google_oauth.get_authorization_url(), status_code=302)
+    except google_oauth.OAuthError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.get("/login-code")
 async def login_code(code: str):
-    print(">>>>>>>>>>>>>>>>>.....", code)
-    params = {
-        'client_id': '919034670843-dv2u5jdp82u75bllboooi9aekreuv4ej.apps.googleusercontent.com',
-        'client_secret': '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',
-        'code': code,
-        'grant_type': 'authorization_code',
-        'redirect_uri': 'http://localhost:8000/login-code'
-    }
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://oauth2.googleapis.com/token", params=params, headers=headers)
-
-    response_json = response.json()
-    print(">>>>>>>>>>>>>>>>>>>>>>,,,,,,", response_json)
-    access_token = response_json['access_token']
-    async with httpx.AsyncClient() as client:
-        headers.update({'Authorization': f'Bearer {access_token}'})
-        response = await client.get("https://www.googleapis.com/oauth2/v1/userinfo", headers=headers)
-    return response.json()
-
-
-db = SessionLocal()
-admin_user = db.query(User).filter(User.first_name == "admin").first()
-
-if admin_user is None:
-    user = User(
-        first_name="admin",
-        last_name="admin",
-        role="admin",
-        email="admin@admin.admin",
-        hashed_password=hash_password("admin")
-    )
-    db.add(user)
-    db.commit()
-
-db.close()
+    # The ID token is verified locally, without asking the userinfo endpoint
+    try:
+        return await google_oauth.get_user_info(code)
+    except google_oauth.OAuthError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
 
 # Entry point for the API
 if __name__ == "__main__":
+    import uvicorn  # Library for serving the API
+
     # Run the application using uvicorn and enable auto-reload
     uvicorn.run("main:app", reload=True)
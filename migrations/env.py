@@ -0,0 +1,65 @@
+from logging.config import fileConfig
+from alembic import context
+from db.db_connection import URL_DATABASE, engine
+import db.schema as schema
+
+config = context.config
+
+# Los logs se configuran solo desde la línea de comandos, la aplicación
+# tiene su propia configuración
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = schema.Base.metadata
+
+# SQLite no permite la mayoría de ALTER TABLE, se recrean las tablas
+render_as_batch = URL_DATABASE.get_backend_name() == "sqlite"
+
+
+def run_migrations_offline() -> None:
+    """
+    Writes the SQL of the migrations instead of running them.
+    """
+    context.configure(
+        url=URL_DATABASE.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=render_as_batch,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """
+    Runs the migrations with the engine of the application, or with the
+    connection given by `db.migrations.upgrade_database`.
+    """
+    connection = config.attributes.get("connection")
+
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=render_as_batch,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=render_as_batch,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,114 @@
+"""initial tables
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-04-30 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('first_name', sa.String(), nullable=True),
+        sa.Column('last_name', sa.String(), nullable=True),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+
+    op.create_table(
+        'skills',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_skills_id', 'skills', ['id'], unique=False)
+    op.create_index('ix_skills_name', 'skills', ['name'], unique=True)
+
+    op.create_table(
+        'faculties',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_faculties_id', 'faculties', ['id'], unique=False)
+
+    op.create_table(
+        'careers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('semesters', sa.Integer(), nullable=True),
+        sa.Column('credits', sa.Integer(), nullable=True),
+        sa.Column('faculty_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['faculty_id'], ['faculties.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_careers_id', 'careers', ['id'], unique=False)
+
+    op.create_table(
+        'users_skills',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'skill_id'),
+    )
+
+    op.create_table(
+        'works',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('salary', sa.Integer(), nullable=True),
+        sa.Column('start_date', sa.DateTime(), nullable=True),
+        sa.Column('end_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_works_id', 'works', ['id'], unique=False)
+
+    op.create_table(
+        'users_careers',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('career_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['career_id'], ['careers.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'career_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('users_careers')
+    op.drop_index('ix_works_id', table_name='works')
+    op.drop_table('works')
+    op.drop_table('users_skills')
+    op.drop_index('ix_careers_id', table_name='careers')
+    op.drop_table('careers')
+    op.drop_index('ix_faculties_id', table_name='faculties')
+    op.drop_table('faculties')
+    op.drop_index('ix_skills_name', table_name='skills')
+    op.drop_index('ix_skills_id', table_name='skills')
+    op.drop_table('skills')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
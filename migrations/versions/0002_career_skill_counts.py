@@ -0,0 +1,46 @@
+"""career_skill_counts
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-05-02 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'career_skill_counts',
+        sa.Column('career_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['career_id'], ['careers.id']),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('career_id', 'status', 'skill_id'),
+    )
+
+    # Mismo agregado que db.career_skill_counts.live_counts_query
+    op.execute(
+        "INSERT INTO career_skill_counts (career_id, status, skill_id, count) "
+        "SELECT users_careers.career_id, users_careers.status, skills.id, count(skills.id) "
+        "FROM skills "
+        "JOIN users_skills ON users_skills.skill_id = skills.id "
+        "JOIN users ON users.id = users_skills.user_id "
+        "JOIN users_careers ON users_careers.user_id = users.id "
+        "GROUP BY users_careers.career_id, users_careers.status, skills.id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('career_skill_counts')
@@ -0,0 +1,39 @@
+"""indexes for the career and skill joins
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-05-06 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # La clave primaria (user_id, career_id) no sirve para filtrar por carrera y estado
+    op.create_index(
+        'ix_users_careers_career_id_status_user_id',
+        'users_careers',
+        ['career_id', 'status', 'user_id'],
+        unique=False,
+    )
+    # La clave primaria (user_id, skill_id) no sirve para buscar por habilidad
+    op.create_index(
+        'ix_users_skills_skill_id_user_id',
+        'users_skills',
+        ['skill_id', 'user_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_skills_skill_id_user_id', table_name='users_skills')
+    op.drop_index('ix_users_careers_career_id_status_user_id', table_name='users_careers')
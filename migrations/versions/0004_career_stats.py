@@ -0,0 +1,117 @@
+"""career_stats and its triggers
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-05-10 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columna de career_stats que cuenta cada estado de users_careers
+COLUMNS_BY_STATUS = {
+    'cursando': 'pursuing_students',
+    'graduado': 'graduated_students',
+    'expulsado': 'expelled_students',
+    'dimitido': 'resigned_students',
+}
+
+
+def set_counts(row: str, sign: str) -> str:
+    # CASE en lugar de (status = ...) para que un status NULL sume 0 y no NULL
+    return ', '.join(
+        f"{column} = {column} {sign} CASE WHEN {row}.status = '{status}' THEN 1 ELSE 0 END"
+        for status, column in COLUMNS_BY_STATUS.items()
+    )
+
+
+def add(row: str, upsert: str) -> str:
+    return (
+        f"{upsert}; "
+        f"UPDATE career_stats SET {set_counts(row, '+')} WHERE career_id = {row}.career_id;"
+    )
+
+
+def subtract(row: str) -> str:
+    return f"UPDATE career_stats SET {set_counts(row, '-')} WHERE career_id = {row}.career_id;"
+
+
+def upgrade() -> None:
+    op.create_table(
+        'career_stats',
+        sa.Column('career_id', sa.Integer(), nullable=False),
+        *(
+            sa.Column(column, sa.Integer(), nullable=False, server_default='0')
+            for column in COLUMNS_BY_STATUS.values()
+        ),
+        sa.ForeignKeyConstraint(['career_id'], ['careers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('career_id'),
+    )
+
+    # Mismo agregado que db.career_stats.live_stats_query
+    op.execute(
+        f"INSERT INTO career_stats (career_id, {', '.join(COLUMNS_BY_STATUS.values())}) "
+        "SELECT careers.id, "
+        + ', '.join(
+            f"count(CASE WHEN users_careers.status = '{status}' THEN 1 END)"
+            for status in COLUMNS_BY_STATUS
+        )
+        + " FROM careers LEFT JOIN users_careers ON users_careers.career_id = careers.id "
+        "GROUP BY careers.id"
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE FUNCTION career_stats_apply() RETURNS trigger AS $$ "
+            "BEGIN "
+            "IF TG_OP IN ('DELETE', 'UPDATE') THEN "
+            f"{subtract('OLD')} "
+            "END IF; "
+            "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+            f"{add('NEW', 'INSERT INTO career_stats (career_id) VALUES (NEW.career_id) ON CONFLICT (career_id) DO NOTHING')} "
+            "END IF; "
+            "RETURN NULL; "
+            "END; $$ LANGUAGE plpgsql"
+        )
+        op.execute(
+            "CREATE TRIGGER career_stats_users_careers "
+            "AFTER INSERT OR DELETE OR UPDATE OF career_id, status ON users_careers "
+            "FOR EACH ROW EXECUTE FUNCTION career_stats_apply()"
+        )
+        return
+
+    upsert = 'INSERT OR IGNORE INTO career_stats (career_id) VALUES (NEW.career_id)'
+    op.execute(
+        "CREATE TRIGGER career_stats_users_careers_insert AFTER INSERT ON users_careers "
+        f"BEGIN {add('NEW', upsert)} END"
+    )
+    op.execute(
+        "CREATE TRIGGER career_stats_users_careers_delete AFTER DELETE ON users_careers "
+        f"BEGIN {subtract('OLD')} END"
+    )
+    op.execute(
+        "CREATE TRIGGER career_stats_users_careers_update "
+        "AFTER UPDATE OF career_id, status ON users_careers "
+        f"BEGIN {subtract('OLD')} {add('NEW', upsert)} END"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER career_stats_users_careers ON users_careers")
+        op.execute("DROP FUNCTION career_stats_apply()")
+    else:
+        op.execute("DROP TRIGGER career_stats_users_careers_insert")
+        op.execute("DROP TRIGGER career_stats_users_careers_delete")
+        op.execute("DROP TRIGGER career_stats_users_careers_update")
+
+    op.drop_table('career_stats')
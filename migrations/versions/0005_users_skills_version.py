@@ -0,0 +1,31 @@
+"""skills version of the users
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-05-13 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('skills_version', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    # SQLite no puede borrar columnas sin copiar la tabla
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('skills_version')
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from monitoring.metrics import registry
+
+# Tipo de contenido del formato de texto de Prometheus
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(
+    tags=["monitoring"],
+)
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    description="Get the metrics of the application in the Prometheus text format.",
+    include_in_schema=False,
+)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=METRICS_MEDIA_TYPE)
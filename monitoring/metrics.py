@@ -0,0 +1,224 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Only the three metric types the application needs are implemented, each
+one keeps its values in a dict by label values, or reads them from a
+function when they are rendered (`set_function`). Every worker has its own
+registry: Prometheus must scrape each worker, or run a single worker per
+port.
+"""
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from users.helpers.password_encryption import hashing_stats
+
+# Segundos, de 1 ms a 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """
+    Base class of the metrics.
+
+    Args:
+        name (str): The name of the metric.
+        description (str): The help text of the metric.
+        labels (tuple[str, ...]): The names of the labels.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._function: Callable[[], dict[tuple[str, ...], float]] | None = None
+
+    def set_function(self, function: Callable[[], dict[tuple[str, ...], float]]) -> None:
+        """
+        Reads the values from a function when the metrics are rendered, instead of
+        keeping them in the metric.
+
+        Args:
+            function (Callable[[], dict[tuple[str, ...], float]]): Returns the value of
+                each set of label values.
+        """
+        self._function = function
+
+    def _current_values(self) -> list[tuple[tuple[str, ...], float]]:
+        if self._function is not None:
+            return sorted(self._function().items())
+        with self._lock:
+            return sorted(self._values.items())
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, like the number of requests.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, description, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._current_values():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, like the number of requests in flight.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, description, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def add(self, labels: tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._current_values():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """
+    The distribution of a value, like the latency of the requests, in buckets.
+
+    Args:
+        buckets (tuple[float, ...]): The upper bounds of the buckets, in increasing order.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+        # Por etiquetas: [conteo de cada bucket (el último es +Inf), suma]
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, labels: tuple[str, ...] = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels) or self._values.setdefault(
+                labels, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total[0])) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    """
+    The metrics of the application.
+    """
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text format.
+
+        Returns:
+            str: The metrics.
+        """
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LABELS = ("method", "route")
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "Requests by route and status code.", (*REQUEST_LABELS, "status")))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being processed by route.", REQUEST_LABELS))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to process a request.", REQUEST_LABELS))
+request_db_duration = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent in the database per request.", REQUEST_LABELS))
+request_db_queries = registry.register(Counter(
+    "http_request_db_queries_total", "SQL statements sent by route.", REQUEST_LABELS))
+request_render_duration = registry.register(Histogram(
+    "http_request_render_duration_seconds", "Time spent rendering templates per request.", REQUEST_LABELS))
+
+# Pools de hashes de contraseñas, leídos de password_encryption en cada scrape
+HASHING_LABELS = ("pool",)
+
+
+def _hashing_values(key: str) -> Callable[[], dict[tuple[str, ...], float]]:
+    return lambda: {(pool,): stats[key] for pool, stats in hashing_stats().items()}
+
+
+password_hashes_queued = registry.register(Gauge(
+    "password_hashes_queued", "Password hashes waiting for a process by pool.", HASHING_LABELS))
+password_hashes_queued.set_function(_hashing_values("queued"))
+password_hashes_in_flight = registry.register(Gauge(
+    "password_hashes_in_flight", "Password hashes running by pool.", HASHING_LABELS))
+password_hashes_in_flight.set_function(_hashing_values("in_flight"))
+password_hashes_completed = registry.register(Counter(
+    "password_hashes_completed_total", "Password hashes finished by pool.", HASHING_LABELS))
+password_hashes_completed.set_function(_hashing_values("completed"))
+password_hash_concurrency = registry.register(Gauge(
+    "password_hash_concurrency", "Password hashes that may run at a time by pool.", HASHING_LABELS))
+password_hash_concurrency.set_function(_hashing_values("concurrency"))
@@ -0,0 +1,112 @@
+import re
+import time
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from db.query_stats import track_queries
+from monitoring.metrics import (
+    request_db_duration,
+    request_db_queries,
+    request_duration,
+    request_render_duration,
+    requests_in_flight,
+    requests_total,
+)
+from monitoring.request_stats import RequestStats, current_request_stats
+
+# Etiqueta de las peticiones que no corresponden a ninguna ruta
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RouteIndex:
+    """
+    Finds the path template of the route that handles a request.
+
+    The template (for example `/admin/user-details/{user_id}`) is used as the
+    label instead of the path, so each route is a single series. Most routes
+    have no parameters and are found in a dict; only the paths of the routes
+    with parameters are matched with their regular expression, in order.
+
+    Args:
+        routes (list): The routes of the application, in the order they are matched.
+    """
+
+    def __init__(self, routes: list):
+        self.static: dict[str, tuple[int, str]] = {}
+        self.dynamic: list[tuple[int, re.Pattern, str]] = []
+
+        for position, route in enumerate(routes):
+            if isinstance(route, Mount) or route.param_convertors:
+                self.dynamic.append((position, route.path_regex, route.path))
+            else:
+                self.static.setdefault(route.path, (position, route.path))
+
+    def get_template(self, path: str) -> str:
+        """
+        Finds the template of a path.
+
+        Args:
+            path (str): The path of the request.
+
+        Returns:
+            str: The path of the route, or UNMATCHED_ROUTE.
+        """
+        position, template = self.static.get(path, (None, UNMATCHED_ROUTE))
+
+        for dynamic_position, regex, dynamic_template in self.dynamic:
+            if position is not None and dynamic_position > position:
+                break
+            if regex.match(path):
+                return dynamic_template
+
+        return template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the latency, status code, requests in flight,
+    database time and template render time of every route.
+
+    With `settings.sql_debug` it also logs the statements a route repeats.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.route_index: RouteIndex | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Las rutas ya no cambian cuando llega la primera petición
+        if self.route_index is None:
+            self.route_index = RouteIndex(scope["app"].router.routes)
+
+        labels = (scope["method"], self.route_index.get_template(scope["path"]))
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+
+        # Si la aplicación lanza una excepción, ServerErrorMiddleware responde 500
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        requests_in_flight.add(labels, 1)
+        start = time.perf_counter()
+        try:
+            with track_queries(" ".join(labels)) as queries:
+                await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            requests_in_flight.add(labels, -1)
+            current_request_stats.reset(token)
+
+            requests_total.inc((*labels, str(status_code)))
+            request_duration.observe(duration, labels)
+            request_db_duration.observe(queries.seconds, labels)
+            request_db_queries.inc(labels, queries.count)
+            request_render_duration.observe(stats.render_seconds, labels)
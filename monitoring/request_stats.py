@@ -0,0 +1,31 @@
+"""
+Time spent rendering templates by the current request.
+
+The middleware creates a `RequestStats` for each request and stores it in a
+context variable, and the templates add their render time to it. The time
+spent in the database is counted by `db.query_stats`.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+
+@dataclass
+class RequestStats:
+    """
+    The components of the time of a request that are not in the database.
+
+    Attributes:
+        render_seconds (float): The time spent rendering templates.
+    """
+
+    render_seconds: float = 0.0
+
+
+current_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "current_request_stats", default=None)
+
+
+def record_render(seconds: float) -> None:
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.render_seconds += seconds
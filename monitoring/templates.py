@@ -0,0 +1,30 @@
+import time
+import jinja2
+from fastapi.templating import Jinja2Templates
+from monitoring.request_stats import record_render
+
+
+class TimedTemplate(jinja2.Template):
+    """
+    Template that adds its render time to the stats of the current request.
+
+    Only the template that is rendered is timed, the templates it extends or
+    includes are part of its time.
+    """
+
+    def render(self, *args, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            record_render(time.perf_counter() - start)
+
+
+class TimedJinja2Templates(Jinja2Templates):
+    """
+    Jinja2Templates whose templates record their render time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.env.template_class = TimedTemplate
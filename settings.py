@@ -0,0 +1,104 @@
+import os
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """
+    Configuration of the application.
+
+    Every field can be set with an environment variable prefixed with
+    `CRAFTERS_` (for example `CRAFTERS_DATABASE_URL`) or in a `.env` file.
+
+    Attributes:
+        database_url (str): The SQLAlchemy URL of the database.
+        pool_size (int): The number of connections kept open in the pool.
+        max_overflow (int): The number of extra connections allowed over `pool_size`.
+        pool_timeout (int): The seconds to wait for a connection from the pool.
+        pool_recycle (int): The seconds after which a connection is replaced.
+        pool_pre_ping (bool): Whether to test connections before using them.
+        sqlite_journal_mode (str): The SQLite journal mode.
+        sqlite_synchronous (str): The SQLite synchronous mode.
+        sqlite_mmap_size (int): The bytes of the SQLite database mapped in memory.
+        sqlite_cache_size (int): The SQLite page cache size (negative values are KiB).
+        sqlite_busy_timeout (int): The milliseconds SQLite waits for a lock.
+        bcrypt_rounds (int): The bcrypt cost factor of new password hashes.
+        hash_workers (int): The number of processes that hash passwords.
+        hash_concurrency (int): The number of hashes sent to the pool at a time.
+        import_hash_workers (int): The number of processes that hash the passwords of the
+            user imports, half of `hash_workers` by default.
+        jwt_backend (str): The library that verifies access tokens ("jose" or "pyjwt").
+        token_cache_size (int): The number of verified access tokens kept in memory.
+        data_version_dir (str): The directory of the files that tell the workers a cached data changed.
+        page_cache_size (int): The number of rendered public pages kept in memory.
+        metrics_enabled (bool): Whether to record the metrics of the requests and serve them on /metrics.
+        sql_debug (bool): Whether to log the SQL statements that a request repeats (N+1 queries).
+        sql_repeat_threshold (int): The repetitions of a statement that `sql_debug` logs.
+        report_workers (int): The number of processes that compute the affinity report.
+        report_chunk_size (int): The number of users the affinity report computes at a time.
+        similar_students (int): The number of students shown in the similar students page.
+        similar_students_rebuild_interval (int): The minimum seconds between two rebuilds of the
+            similar students index after the skills of users change in other workers.
+        suggestion_cache_size (int): The number of career suggestions and skill comparisons
+            of users kept in memory.
+        oauth_issuer (str): The URL of the OpenID Connect provider of the log in with Google.
+        oauth_client_id (str): The OAuth client id of the application. The log in with
+            Google is disabled while it or the secret is empty.
+        oauth_client_secret (str): The OAuth client secret of the application. Never commit it.
+        oauth_redirect_uri (str): The URL the provider sends the user back to with the code.
+        oauth_timeout (float): The seconds to wait for the provider.
+        oauth_max_connections (int): The number of connections to the provider kept open.
+        oauth_http2 (bool): Whether to use HTTP/2 with the provider, if `h2` is installed.
+    """
+
+    model_config = SettingsConfigDict(
+        env_prefix="CRAFTERS_",
+        env_file=".env",
+        extra="ignore",
+    )
+
+    database_url: str = "sqlite:///./Crafters.db"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64 * 1024
+    sqlite_busy_timeout: int = 5000
+
+    bcrypt_rounds: int = 12
+    hash_workers: int = os.cpu_count() or 1
+    hash_concurrency: int | None = None
+    import_hash_workers: int | None = None
+
+    jwt_backend: str = "jose"
+    token_cache_size: int = 10000
+
+    data_version_dir: str = "./.data_version"
+    page_cache_size: int = 1024
+
+    metrics_enabled: bool = True
+    sql_debug: bool = False
+    sql_repeat_threshold: int = 3
+
+    report_workers: int = os.cpu_count() or 1
+    report_chunk_size: int = 2000
+
+    similar_students: int = 10
+    similar_students_rebuild_interval: int = 60
+
+    suggestion_cache_size: int = 10000
+
+    oauth_issuer: str = "https://accounts.google.com"
+    oauth_client_id: str = ""
+    oauth_client_secret: str = ""
+    oauth_redirect_uri: str = "http://localhost:8000/login-code"
+    oauth_timeout: float = 10.0
+    oauth_max_connections: int = 20
+    oauth_http2: bool = True
+
+
+settings = Settings()
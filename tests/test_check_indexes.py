@@ -0,0 +1,30 @@
+"""
+The hot queries use their indexes on a database created by the migrations.
+"""
+import pytest
+from sqlalchemy import create_engine
+from db import check_indexes, migrations
+from settings import settings
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("check_indexes")
+
+    # La última revisión se guarda en el directorio temporal y no en el del proyecto
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(settings, "data_version_dir", str(directory / "data_version"))
+        monkeypatch.setattr(migrations, "HEAD_FILE", str(directory / "data_version" / "schema_head"))
+
+        engine = create_engine(f"sqlite:///{directory / 'indexes.db'}")
+        migrations.upgrade_database(engine)
+        yield engine
+        engine.dispose()
+
+
+@pytest.mark.parametrize("check", check_indexes.INDEX_CHECKS, ids=lambda check: check.description)
+def test_query_uses_index(engine, check):
+    with engine.connect() as connection:
+        plan = check_indexes.explain(connection, check.statement)
+
+    assert check.index in plan, plan
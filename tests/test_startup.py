@@ -0,0 +1,35 @@
+"""
+The cold start of a worker stays within the budget of `benchmarks.startup`.
+"""
+import statistics
+import pytest
+from benchmarks import startup
+
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def runs(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("startup")
+    return [startup.run_once(str(directory)) for _ in range(RUNS)]
+
+
+def test_import_within_budget(runs):
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    assert import_ms <= startup.IMPORT_BUDGET_MS
+
+
+def test_import_does_not_load_lazy_modules(runs):
+    for run in runs:
+        eager = {module.split(".")[0] for module, _, _ in run["imports"]} & set(startup.LAZY_MODULES)
+        assert not eager
+
+
+def test_import_does_not_touch_database(runs):
+    # La primera ejecución es la única que encuentra el directorio vacío
+    assert not runs[0]["database_touched"]
+
+
+def test_ready_database_is_not_migrated_again(runs):
+    for run in runs[1:]:
+        assert not any(module.startswith("alembic") for module in run["lifespan_imports"])
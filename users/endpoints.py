@@ -3,13 +3,16 @@ from typing import Annotated
 from fastapi import APIRouter, Form, HTTPException, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 # Import the APIRouter class to create a router
-from fastapi.templating import Jinja2Templates
-from db.db_connection import db_dependency
+from monitoring.templates import TimedJinja2Templates
+from db import reference_data
+from db.db_connection import async_db_dependency
 from db.schema import Career, Skill, User, UserCareer, UserSkill
+from users.helpers import similar_students, suggestion_cache
 from users.helpers.authenticate_user import authenticate_user
 from users.helpers.jwt_token import set_user_token_cookie, user_dependency
-from users.helpers.password_encryption import hash_password
-from sqlalchemy import desc, func
+from users.helpers.password_encryption import hash_password_async
+from sqlalchemy import select
+from settings import settings
 
 # region setup
 # Create the router for the users
@@ -19,12 +22,12 @@ router = APIRouter(
 )
 
 # Create a template object to render the HTML files
-templates = Jinja2Templates(directory="templates")
+templates = TimedJinja2Templates(directory="templates")
 
 
 # region endpoints
 @router.get("/", response_class=HTMLResponse)
-def read_users(
+async def read_users(
     request: Request,
     user: user_dependency
 ):
@@ -51,7 +54,7 @@ def read_users(
     status_code=status.HTTP_200_OK,
     description="Retrieve the sign-up page.",
 )
-def sign_up(request: Request, db: db_dependency):
+async def sign_up(request: Request, db: async_db_dependency):
     """
     Retrieve the sign-up page.
 
@@ -61,7 +64,7 @@ def sign_up(request: Request, db: db_dependency):
     Returns:
         TemplateResponse: The rendered sign-up.html template with the request object.
     """
-    all_skills: list[Skill] = db.query(Skill).all()
+    all_skills = (await reference_data.get_reference_data(db)).skills
 
     return templates.TemplateResponse(
         "users/sign-up.html",
@@ -78,9 +81,9 @@ def sign_up(request: Request, db: db_dependency):
     status_code=status.HTTP_302_FOUND,
     description="Create a new user.",
 )
-def create_user(
+async def create_user(
     request: Request,
-    db: db_dependency,
+    db: async_db_dependency,
     first_name: Annotated[str, Form(...)],
     last_name: Annotated[str, Form(...)],
     email: Annotated[str, Form(...)],
@@ -103,7 +106,7 @@ def create_user(
     Returns:
         TemplateResponse: The rendered sign-up.html template with the request object.
     """
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
 
     if user:
         request.session["error_message"] = "The email is already registered try to log in."
@@ -122,16 +125,18 @@ def create_user(
         first_name=first_name,
         last_name=last_name,
         email=email,
-        hashed_password=hash_password(password),
+        hashed_password=await hash_password_async(password),
     )
 
     db.add(new_user)
-    db.commit()
+    await db.flush()
 
-    for skill_id in skill:
-        db.add(UserSkill(user_id=new_user.id, skill_id=skill_id))
+    db.add_all(UserSkill(user_id=new_user.id, skill_id=skill_id) for skill_id in set(skill))
 
-    db.commit()
+    # A new user is not enrolled in any career yet, so their skills do not
+    # change `career_skill_counts` until an admin adds them to a career.
+    await db.commit()
+    similar_students.update_user(new_user.id, skill)
 
     return set_user_token_cookie(new_user, "/users/")
 
@@ -143,7 +148,7 @@ def create_user(
     status_code=status.HTTP_200_OK,
     description="Retrieve the log-in page.",
 )
-def log_in(request: Request):
+async def log_in(request: Request):
     """
     Retrieve the log-in page.
 
@@ -170,7 +175,7 @@ def log_in(request: Request):
     status_code=status.HTTP_302_FOUND,
     description="Log-in a user.",
 )
-def log_in_user(request: Request, db: db_dependency, email: Annotated[str, Form(...)], password: Annotated[str, Form(...)]):
+async def log_in_user(request: Request, db: async_db_dependency, email: Annotated[str, Form(...)], password: Annotated[str, Form(...)]):
     """
     Log-in a user.
 
@@ -183,7 +188,7 @@ def log_in_user(request: Request, db: db_dependency, email: Annotated[str, Form(
     Returns:
         TemplateResponse: The rendered log-in.html template with the request object.
     """
-    user = authenticate_user(db, email, password)
+    user = await authenticate_user(db, email, password)
 
     if not user:
         return templates.TemplateResponse("users/log-in.html", {
@@ -201,7 +206,7 @@ def log_in_user(request: Request, db: db_dependency, email: Annotated[str, Form(
     status_code=status.HTTP_302_FOUND,
     description="Log-out a user.",
 )
-def log_out():
+async def log_out():
     """
     Log-out a user.
 
@@ -223,7 +228,7 @@ def log_out():
     status_code=status.HTTP_200_OK,
     description="Retrieve the compare skills page.",
 )
-def compare_skills(request: Request, user: user_dependency, db: db_dependency):
+async def compare_skills(request: Request, user: user_dependency, db: async_db_dependency):
     """
     Retrieve the compare skills page.
 
@@ -233,10 +238,10 @@ def compare_skills(request: Request, user: user_dependency, db: db_dependency):
     Returns:
         TemplateResponse: The rendered compare-skills.html template with the request object.
     """
-    user_skills = db.query(Skill).join(UserSkill).filter(
-        UserSkill.user_id == user["id"]).all()
+    user_skills = (await db.scalars(select(Skill).join(UserSkill).where(
+        UserSkill.user_id == user["id"]))).all()
 
-    all_careers = db.query(Career).all()
+    all_careers = (await reference_data.get_reference_data(db)).careers
 
     return templates.TemplateResponse(
         "users/compare-skills.html",
@@ -249,136 +254,25 @@ def compare_skills(request: Request, user: user_dependency, db: db_dependency):
     )
 
 
-def get_element(list, index):
-    try:
-        return list[index]
-    except IndexError:
-        return 0
-
-
-def balance_skills(skills_of_students):
-    balanced_skills_of_students = []
-    for i in range(10):
-        skill = get_element(skills_of_students, i)
-
-        if skill == 0:
-            break
-
-        skill = list(skill)
-
-        if i < 5:
-            skill[2] *= 5 - i
-        balanced_skills_of_students.append(skill)
-    return balanced_skills_of_students
-
-
 @router.post(
     "/compare-skills",
     response_class=HTMLResponse,
     status_code=status.HTTP_200_OK,
     description="Compare two skills.",
 )
-def compare_skills(
+async def compare_skills(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     career_id: Annotated[int, Form(...)],
 ):
-    user_skills = db.query(Skill).join(UserSkill).filter(
-        UserSkill.user_id == user["id"]).all()
-
-    all_careers = db.query(Career).all()
-
-    skills_of_pursuing_students = db.query(
-        Skill.id,
-        Skill.name,
-        func.count(Skill.id).label("count")
-    ).join(UserSkill).join(User).join(UserCareer).filter(
-        UserCareer.career_id == career_id, UserCareer.status == "cursando").group_by(Skill.id).order_by(desc("count")).all()
-
-    skills_of_graduated_students = db.query(
-        Skill.id,
-        Skill.name,
-        func.count(Skill.id).label("count")
-    ).join(UserSkill).join(User).join(UserCareer).filter(
-        UserCareer.career_id == career_id, UserCareer.status == "graduado").group_by(Skill.id).order_by(desc("count")).all()
-
-    skills_of_expelled_students = db.query(
-        Skill.id,
-        Skill.name,
-        func.count(Skill.id).label("count")
-    ).join(UserSkill).join(User).join(UserCareer).filter(
-        UserCareer.career_id == career_id, UserCareer.status == "expulsado").group_by(Skill.id).order_by(desc("count")).all()
-
-    skills_of_resigned_students = db.query(
-        Skill.id,
-        Skill.name,
-        func.count(Skill.id).label("count")
-    ).join(UserSkill).join(User).join(UserCareer).filter(
-        UserCareer.career_id == career_id, UserCareer.status == "dimitido").group_by(Skill.id).order_by(desc("count")).all()
-
-    # Balance de importancia de las habilidades
-    balanced_skills_of_pursuing_students = balance_skills(
-        skills_of_pursuing_students)
-
-    balanced_skills_of_graduated_students = balance_skills(
-        skills_of_graduated_students)
-
-    balanced_skills_of_expelled_students = balance_skills(
-        skills_of_expelled_students)
-
-    balanced_skills_of_resigned_students = balance_skills(
-        skills_of_resigned_students)
-
-    sum_of_pursuing_students = sum(
-        [skill[2] for skill in balanced_skills_of_pursuing_students])
+    # Se recalcula solo si cambiaron las habilidades del usuario o las de la carrera
+    user_skills, comparison = await suggestion_cache.get_skill_comparison(db, user["id"], career_id)
 
-    sum_of_graduated_students = sum(
-        [skill[2] for skill in balanced_skills_of_graduated_students])
+    all_careers = (await reference_data.get_reference_data(db)).careers
 
-    sum_of_expelled_students = sum(
-        [skill[2] for skill in balanced_skills_of_expelled_students])
-
-    sum_of_resigned_students = sum(
-        [skill[2] for skill in balanced_skills_of_resigned_students])
-
-    user_id_skills = [skill.id for skill in user_skills]
-
-    pursuing_user_skills = [
-        skill for skill in balanced_skills_of_pursuing_students if skill[0] in user_id_skills]
-
-    graduated_user_skills = [
-        skill for skill in balanced_skills_of_graduated_students if skill[0] in user_id_skills]
-
-    expelled_user_skills = [
-        skill for skill in balanced_skills_of_expelled_students if skill[0] in user_id_skills]
-
-    resigned_user_skills = [
-        skill for skill in balanced_skills_of_resigned_students if skill[0] in user_id_skills]
-
-    sum_of_pursuing_user_skills = sum(
-        [skill[2] for skill in pursuing_user_skills])
-
-    sum_of_graduated_user_skills = sum(
-        [skill[2] for skill in graduated_user_skills])
-
-    sum_of_expelled_user_skills = sum(
-        [skill[2] for skill in expelled_user_skills])
-
-    sum_of_resigned_user_skills = sum(
-        [skill[2] for skill in resigned_user_skills])
-
-    percentage_of_pursuing_user_skills = round(
-        (sum_of_pursuing_user_skills / sum_of_pursuing_students) * 100, 2)
-
-    percentage_of_graduated_user_skills = round(
-        (sum_of_graduated_user_skills / sum_of_graduated_students) * 100, 2)
-
-    percentage_of_expelled_user_skills = round(
-        (sum_of_expelled_user_skills / sum_of_expelled_students) * 100, 2)
-
-    percentage_of_resigned_user_skills = round(
-        (sum_of_resigned_user_skills / sum_of_resigned_students) * 100, 2)
+    skills_by_status = comparison["skills_by_status"]
+    percentages = comparison["percentages"]
 
     return templates.TemplateResponse(
         "users/compare-skills.html",
@@ -387,14 +281,14 @@ def compare_skills(
             "user_skills": user_skills,
             "user": user,
             "careers": all_careers,
-            "skills_of_pursuing_students": skills_of_pursuing_students,
-            "skills_of_graduated_students": skills_of_graduated_students,
-            "skills_of_expelled_students": skills_of_expelled_students,
-            "skills_of_resigned_students": skills_of_resigned_students,
-            "percentage_of_pursuing_user_skills": percentage_of_pursuing_user_skills,
-            "percentage_of_graduated_user_skills": percentage_of_graduated_user_skills,
-            "percentage_of_expelled_user_skills": percentage_of_expelled_user_skills,
-            "percentage_of_resigned_user_skills": percentage_of_resigned_user_skills,
+            "skills_of_pursuing_students": skills_by_status["cursando"],
+            "skills_of_graduated_students": skills_by_status["graduado"],
+            "skills_of_expelled_students": skills_by_status["expulsado"],
+            "skills_of_resigned_students": skills_by_status["dimitido"],
+            "percentage_of_pursuing_user_skills": percentages["cursando"],
+            "percentage_of_graduated_user_skills": percentages["graduado"],
+            "percentage_of_expelled_user_skills": percentages["expulsado"],
+            "percentage_of_resigned_user_skills": percentages["dimitido"],
         }
     )
 
@@ -405,64 +299,88 @@ def compare_skills(
     status_code=status.HTTP_200_OK,
     description="Retrieve the percentage of affinity of the user with the skills of graduated students.",
 )
-def suggest_career_by_skills_of_graduated_students(
+async def suggest_career_by_skills_of_graduated_students(
     request: Request,
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
 ):
-    user_skills = db.query(Skill).join(UserSkill).filter(
-        UserSkill.user_id == user["id"]).all()
-
-    all_careers = db.query(Career).all()
-
-    skills_of_graduated_students_of_all_careers = [
-        db.query(
-            Skill.id,
-            Skill.name,
-            func.count(Skill.id).label("count")
-        ).join(UserSkill).join(User).join(UserCareer).filter(
-            UserCareer.career_id == career.id, UserCareer.status == "graduado").group_by(Skill.id).order_by(desc("count")).all()
-        for career in all_careers
-    ]
-
-    # Balance de importancia de las habilidades
-    balanced_skills_of_graduated_students_of_all_careers = [
-        balance_skills(skills_of_graduated_students)
-        for skills_of_graduated_students in skills_of_graduated_students_of_all_careers
-    ]
-
-    sum_of_graduated_students_of_all_careers = [
-        sum([skill[2] for skill in balanced_skills_of_graduated_students])
-        for balanced_skills_of_graduated_students in balanced_skills_of_graduated_students_of_all_careers
-    ]
-
-    user_id_skills = [skill.id for skill in user_skills]
-
-    pursuing_user_skills_of_all_careers = [
-        [
-            skill for skill in balanced_skills_of_graduated_students if skill[0] in user_id_skills
-        ]
-        for balanced_skills_of_graduated_students in balanced_skills_of_graduated_students_of_all_careers
-    ]
+    # Se recalcula solo si cambiaron las habilidades del usuario, las carreras o los graduados
+    suggestions = await suggestion_cache.get_suggestions(db, user["id"])
 
-    sum_of_pursuing_user_skills_of_all_careers = [
-        sum([skill[2] for skill in pursuing_user_skills])
-        for pursuing_user_skills in pursuing_user_skills_of_all_careers
-    ]
+    return templates.TemplateResponse(
+        "users/suggest-career-by-skills-of-graduated-students.html",
+        {
+            "request": request,
+            "user": user,
+            "zip_careers_percentage": [
+                (suggestion.name, suggestion.affinity, suggestion.graduated_students)
+                for suggestion in suggestions
+            ],
+        }
+    )
+
+
+@router.get(
+    "/similar-students",
+    response_class=HTMLResponse,
+    status_code=status.HTTP_200_OK,
+    description="Retrieve the students whose skills are the most similar to the skills of the user.",
+)
+async def similar_students_page(
+    request: Request,
+    user: user_dependency,
+    db: async_db_dependency,
+):
+    """
+    Retrieve the students with the most similar skills.
 
-    percentage_of_pursuing_user_skills_of_all_careers = [
-        round((sum_of_pursuing_user_skills / sum_of_graduated_students) * 100, 2)
-        for sum_of_pursuing_user_skills, sum_of_graduated_students in zip(sum_of_pursuing_user_skills_of_all_careers, sum_of_graduated_students_of_all_careers)
-    ]
+    Parameters:
+        request (Request): The incoming request object.
+        user (dict): The user of the session.
+        db (AsyncSession): The database session.
+
+    Returns:
+        TemplateResponse: The students, their similarity and their careers.
+    """
+    user_skills = (await db.scalars(select(Skill).join(UserSkill).where(
+        UserSkill.user_id == user["id"]))).all()
+
+    index = await db.run_sync(similar_students.get_index)
+    matches = index.similar(
+        [skill.id for skill in user_skills], settings.similar_students, exclude=user["id"])
+
+    students = []
+    if matches:
+        user_ids = [user_id for user_id, _, _ in matches]
+
+        names = {
+            row.id: f"{row.first_name} {row.last_name}"
+            for row in await db.execute(select(User.id, User.first_name, User.last_name).where(
+                User.id.in_(user_ids)))
+        }
+
+        careers = {user_id: [] for user_id in user_ids}
+        for row in await db.execute(select(UserCareer.user_id, Career.name, UserCareer.status).join(
+                Career, Career.id == UserCareer.career_id).where(UserCareer.user_id.in_(user_ids))):
+            careers[row.user_id].append((row.name, row.status))
+
+        students = [
+            {
+                "name": names[user_id],
+                "similarity": round(similarity * 100, 2),
+                "shared_skills": shared_skills,
+                "careers": careers[user_id],
+            }
+            for user_id, similarity, shared_skills in matches
+            if user_id in names
+        ]
 
     return templates.TemplateResponse(
-        "users/suggest-career-by-skills-of-graduated-students.html",
+        "users/similar-students.html",
         {
             "request": request,
-            "user_skills": user_skills,
             "user": user,
-            "careers": all_careers,
-            "percentage_of_pursuing_user_skills_of_all_careers": percentage_of_pursuing_user_skills_of_all_careers,
-            "zip_careers_percentage": sorted(zip(list(map(lambda career: career.name, all_careers)), percentage_of_pursuing_user_skills_of_all_careers), key=lambda x: x[1], reverse=True),
+            "user_skills": user_skills,
+            "students": students,
         }
     )
@@ -1,23 +1,30 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.schema import User
-from users.helpers.password_encryption import verify_password
-from sqlalchemy.orm import Session
+from users.helpers.password_encryption import hash_password_async, needs_rehash, verify_password_async
 
 
-def authenticate_user(db: Session, email: str, password: str) -> User:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> User:
     """
     Authenticates a user by checking if the email and password match a user in the database.
 
+    If the password was hashed with a different bcrypt cost factor than the
+    configured one, it is hashed again and saved.
+
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         email (str): The email of the user.
         password (str): The password of the user.
 
     Returns:
         User: The user if the email and password match, None otherwise.
     """
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password_async(password)
+        await db.commit()
     return user
@@ -0,0 +1,296 @@
+"""
+In-memory career affinity engine.
+
+The affinity of a user with a career is the share of the `balance_skills`
+weight of the career's graduated students that the user's skills cover. The
+index stores those weights as a sparse career × skill matrix in coordinate
+form, so ranking every career for one user is a single sparse dot product.
+
+The index is rebuilt in a background thread when the `REFERENCE` or the
+`CAREER_SKILLS` data version changes, in any worker, while the previous one
+keeps serving requests.
+"""
+import threading
+import numpy as np
+from collections.abc import Iterable
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db import data_version
+from db.db_connection import SessionLocal
+from db.schema import Career
+from users.helpers.skill_comparison import BOOSTED_SKILLS, TOP_SKILLS, balanced_skills_query
+
+
+class CareerAffinityIndex:
+    """
+    Sparse career × skill weight matrix of the skills of graduated students.
+
+    Attributes:
+        career_ids (np.ndarray): The id of the career of each row.
+        career_names (list[str]): The name of the career of each row.
+        entry_careers (np.ndarray): The row of each non-zero weight.
+        entry_skills (np.ndarray): The skill id of each non-zero weight.
+        entry_weights (np.ndarray): The balanced weight of each entry.
+        totals (np.ndarray): The sum of the weights of each row.
+        version (tuple[int, int]): The `REFERENCE` and `CAREER_SKILLS` data versions
+            of the data of the index, set by `get_index`.
+    """
+
+    version: tuple[int, int] = (0, 0)
+
+    def __init__(
+        self,
+        career_ids: Iterable[int],
+        career_names: Iterable[str],
+        counts: Iterable[tuple[int, int, int]],
+    ):
+        """
+        Builds the matrix applying the `balance_skills` weighting.
+
+        Args:
+            career_ids (Iterable[int]): The ids of all the careers.
+            career_names (Iterable[str]): The names of the careers, in the same order.
+            counts (Iterable[tuple[int, int, int]]): The (career_id, skill_id, count)
+                rows of the graduated students.
+        """
+        self.career_ids = np.fromiter(career_ids, dtype=np.int64)
+        self.career_names = list(career_names)
+
+        rows = np.array(list(counts), dtype=np.int64).reshape(-1, 3)
+        position = {
+            career_id: index for index, career_id in enumerate(self.career_ids.tolist())
+        }
+        known = np.fromiter(
+            (career_id in position for career_id in rows[:, 0].tolist()),
+            dtype=bool,
+            count=len(rows),
+        )
+        rows = rows[known]
+
+        careers = np.fromiter(
+            (position[career_id] for career_id in rows[:, 0].tolist()),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        skills = rows[:, 1]
+        skill_counts = rows[:, 2]
+
+        # Ordena por carrera y, dentro de cada carrera, por count descendente y
+        # luego por id, como el ROW_NUMBER() de balanced_skills_query
+        order = np.lexsort((skills, -skill_counts, careers))
+        careers, skills, skill_counts = careers[order], skills[order], skill_counts[order]
+
+        # Posición de cada habilidad dentro del ranking de su carrera
+        first_of_career = np.searchsorted(careers, careers, side="left")
+        rank = np.arange(len(careers)) - first_of_career
+
+        kept = rank < TOP_SKILLS
+        rank = rank[kept]
+        multiplier = np.where(rank < BOOSTED_SKILLS, BOOSTED_SKILLS - rank, 1)
+
+        self.entry_careers = careers[kept]
+        self.entry_skills = skills[kept]
+        self.entry_weights = (skill_counts[kept] * multiplier).astype(np.float64)
+        self.totals = np.bincount(
+            self.entry_careers,
+            weights=self.entry_weights,
+            minlength=len(self.career_ids),
+        )
+
+    @classmethod
+    def from_db(cls, db: Session) -> "CareerAffinityIndex":
+        """
+        Builds the index from the `careers` and `career_skill_counts` tables.
+
+        The database ranks the skills of the graduated students of every
+        career in a single query and returns only the TOP_SKILLS of each.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            CareerAffinityIndex: The new index.
+        """
+        careers = db.execute(
+            select(Career.id, Career.name).order_by(Career.id)).all()
+        counts = db.execute(balanced_skills_query(status="graduado")).all()
+
+        return cls(
+            (career.id for career in careers),
+            (career.name for career in careers),
+            ((row.career_id, row.skill_id, row.count) for row in counts),
+        )
+
+    def scores(self, skill_ids: Iterable[int]) -> np.ndarray:
+        """
+        Computes the weight of each career covered by a set of skills.
+
+        Args:
+            skill_ids (Iterable[int]): The skills of the user.
+
+        Returns:
+            np.ndarray: The covered weight of each career.
+        """
+        user_skills = np.fromiter((int(skill_id)
+                                  for skill_id in skill_ids), dtype=np.int64)
+        has_skill = np.isin(self.entry_skills, user_skills)
+
+        return np.bincount(
+            self.entry_careers,
+            weights=self.entry_weights * has_skill,
+            minlength=len(self.career_ids),
+        )
+
+    def percentages(self, skill_ids: Iterable[int]) -> np.ndarray:
+        """
+        Computes the affinity percentage of a set of skills with every career.
+
+        Careers without graduated students have an affinity of 0.
+
+        Args:
+            skill_ids (Iterable[int]): The skills of the user.
+
+        Returns:
+            np.ndarray: The percentage of each career, rounded to 2 decimals.
+        """
+        scores = self.scores(skill_ids)
+        ratios = np.divide(
+            scores,
+            self.totals,
+            out=np.zeros_like(scores),
+            where=self.totals > 0,
+        )
+        return np.round(ratios * 100, 2)
+
+    def dense_weights(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Builds the skill × career weight matrix of the skills that have a weight.
+
+        Multiplying a user × skill matrix of 0 and 1 by it gives the `scores`
+        of many users at once.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The sorted skill id of each row and the matrix.
+        """
+        skill_ids = np.unique(self.entry_skills)
+        weights = np.zeros((len(skill_ids), len(self.career_ids)), dtype=np.float64)
+        weights[np.searchsorted(skill_ids, self.entry_skills), self.entry_careers] = self.entry_weights
+
+        return skill_ids, weights
+
+    def rank(self, skill_ids: Iterable[int]) -> list[tuple[str, float]]:
+        """
+        Ranks the careers by affinity with a set of skills.
+
+        Args:
+            skill_ids (Iterable[int]): The skills of the user.
+
+        Returns:
+            list[tuple[str, float]]: The (career name, percentage) pairs, best first.
+        """
+        percentages = self.percentages(skill_ids)
+        order = np.argsort(-percentages, kind="stable")
+
+        return [
+            (self.career_names[index], float(percentages[index]))
+            for index in order.tolist()
+        ]
+
+
+# region shared index
+_lock = threading.Lock()
+_index: CareerAffinityIndex | None = None
+_built_version: tuple[int, int] | None = None
+_rebuilding = False
+
+
+def get_data_version() -> tuple[int, int]:
+    """
+    Retrieves the version of the data of the index.
+
+    Returns:
+        tuple[int, int]: The `REFERENCE` and `CAREER_SKILLS` data versions.
+    """
+    return (
+        data_version.get_version(data_version.REFERENCE),
+        data_version.get_version(data_version.CAREER_SKILLS),
+    )
+
+
+def invalidate() -> None:
+    """
+    Marks the index of every worker as stale.
+
+    Call it after committing changes to careers or to the skills of their
+    students. The next `get_index` call of each worker starts a rebuild in
+    the background.
+    """
+    data_version.bump(data_version.CAREER_SKILLS)
+
+
+def _build(db: Session, version: tuple[int, int]) -> CareerAffinityIndex:
+    index = CareerAffinityIndex.from_db(db)
+    index.version = version
+    return index
+
+
+def _rebuild(version: tuple[int, int]) -> None:
+    global _index, _built_version, _rebuilding
+
+    try:
+        with SessionLocal() as db:
+            index = _build(db, version)
+
+        with _lock:
+            _index = index
+            _built_version = version
+    finally:
+        with _lock:
+            _rebuilding = False
+
+
+def get_index(db: Session) -> CareerAffinityIndex:
+    """
+    Returns the shared index, building it the first time it is needed.
+
+    When the index is stale the current one is returned while a new one is
+    built in a background thread. Its `version` tells which data it has.
+
+    Args:
+        db (Session): The database session, used only for the first build.
+
+    Returns:
+        CareerAffinityIndex: The shared index.
+    """
+    global _index, _built_version, _rebuilding
+
+    # La versión se lee antes que los datos, así el índice nunca es más viejo que ella
+    version = get_data_version()
+
+    with _lock:
+        index = _index
+        stale = _built_version != version
+        start_rebuild = index is not None and stale and not _rebuilding
+
+        if start_rebuild:
+            _rebuilding = True
+
+    if index is None:
+        index = _build(db, version)
+
+        with _lock:
+            if _index is None:
+                _index = index
+                _built_version = version
+
+        return index
+
+    if start_rebuild:
+        threading.Thread(
+            target=_rebuild,
+            args=(version,),
+            name="career-affinity-rebuild",
+            daemon=True,
+        ).start()
+
+    return index
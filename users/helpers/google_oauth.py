@@ -0,0 +1,319 @@
+"""
+Log in with Google (OpenID Connect).
+
+Every request to the provider goes through a single `httpx.AsyncClient`,
+opened and closed by the lifespan of the app (`open_client` and
+`close_client`). It keeps its connections open between logins, with HTTP/2
+when the `h2` package is installed, and it has timeouts and a limit of
+connections.
+
+The discovery document and the signing keys (JWKS) of the provider are
+cached for the max-age of their responses. The ID token returned with the
+access token is verified here with those keys, so a login sends a single
+request to the provider, the code exchange, instead of a second one to the
+userinfo endpoint.
+
+`settings.oauth_issuer` is Google by default; `benchmarks.fake_oauth` is a
+local provider for tests and load tests. The client id and secret have no
+default: the log in answers 503 until `CRAFTERS_OAUTH_CLIENT_ID` and
+`CRAFTERS_OAUTH_CLIENT_SECRET` are set.
+"""
+import importlib.util
+import re
+import time
+from typing import Any
+from urllib.parse import urlencode
+from jose import JWTError, jwt
+from settings import settings
+
+ISSUER = settings.oauth_issuer.rstrip("/")
+CLIENT_ID = settings.oauth_client_id
+CLIENT_SECRET = settings.oauth_client_secret
+REDIRECT_URI = settings.oauth_redirect_uri
+SCOPE = "openid email profile"
+ALGORITHMS = ["RS256"]
+
+# Segundos que se guardan el documento de discovery y las claves si la respuesta no lo dice
+DEFAULT_MAX_AGE = 3600
+# Segundos mínimos entre dos descargas de las claves por un kid desconocido
+MIN_JWKS_REFRESH = 60
+# Segundos de diferencia de reloj tolerados con el proveedor al validar exp, iat y nbf
+LEEWAY = 30
+
+# Claims del ID token con los nombres de la respuesta de userinfo (v1)
+USER_INFO_CLAIMS = {
+    "sub": "id",
+    "email": "email",
+    "email_verified": "verified_email",
+    "name": "name",
+    "given_name": "given_name",
+    "family_name": "family_name",
+    "picture": "picture",
+    "locale": "locale",
+}
+
+
+class OAuthError(Exception):
+    """
+    Raised when the provider rejects a request or returns an invalid token.
+
+    Attributes:
+        status_code (int): The HTTP status the app should answer with.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def check_configured() -> None:
+    """
+    Checks that the client id and secret of the application are set.
+
+    Raises:
+        OAuthError: If one of them is empty.
+    """
+    if not CLIENT_ID or not CLIENT_SECRET:
+        raise OAuthError(
+            "The log in with Google is not configured: "
+            "set CRAFTERS_OAUTH_CLIENT_ID and CRAFTERS_OAUTH_CLIENT_SECRET.",
+            503,
+        )
+
+
+# region client
+_client = None
+
+
+async def open_client(transport=None) -> None:
+    """
+    Opens the HTTP client shared by every login. Called by the lifespan of the app.
+
+    Args:
+        transport (httpx.AsyncBaseTransport | None): A transport for the requests, for
+            example an `httpx.ASGITransport` of `benchmarks.fake_oauth`.
+    """
+    global _client
+
+    # httpx se importa al arrancar el worker y no al importar main
+    import httpx
+
+    await close_client()
+    _client = httpx.AsyncClient(
+        http2=settings.oauth_http2 and importlib.util.find_spec("h2") is not None,
+        timeout=httpx.Timeout(settings.oauth_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.oauth_max_connections,
+            max_keepalive_connections=settings.oauth_max_connections,
+        ),
+        headers={"Accept": "application/json"},
+        transport=transport,
+    )
+
+
+async def close_client() -> None:
+    """
+    Closes the shared HTTP client, if it is open, and forgets the cached documents.
+    """
+    global _client, _jwks_refreshed_at
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _cache.clear()
+    _jwks_refreshed_at = float("-inf")
+
+
+def get_client():
+    if _client is None:
+        raise RuntimeError("The OAuth client is opened by the lifespan of the app.")
+    return _client
+
+
+async def _request(method: str, url: str, **kwargs):
+    import httpx
+
+    try:
+        response = await get_client().request(method, url, **kwargs)
+    except httpx.HTTPError as exc:
+        raise OAuthError(f"The OAuth provider did not answer: {exc!r}.", 502) from exc
+
+    if response.is_error:
+        raise OAuthError(
+            f"The OAuth provider answered {response.status_code} to {url}.",
+            400 if response.status_code < 500 else 502,
+        )
+    return response
+
+
+# region cached documents
+# Documento -> (monotonic en que vence, contenido)
+_cache: dict[str, tuple[float, Any]] = {}
+_jwks_refreshed_at = float("-inf")
+
+
+def _get_max_age(response) -> int:
+    match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+async def _get_cached(name: str, url: str, force: bool = False) -> Any:
+    entry = _cache.get(name)
+    if entry is not None and not force and entry[0] > time.monotonic():
+        return entry[1]
+
+    response = await _request("GET", url)
+    _cache[name] = (time.monotonic() + _get_max_age(response), response.json())
+    return _cache[name][1]
+
+
+def _find_key(jwks: dict, kid: str | None) -> dict | None:
+    return next(
+        (key for key in jwks.get("keys", []) if kid is None or key.get("kid") == kid),
+        None,
+    )
+
+
+async def get_discovery() -> dict:
+    """
+    Retrieves the OpenID configuration of the provider.
+
+    Returns:
+        dict: The discovery document, with the endpoints and the jwks_uri.
+    """
+    return await _get_cached("discovery", f"{ISSUER}/.well-known/openid-configuration")
+
+
+async def get_signing_key(kid: str | None) -> dict:
+    """
+    Retrieves the public key that signed an ID token.
+
+    The keys are downloaded again when the kid is unknown, because the
+    provider rotated them, at most once every MIN_JWKS_REFRESH seconds.
+
+    Args:
+        kid (str | None): The key id of the header of the token.
+
+    Returns:
+        dict: The JWK.
+
+    Raises:
+        OAuthError: If the provider has no key with that id.
+    """
+    global _jwks_refreshed_at
+
+    jwks_uri = (await get_discovery())["jwks_uri"]
+    key = _find_key(await _get_cached("jwks", jwks_uri), kid)
+
+    if key is None and time.monotonic() - _jwks_refreshed_at >= MIN_JWKS_REFRESH:
+        _jwks_refreshed_at = time.monotonic()
+        key = _find_key(await _get_cached("jwks", jwks_uri, force=True), kid)
+
+    if key is None:
+        raise OAuthError(f"Unknown signing key: {kid}.", 401)
+    return key
+
+
+# region log in
+async def get_authorization_url() -> str:
+    """
+    Builds the URL of the consent page of the provider.
+
+    Returns:
+        str: The URL the user is redirected to.
+    """
+    check_configured()
+    discovery = await get_discovery()
+    return f"{discovery['authorization_endpoint']}?" + urlencode({
+        "client_id": CLIENT_ID,
+        "response_type": "code",
+        "redirect_uri": REDIRECT_URI,
+        "scope": SCOPE,
+    })
+
+
+async def exchange_code(code: str) -> dict:
+    """
+    Exchanges an authorization code for the tokens of the user.
+
+    Args:
+        code (str): The code sent by the provider to REDIRECT_URI.
+
+    Returns:
+        dict: The token response, with the access_token and the id_token.
+    """
+    check_configured()
+    discovery = await get_discovery()
+    response = await _request("POST", discovery["token_endpoint"], data={
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET,
+        "code": code,
+        "grant_type": "authorization_code",
+        "redirect_uri": REDIRECT_URI,
+    })
+    return response.json()
+
+
+async def verify_id_token(id_token: str, access_token: str | None = None) -> dict:
+    """
+    Verifies the signature and the claims of an ID token with the cached keys.
+
+    Args:
+        id_token (str): The ID token.
+        access_token (str | None): The access token issued with it, to check its at_hash.
+
+    Returns:
+        dict: The claims of the token.
+
+    Raises:
+        OAuthError: If the token is invalid, expired or for another client.
+    """
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except JWTError as exc:
+        raise OAuthError("Invalid ID token.", 401) from exc
+
+    key = await get_signing_key(header.get("kid"))
+    issuer = (await get_discovery())["issuer"]
+
+    try:
+        return jwt.decode(
+            id_token,
+            key,
+            algorithms=ALGORITHMS,
+            audience=CLIENT_ID,
+            # Google usa el issuer con y sin https://
+            issuer=(issuer, issuer.removeprefix("https://")),
+            access_token=access_token,
+            options={"leeway": LEEWAY},
+        )
+    except JWTError as exc:
+        raise OAuthError(f"Invalid ID token: {exc}.", 401) from exc
+
+
+async def get_user_info(code: str) -> dict:
+    """
+    Logs in a user with the code sent by the provider.
+
+    Args:
+        code (str): The authorization code.
+
+    Returns:
+        dict: The profile of the user, with the keys of the userinfo endpoint.
+    """
+    tokens = await exchange_code(code)
+
+    if "id_token" not in tokens:
+        # Sin el scope openid no hay ID token y hay que preguntarle al proveedor
+        discovery = await get_discovery()
+        response = await _request("GET", discovery["userinfo_endpoint"], headers={
+            "Authorization": f"Bearer {tokens['access_token']}",
+        })
+        return response.json()
+
+    claims = await verify_id_token(tokens["id_token"], tokens.get("access_token"))
+    return {
+        key: claims[claim]
+        for claim, key in USER_INFO_CLAIMS.items()
+        if claim in claims
+    }
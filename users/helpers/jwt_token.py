@@ -1,3 +1,5 @@
+import time
+from collections import OrderedDict
 from datetime import UTC, datetime, timedelta
 from typing import Annotated
 from fastapi import Depends, HTTPException, Request, status
@@ -5,10 +7,99 @@ from fastapi.responses import RedirectResponse
 from jose import jwt
 
 from db.schema import User, UserDict
+from settings import settings
+
+try:
+    import jwt as pyjwt  # PyJWT, opcional
+except ImportError:
+    pyjwt = None
 
 SECRET_KEY = "Petierunt uti sibi concilium totius Galliae in diem certam indicere. Morbi fringilla convallis sapien, id pulvinar odio volutpat. A communi observantia non est recedendum."
 ALGORITHM = "HS256"
 
+# Librería usada para verificar los tokens: "jose" o "pyjwt"
+JWT_BACKEND = settings.jwt_backend
+# Número máximo de tokens verificados que se guardan en memoria
+TOKEN_CACHE_SIZE = settings.token_cache_size
+
+if JWT_BACKEND == "pyjwt" and pyjwt is None:
+    raise RuntimeError(
+        "CRAFTERS_JWT_BACKEND is 'pyjwt' but PyJWT is not installed.")
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens.
+
+    Every entry expires at the `exp` claim of its token, so a cached token is
+    never accepted after the moment jwt.decode would have rejected it.
+
+    Attributes:
+        maxsize (int): The maximum number of tokens in the cache.
+        hits (int): The number of lookups that found a valid token.
+        misses (int): The number of lookups that did not.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[UserDict, float]] = OrderedDict()
+
+    def get(self, token: str) -> UserDict | None:
+        """
+        Returns a copy of the user of a token, if it is cached and not expired.
+
+        Args:
+            token (str): The raw token.
+
+        Returns:
+            UserDict | None: The user of the token, or None.
+        """
+        entry = self._entries.get(token)
+
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[0].copy()
+
+    def set(self, token: str, user: UserDict, expires_at: float) -> None:
+        """
+        Stores the user of a verified token.
+
+        Args:
+            token (str): The raw token.
+            user (UserDict): The user of the token.
+            expires_at (float): The `exp` claim of the token, as a timestamp.
+        """
+        if self.maxsize <= 0:
+            return
+
+        self._entries[token] = (user.copy(), expires_at)
+        self._entries.move_to_end(token)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
 
 def create_access_token(data: dict, expires_delta: timedelta) -> str:
     """
@@ -34,10 +125,83 @@ def create_access_token(data: dict, expires_delta: timedelta) -> str:
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    """
+    Verifies an access token with the configured JWT backend.
+
+    Args:
+        token (str): The access token.
+
+    Returns:
+        dict: The payload of the token.
+
+    Raises:
+        jwt.JWTError: If the token is not valid.
+    """
+    if JWT_BACKEND == "pyjwt":
+        try:
+            return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except pyjwt.PyJWTError as exc:
+            raise jwt.JWTError(str(exc)) from exc
+
+    return jwt.decode(
+        token,
+        SECRET_KEY,
+        algorithms=[ALGORITHM]
+    )
+
+
+def get_user_from_token(token: str) -> UserDict | None:
+    """
+    Verifies a token and retrieves its user.
+
+    Verified tokens are kept in `token_cache` until they expire, so most
+    requests do not decode the token again.
+
+    Args:
+        token (str): The raw token.
+
+    Returns:
+        UserDict | None: The user of the token, or None if the token is not valid.
+    """
+    user = token_cache.get(token)
+
+    if user is not None:
+        return user
+
+    try:
+        payload: dict = decode_access_token(token)
+    except jwt.JWTError:
+        return None
+
+    if not payload.get("email", None) or not payload.get("id", None):
+        return None
+
+    user: UserDict = {
+        key: value for key, value in payload.items() if key != "exp"
+    }
+
+    if "exp" in payload:
+        token_cache.set(token, user, payload["exp"])
+
+    return user
+
+
 # Revisar si usar TypedDict
 # Ver si pone en una función el HTTPException
-# Falta documentar
-def get_user_information_from_token(request: Request) -> UserDict:
+async def get_user_information_from_token(request: Request) -> UserDict:
+    """
+    Retrieves the user of the access token cookie.
+
+    Parameters:
+        request (Request): The incoming request object.
+
+    Returns:
+        UserDict: The user of the token.
+
+    Raises:
+        HTTPException: Redirects to the log-in page if the token is missing or invalid.
+    """
     token = request.cookies.get("access_token", None)
 
     if not token:
@@ -49,25 +213,9 @@ def get_user_information_from_token(request: Request) -> UserDict:
             headers={"Location": "/users/log-in"},
         )
 
-    try:
-        payload: UserDict = jwt.decode(
-            token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM]
-        )
-        email = payload.get("email", None)
-        id = payload.get("id", None)
-
-        if not email or not id:
-            request.session["error_message"] = "Invalid token."
+    user = get_user_from_token(token)
 
-            raise HTTPException(
-                status_code=status.HTTP_303_SEE_OTHER,
-                detail="Invalid token.",
-                headers={"Location": "/users/log-in"},
-            )
-
-    except jwt.JWTError:
+    if user is None:
         request.session["error_message"] = "Invalid token."
 
         raise HTTPException(
@@ -76,9 +224,39 @@ def get_user_information_from_token(request: Request) -> UserDict:
             headers={"Location": "/users/log-in"},
         )
 
-    del payload["exp"]
+    return user
+
+
+async def get_api_user(request: Request) -> UserDict:
+    """
+    Retrieves the user of a request to the JSON API.
+
+    The token is read from the `Authorization: Bearer` header or, for the
+    pages of the app, from the access token cookie.
+
+    Parameters:
+        request (Request): The incoming request object.
+
+    Returns:
+        UserDict: The user of the token.
+
+    Raises:
+        HTTPException: 401 if the token is missing or invalid.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        token = request.cookies.get("access_token", None)
+
+    user = get_user_from_token(token) if token else None
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing access token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    return payload
+    return user
 
 
 def set_user_token_cookie(user: User, path: str):
@@ -103,3 +281,4 @@ def set_user_token_cookie(user: User, path: str):
 
 
 user_dependency = Annotated[UserDict, Depends(get_user_information_from_token)]
+api_user_dependency = Annotated[UserDict, Depends(get_api_user)]
@@ -1,18 +1,32 @@
+import asyncio
+import threading
 import bcrypt
+from concurrent.futures import ProcessPoolExecutor
+from settings import settings
 
+# Factor de costo de bcrypt para los hashes nuevos
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+# Número de procesos que calculan los hashes
+HASH_WORKERS = settings.hash_workers
+# Número máximo de hashes enviados al pool a la vez, el resto espera en cola
+HASH_CONCURRENCY = settings.hash_concurrency or HASH_WORKERS
+# Número de procesos que calculan los hashes de las importaciones, aparte de los de las peticiones
+IMPORT_HASH_WORKERS = settings.import_hash_workers or max(1, HASH_WORKERS // 2)
 
-def hash_password(password: str) -> bytes:
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """
     Hashes a password using bcrypt.
 
     Args:
         password (str): The password to hash.
+        rounds (int): The bcrypt cost factor, `BCRYPT_ROUNDS` by default.
 
     Returns:
         bytes: The hashed password.
     """
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
     return hashed_password
 
@@ -29,4 +43,213 @@ def verify_password(plain_password, hashed_password) -> bool:
         bool: True if the passwords match, False otherwise.
     """
     password_byte_enc = plain_password.encode('utf-8')
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(password=password_byte_enc, hashed_password=hashed_password)
+
+
+def get_rounds(hashed_password) -> int:
+    """
+    Reads the cost factor of a bcrypt hash ($2b$<rounds>$...).
+
+    Args:
+        hashed_password (bytes): The hashed password.
+
+    Returns:
+        int: The cost factor of the hash.
+    """
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode('utf-8')
+    return int(hashed_password.split("$")[2])
+
+
+def needs_rehash(hashed_password) -> bool:
+    """
+    Checks if a hash was made with a cost factor different from `BCRYPT_ROUNDS`.
+
+    Args:
+        hashed_password (bytes): The hashed password.
+
+    Returns:
+        bool: True if the password should be hashed again, False otherwise.
+    """
+    return get_rounds(hashed_password) != BCRYPT_ROUNDS
+
+
+# region process pool
+_executor: ProcessPoolExecutor = None
+_semaphore: asyncio.Semaphore = None
+_semaphore_loop: asyncio.AbstractEventLoop = None
+_stats = {
+    "queued": 0,
+    "in_flight": 0,
+    "completed": 0,
+}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore, _semaphore_loop
+
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(HASH_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def _run_in_pool(function, *args):
+    semaphore = _get_semaphore()
+
+    _stats["queued"] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _stats["queued"] -= 1
+
+    _stats["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), function, *args)
+    finally:
+        _stats["in_flight"] -= 1
+        _stats["completed"] += 1
+        semaphore.release()
+
+
+async def hash_password_async(password: str) -> bytes:
+    """
+    Hashes a password in the hashing process pool.
+
+    Args:
+        password (str): The password to hash.
+
+    Returns:
+        bytes: The hashed password.
+    """
+    return await _run_in_pool(hash_password, password, BCRYPT_ROUNDS)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """
+    Verifies a password in the hashing process pool.
+
+    Args:
+        plain_password (str): The plain password to verify.
+        hashed_password (bytes): The hashed password to compare against.
+
+    Returns:
+        bool: True if the passwords match, False otherwise.
+    """
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
+
+
+# region import process pool
+# Las importaciones tienen su propio pool, así los log in y los registros no esperan detrás de ellas
+_import_executor: ProcessPoolExecutor = None
+_import_lock = threading.Lock()
+_import_stats = {
+    "pending": 0,
+    "completed": 0,
+}
+
+
+def _get_import_executor() -> ProcessPoolExecutor:
+    global _import_executor
+
+    with _import_lock:
+        if _import_executor is None:
+            _import_executor = ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS)
+        return _import_executor
+
+
+def _import_hash_done(future) -> None:
+    with _import_lock:
+        _import_stats["pending"] -= 1
+        _import_stats["completed"] += 1
+
+
+def hash_passwords(passwords: list[str]) -> list[bytes]:
+    """
+    Hashes many passwords in parallel in the import process pool.
+
+    It blocks until every password is hashed, so it is meant for scripts and
+    background work, not for the event loop. The pool has `IMPORT_HASH_WORKERS`
+    processes, so an import never takes the processes of the log ins.
+
+    Args:
+        passwords (list[str]): The passwords to hash.
+
+    Returns:
+        list[bytes]: The hashed passwords, in the same order.
+    """
+    executor = _get_import_executor()
+
+    with _import_lock:
+        _import_stats["pending"] += len(passwords)
+
+    futures = []
+    try:
+        for password in passwords:
+            future = executor.submit(hash_password, password, BCRYPT_ROUNDS)
+            future.add_done_callback(_import_hash_done)
+            futures.append(future)
+    finally:
+        # Las contraseñas que no se llegaron a enviar no quedan pendientes
+        with _import_lock:
+            _import_stats["pending"] -= len(passwords) - len(futures)
+
+    return [future.result() for future in futures]
+
+
+def hashing_stats() -> dict[str, dict[str, int]]:
+    """
+    Returns the state of the hashing process pools.
+
+    The hashes of an import are sent to their pool all at once, so the ones
+    that are not running are waiting for a process.
+
+    Returns:
+        dict[str, dict[str, int]]: For the `requests` pool and the `import` pool, the
+            number of hashes waiting (`queued`), running (`in_flight`) and finished
+            (`completed`), and the configured limits.
+    """
+    with _import_lock:
+        pending, completed = _import_stats["pending"], _import_stats["completed"]
+    in_flight = min(pending, IMPORT_HASH_WORKERS)
+
+    return {
+        "requests": {
+            **_stats,
+            "workers": HASH_WORKERS,
+            "concurrency": HASH_CONCURRENCY,
+        },
+        "import": {
+            "queued": pending - in_flight,
+            "in_flight": in_flight,
+            "completed": completed,
+            "workers": IMPORT_HASH_WORKERS,
+            "concurrency": IMPORT_HASH_WORKERS,
+        },
+    }
+
+
+def shutdown_executor() -> None:
+    """
+    Stops the hashing process pools, if they were started.
+    """
+    global _executor, _import_executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    with _import_lock:
+        if _import_executor is not None:
+            _import_executor.shutdown(wait=True)
+            _import_executor = None
@@ -0,0 +1,292 @@
+"""
+In-memory index of the students with the most similar skills.
+
+The similarity of two students is the Jaccard index of their skill sets.
+The index keeps, for every skill, the sorted ids of the users that have it
+(an inverted index in CSR form), so the users that share at least one skill
+with a set are found by reading only the lists of its skills, and their
+number of shared skills is counted adding 1 at the users of each list.
+
+The lists are immutable. A change of the skills of a user is applied at
+once as an override of that user (`update_user`), and other workers see it
+through the `USER_SKILLS` data version, which rebuilds their index in a
+background thread while the previous one keeps serving requests.
+"""
+import threading
+import time
+import numpy as np
+from collections.abc import Iterable
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db import data_version
+from db.db_connection import SessionLocal
+from db.schema import UserSkill
+from settings import settings
+
+# Número de filas de users_skills que se leen a la vez al construir el índice
+BUILD_BATCH_SIZE = 100_000
+# Segundos mínimos entre dos reconstrucciones por cambios de otros workers
+REBUILD_INTERVAL = settings.similar_students_rebuild_interval
+# Número de usuarios cambiados que se comparan uno por uno antes de reconstruir el índice
+MAX_OVERRIDES = 1000
+
+
+class SimilarStudentsIndex:
+    """
+    Inverted index skill → users of the skills of every user.
+
+    Attributes:
+        skill_ids (np.ndarray): The sorted ids of the skills that some user has.
+        offsets (np.ndarray): The postings of the i-th skill are `postings[offsets[i]:offsets[i + 1]]`.
+        postings (np.ndarray): The ids of the users of every skill.
+        sizes (np.ndarray): The number of skills of each user id.
+        overrides (dict[int, frozenset[int]]): The skills of the users that changed
+            after the index was built, which replace the ones in the lists.
+    """
+
+    def __init__(self, user_ids: np.ndarray, skill_ids: np.ndarray):
+        """
+        Builds the lists of (user, skill) pairs.
+
+        Args:
+            user_ids (np.ndarray): The user of each pair.
+            skill_ids (np.ndarray): The skill of each pair.
+        """
+        order = np.lexsort((user_ids, skill_ids))
+        skills = skill_ids[order]
+
+        self.skill_ids, starts = np.unique(skills, return_index=True)
+        self.offsets = np.append(starts, len(skills))
+        self.postings = user_ids[order].astype(np.int32)
+        self.sizes = np.bincount(user_ids, minlength=1).astype(np.int32)
+        self.overrides: dict[int, frozenset[int]] = {}
+
+    @classmethod
+    def from_db(cls, db: Session) -> "SimilarStudentsIndex":
+        """
+        Builds the index from the `users_skills` table, reading it in batches.
+
+        Args:
+            db (Session): The database session.
+
+        Returns:
+            SimilarStudentsIndex: The new index.
+        """
+        result = db.execute(
+            select(UserSkill.user_id, UserSkill.skill_id).execution_options(yield_per=BUILD_BATCH_SIZE))
+
+        batches = [
+            np.fromiter((value for row in rows for value in row), dtype=np.int64, count=2 * len(rows))
+            for rows in result.partitions()
+        ]
+        pairs = np.concatenate(batches).reshape(-1, 2) if batches else np.zeros((0, 2), dtype=np.int64)
+
+        return cls(pairs[:, 0], pairs[:, 1])
+
+    def update_user(self, user_id: int, skill_ids: Iterable[int]) -> None:
+        """
+        Replaces the skills of a user. An empty list removes the user.
+
+        Args:
+            user_id (int): The id of the user.
+            skill_ids (Iterable[int]): The new skills of the user.
+        """
+        self.overrides[user_id] = frozenset(int(skill_id) for skill_id in skill_ids)
+
+    def _score(self, query_size: int, user_ids: np.ndarray, shared: np.ndarray) -> np.ndarray:
+        return shared / (query_size + self.sizes[user_ids] - shared)
+
+    def similar(
+        self,
+        skill_ids: Iterable[int],
+        k: int,
+        exclude: int | None = None,
+    ) -> list[tuple[int, float, int]]:
+        """
+        Finds the users with the skill sets most similar to a set of skills.
+
+        A user that shares a single skill has a similarity of at most 1 / |q|,
+        so when at least k users that share two or more skills are above it,
+        only those are scored.
+
+        Args:
+            skill_ids (Iterable[int]): The skills to compare with.
+            k (int): The number of users.
+            exclude (int | None): A user that is never returned, usually the one asking.
+
+        Returns:
+            list[tuple[int, float, int]]: The (user id, Jaccard index, shared skills) of
+                the k most similar users that share at least one skill, the most similar
+                first and the lower ids first on ties.
+        """
+        query = frozenset(int(skill_id) for skill_id in skill_ids)
+        if not query or k <= 0:
+            return []
+
+        query_ids = np.fromiter(query, dtype=np.int64, count=len(query))
+        positions = np.searchsorted(self.skill_ids, query_ids)
+        found = positions < len(self.skill_ids)
+        positions = positions[found][self.skill_ids[positions[found]] == query_ids[found]]
+
+        # Cada lista tiene a cada usuario una sola vez, así que sumar 1 en sus
+        # posiciones cuenta las habilidades compartidas (uint8 cabe en caché)
+        counts = np.zeros(len(self.sizes), dtype=np.uint8 if len(query) < 256 else np.int32)
+        for position in positions.tolist():
+            counts[self.postings[self.offsets[position]:self.offsets[position + 1]]] += 1
+
+        # Los usuarios que cambiaron se cuentan aparte, con sus habilidades nuevas
+        overrides = list(self.overrides.items())
+        removed = np.fromiter(
+            [user_id for user_id, _ in overrides] + ([exclude] if exclude is not None else []),
+            dtype=np.int64,
+        )
+        counts[removed[removed < len(counts)]] = 0
+
+        user_ids = np.flatnonzero(counts >= 2)
+        shared = counts[user_ids].astype(np.int64)
+        scores = self._score(len(query), user_ids, shared)
+
+        if len(scores) < k or np.partition(scores, len(scores) - k)[len(scores) - k] <= 1 / len(query):
+            user_ids = np.flatnonzero(counts)
+            shared = counts[user_ids].astype(np.int64)
+            scores = self._score(len(query), user_ids, shared)
+
+        extra = [
+            (user_id, len(query & skills), len(query | skills))
+            for user_id, skills in overrides
+            if user_id != exclude and query & skills
+        ]
+        if extra:
+            user_ids = np.concatenate([user_ids, [user_id for user_id, _, _ in extra]])
+            shared = np.concatenate([shared, [count for _, count, _ in extra]])
+            scores = np.concatenate([scores, [count / union for _, count, union in extra]])
+
+        # Solo se ordenan los candidatos con un puntaje de al menos el k-ésimo
+        if len(scores) > k:
+            threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+            kept = scores >= threshold
+            user_ids, scores, shared = user_ids[kept], scores[kept], shared[kept]
+
+        order = np.lexsort((user_ids, -scores))[:k]
+        return [
+            (int(user_ids[i]), float(scores[i]), int(shared[i]))
+            for i in order.tolist()
+        ]
+
+
+# region shared index
+_lock = threading.Lock()
+_index: SimilarStudentsIndex | None = None
+_built_version = 0
+_built_at = 0.0
+_rebuilding = False
+# Cambios hechos durante una reconstrucción, que se aplican al índice nuevo
+_pending: dict[int, frozenset[int]] | None = None
+
+
+def invalidate() -> None:
+    """
+    Marks the index of every worker as stale, for changes of many users
+    (like an import). Each worker rebuilds it in the background.
+    """
+    data_version.bump(data_version.USER_SKILLS)
+
+
+def update_user(user_id: int, skill_ids: Iterable[int]) -> None:
+    """
+    Applies a change of the skills of a user to the shared index.
+
+    Call it after committing the change. The other workers rebuild their
+    index when they see the new `USER_SKILLS` data version.
+
+    Args:
+        user_id (int): The id of the user.
+        skill_ids (Iterable[int]): The new skills of the user, empty if it was deleted.
+    """
+    global _built_version
+
+    skills = frozenset(int(skill_id) for skill_id in skill_ids)
+    up_to_date = _built_version == data_version.get_version(data_version.USER_SKILLS)
+    data_version.bump(data_version.USER_SKILLS)
+
+    with _lock:
+        if _index is not None:
+            _index.update_user(user_id, skills)
+        if _pending is not None:
+            _pending[user_id] = skills
+
+        # Este worker ya tiene el cambio, no hace falta reconstruir su índice
+        if up_to_date and not _rebuilding:
+            _built_version = data_version.get_version(data_version.USER_SKILLS)
+
+
+def _rebuild(version: int) -> None:
+    global _index, _built_version, _built_at, _rebuilding, _pending
+
+    try:
+        with SessionLocal() as db:
+            index = SimilarStudentsIndex.from_db(db)
+
+        with _lock:
+            index.overrides.update(_pending or {})
+            _index = index
+            _built_version = version
+            _built_at = time.monotonic()
+    finally:
+        with _lock:
+            _rebuilding = False
+            _pending = None
+
+
+def get_index(db: Session) -> SimilarStudentsIndex:
+    """
+    Returns the shared index, building it the first time it is needed.
+
+    When another worker changed the skills of a user, or this one changed
+    more than MAX_OVERRIDES users, the current index is returned while a new
+    one is built in a background thread, at most once every REBUILD_INTERVAL
+    seconds.
+
+    Args:
+        db (Session): The database session, used only for the first build.
+
+    Returns:
+        SimilarStudentsIndex: The shared index.
+    """
+    global _index, _built_version, _built_at, _rebuilding, _pending
+
+    version = data_version.get_version(data_version.USER_SKILLS)
+
+    with _lock:
+        index = _index
+        start_rebuild = (
+            index is not None
+            and (_built_version != version or len(index.overrides) > MAX_OVERRIDES)
+            and not _rebuilding
+            and time.monotonic() - _built_at >= REBUILD_INTERVAL
+        )
+
+        if start_rebuild:
+            _rebuilding = True
+            _pending = {}
+
+    if index is None:
+        index = SimilarStudentsIndex.from_db(db)
+
+        with _lock:
+            if _index is None:
+                _index = index
+                _built_version = version
+                _built_at = time.monotonic()
+
+        return _index
+
+    if start_rebuild:
+        threading.Thread(
+            target=_rebuild,
+            args=(version,),
+            name="similar-students-rebuild",
+            daemon=True,
+        ).start()
+
+    return index
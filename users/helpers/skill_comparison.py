@@ -0,0 +1,174 @@
+from typing import TypedDict
+from collections.abc import Iterable
+from sqlalchemy import Select, bindparam, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.schema import CareerSkillCount, Skill
+
+# Estados de UserCareer que se comparan, en el orden de la página
+STATUSES = ("cursando", "graduado", "expulsado", "dimitido")
+# Número de habilidades que se toman en cuenta por carrera y estado (ver balance_skills)
+TOP_SKILLS = 10
+# Número de habilidades que reciben un peso extra (5, 4, 3, 2, 1)
+BOOSTED_SKILLS = 5
+
+
+class SkillComparison(TypedDict):
+    """
+    The skills of the students of a career and how many of them a user has.
+
+    Attributes:
+        skills_by_status (dict[str, list[tuple[int, str, int, int]]]): The (skill id, name,
+            number of students, balanced weight) of the TOP_SKILLS most common skills of
+            each status, the most common first.
+        percentages (dict[str, float]): The share of the balanced weight of the skills
+            of each status that the user has.
+    """
+
+    skills_by_status: dict[str, list[tuple[int, str, int, int]]]
+    percentages: dict[str, float]
+
+
+def get_element(list, index):
+    try:
+        return list[index]
+    except IndexError:
+        return 0
+
+
+def balance_skills(skills_of_students):
+    balanced_skills_of_students = []
+    for i in range(TOP_SKILLS):
+        skill = get_element(skills_of_students, i)
+
+        if skill == 0:
+            break
+
+        skill = list(skill)
+
+        if i < BOOSTED_SKILLS:
+            skill[2] *= BOOSTED_SKILLS - i
+        balanced_skills_of_students.append(skill)
+    return balanced_skills_of_students
+
+
+def balanced_skills_query(career_id: int | None = None, status: str | None = None) -> Select:
+    """
+    Builds the query of the `balance_skills` weighting, computed by the database.
+
+    The skills of each career and status are ranked with ROW_NUMBER(), the
+    most common first and the lower ids first on ties, and only the
+    TOP_SKILLS first are returned, the first BOOSTED_SKILLS with their count
+    multiplied by 5, 4, 3, 2 and 1.
+
+    Args:
+        career_id (int | None): The career, or None for every career.
+        status (str | None): The status, or None for every status.
+
+    Returns:
+        Select: A statement that returns (career_id, status, skill_id, name, count, weight)
+            rows, ordered by career, status and rank.
+    """
+    filters = [CareerSkillCount.count > 0]
+    if career_id is not None:
+        filters.append(CareerSkillCount.career_id == career_id)
+    if status is not None:
+        filters.append(CareerSkillCount.status == status)
+
+    ranked = select(
+        CareerSkillCount.career_id,
+        CareerSkillCount.status,
+        CareerSkillCount.skill_id,
+        CareerSkillCount.count,
+        func.row_number().over(
+            partition_by=(CareerSkillCount.career_id, CareerSkillCount.status),
+            order_by=(CareerSkillCount.count.desc(), CareerSkillCount.skill_id),
+        ).label("rank"),
+    ).where(*filters).subquery()
+
+    weight = ranked.c.count * case(
+        (ranked.c.rank <= BOOSTED_SKILLS, BOOSTED_SKILLS + 1 - ranked.c.rank),
+        else_=1,
+    )
+
+    return select(
+        ranked.c.career_id,
+        ranked.c.status,
+        ranked.c.skill_id,
+        Skill.name,
+        ranked.c.count,
+        weight.label("weight"),
+    ).join(Skill, Skill.id == ranked.c.skill_id).where(
+        ranked.c.rank <= TOP_SKILLS,
+    ).order_by(ranked.c.career_id, ranked.c.status, ranked.c.rank)
+
+
+# La consulta de una carrera se construye una sola vez; construirla en cada
+# petición cuesta más que ejecutarla
+_SKILLS_OF_CAREER = balanced_skills_query(bindparam("career_id"))
+
+
+async def get_skills_by_status(db: AsyncSession, career_id: int) -> dict[str, list[tuple[int, str, int, int]]]:
+    """
+    Retrieves the most common skills of the students of a career, grouped by their status.
+
+    Args:
+        db (AsyncSession): The database session.
+        career_id (int): The id of the career.
+
+    Returns:
+        dict[str, list[tuple[int, str, int, int]]]: The (skill id, name, number of students,
+            balanced weight) of the TOP_SKILLS most common skills of each status in
+            STATUSES, the most common first.
+    """
+    skills_by_status = {skill_status: [] for skill_status in STATUSES}
+
+    for _, skill_status, skill_id, skill_name, count, weight in await db.execute(
+            _SKILLS_OF_CAREER, {"career_id": career_id}):
+        if skill_status in skills_by_status:
+            skills_by_status[skill_status].append((skill_id, skill_name, count, weight))
+
+    return skills_by_status
+
+
+def get_percentage(skills_of_students: list[tuple[int, str, int, int]], user_skill_ids: set[int]) -> float:
+    """
+    Computes the share of the balanced weight of some skills that a user has.
+
+    Args:
+        skills_of_students (list[tuple[int, str, int, int]]): The skills of the students
+            with their balanced weight, as returned by `get_skills_by_status`.
+        user_skill_ids (set[int]): The skills of the user.
+
+    Returns:
+        float: The percentage, rounded to 2 decimals. 0 if no student has skills.
+    """
+    total = sum(skill[3] for skill in skills_of_students)
+    if not total:
+        return 0.0
+
+    user_total = sum(skill[3] for skill in skills_of_students if skill[0] in user_skill_ids)
+    return round((user_total / total) * 100, 2)
+
+
+async def compare_user_skills(db: AsyncSession, career_id: int, user_skill_ids: Iterable[int]) -> SkillComparison:
+    """
+    Compares the skills of a user with the skills of the students of a career.
+
+    Args:
+        db (AsyncSession): The database session.
+        career_id (int): The id of the career.
+        user_skill_ids (Iterable[int]): The skills of the user.
+
+    Returns:
+        SkillComparison: The skills of each status and the percentage the user has.
+    """
+    skills_by_status = await get_skills_by_status(db, career_id)
+    user_skill_ids = set(user_skill_ids)
+
+    return SkillComparison(
+        skills_by_status=skills_by_status,
+        percentages={
+            skill_status: get_percentage(skills, user_skill_ids)
+            for skill_status, skills in skills_by_status.items()
+        },
+    )
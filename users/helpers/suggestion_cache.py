@@ -0,0 +1,248 @@
+"""
+Cache of the career suggestions and skill comparisons of each user.
+
+Both only depend on the skills of the user and on data shared by every
+user, so each entry is stored with the versions of that data: the
+`skills_version` of the user, which `db.user_relations` increments when
+their skills change, and the data versions of the careers, the enrollments
+and the skills of the students, which the admin writes bump in every
+worker. An entry whose versions differ from the current ones is never
+returned, and the least recently used entries are evicted when the cache
+is full.
+
+The suggestions of a user are kept as an array with a percentage per
+career (about 340 bytes for 169 careers); the names and the numbers of
+graduated students are shared by every user and joined when a page asks
+for them.
+"""
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, NamedTuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import data_version
+from db.schema import CareerStats, Skill, User, UserSkill
+from users.helpers import career_affinity, skill_comparison
+from users.helpers.skill_comparison import SkillComparison
+from settings import settings
+
+
+class Suggestion(NamedTuple):
+    career_id: int
+    name: str
+    affinity: float
+    graduated_students: int
+
+
+class SkillName(NamedTuple):
+    id: int
+    name: str
+
+
+class UserSkills(NamedTuple):
+    """
+    The skills of a user and their version.
+
+    Attributes:
+        version (tuple | None): The skills version and the creation date of the user,
+            which tells apart a new user that got the id of a deleted one. None if
+            the user does not exist.
+        skills (list[SkillName]): The id and the name of each skill.
+    """
+
+    version: tuple | None
+    skills: list[SkillName]
+
+
+class UserSkillComparison(NamedTuple):
+    user_skills: list[SkillName]
+    comparison: SkillComparison
+
+
+class SuggestionCache:
+    """
+    LRU cache of results that depend on the skills of a user.
+
+    Each key keeps only its latest result, with the versions of the data it
+    was computed from.
+
+    Args:
+        max_size (int): The maximum number of results kept.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[Hashable, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, version: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+suggestion_cache = SuggestionCache(settings.suggestion_cache_size)
+
+
+async def get_user_skills(db: AsyncSession, user_id: int) -> UserSkills:
+    """
+    Retrieves the skills of a user and their version, with a single query.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The id of the user.
+
+    Returns:
+        UserSkills: The version and the skills.
+    """
+    rows = (await db.execute(
+        select(User.skills_version, User.created_at, Skill.id, Skill.name)
+        .outerjoin(UserSkill, UserSkill.user_id == User.id)
+        .outerjoin(Skill, Skill.id == UserSkill.skill_id)
+        .where(User.id == user_id)
+    )).all()
+
+    if not rows:
+        return UserSkills(None, [])
+
+    return UserSkills(
+        (rows[0].skills_version, rows[0].created_at),
+        [SkillName(row.id, row.name) for row in rows if row.id is not None],
+    )
+
+
+# Versiones de los datos -> graduados de cada carrera, en el orden del índice
+_graduated_students: tuple[Hashable, np.ndarray] | None = None
+
+
+async def get_graduated_students(db: AsyncSession, index: career_affinity.CareerAffinityIndex) -> np.ndarray:
+    """
+    Retrieves the number of graduated students of every career, shared by every user.
+
+    Args:
+        db (AsyncSession): The database session.
+        index (CareerAffinityIndex): The index whose career order the result follows.
+
+    Returns:
+        np.ndarray: The graduated students of each career of the index.
+    """
+    global _graduated_students
+
+    version = (index.version, data_version.get_version(data_version.ENROLLMENTS))
+    if _graduated_students is not None and _graduated_students[0] == version:
+        return _graduated_students[1]
+
+    # Contadores de career_stats, sin contar las filas de users_careers
+    counts = dict((await db.execute(
+        select(CareerStats.career_id, CareerStats.graduated_students))).all())
+    graduated_students = np.array(
+        [counts.get(career_id, 0) for career_id in index.career_ids.tolist()], dtype=np.int64)
+
+    _graduated_students = (version, graduated_students)
+    return graduated_students
+
+
+async def get_suggestions(db: AsyncSession, user_id: int) -> list[Suggestion]:
+    """
+    Ranks the careers by the affinity of a user with the skills of their graduated students.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The id of the user.
+
+    Returns:
+        list[Suggestion]: Every career, the highest affinity first.
+    """
+    user_skills = await get_user_skills(db, user_id)
+    index = await db.run_sync(career_affinity.get_index)
+    key = ("suggestions", user_id)
+    version = (user_skills.version, index.version)
+
+    # Centésimas de porcentaje de cada carrera: los porcentajes ya vienen redondeados a 2 decimales
+    hundredths = suggestion_cache.get(key, version)
+    if hundredths is None:
+        percentages = index.percentages([skill.id for skill in user_skills.skills])
+        hundredths = np.rint(percentages * 100).astype(np.uint16)
+        if user_skills.version is not None:
+            suggestion_cache.set(key, version, hundredths)
+
+    career_ids = index.career_ids.tolist()
+    percentages = hundredths.tolist()
+    graduated_students = (await get_graduated_students(db, index)).tolist()
+
+    return [
+        Suggestion(
+            career_ids[position],
+            index.career_names[position],
+            percentages[position] / 100,
+            graduated_students[position],
+        )
+        for position in np.argsort(-hundredths.astype(np.int32), kind="stable").tolist()
+    ]
+
+
+async def get_skill_comparison(db: AsyncSession, user_id: int, career_id: int) -> UserSkillComparison:
+    """
+    Compares the skills of a user with the skills of the students of a career.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The id of the user.
+        career_id (int): The id of the career.
+
+    Returns:
+        UserSkillComparison: The skills of the user and the comparison.
+    """
+    # Las versiones se leen antes que los datos, así un resultado nunca es más viejo que ellas
+    data_versions = (
+        data_version.get_version(data_version.REFERENCE),
+        data_version.get_version(data_version.CAREER_SKILLS),
+    )
+    user_skills = await get_user_skills(db, user_id)
+    key = ("skill-comparison", user_id, career_id)
+    version = (user_skills.version, *data_versions)
+
+    result = suggestion_cache.get(key, version)
+    if result is not None:
+        return result
+
+    comparison = await skill_comparison.compare_user_skills(
+        db, career_id, [skill.id for skill in user_skills.skills])
+    result = UserSkillComparison(user_skills.skills, comparison)
+
+    if user_skills.version is not None:
+        suggestion_cache.set(key, version, result)
+
+    return result